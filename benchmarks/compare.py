@@ -0,0 +1,60 @@
+"""
+Compares two benchmark result files from `benchmarks.run`.
+
+    python -m benchmarks.compare baseline.json results.json
+
+Prints the ratio of the time of each benchmark to its baseline, and exits with status 1 if any benchmark is slower than
+the baseline by more than the threshold.
+"""
+
+import argparse
+import json
+import sys
+
+
+def load_results(filepath):
+    """Returns the results of a file by (name, n_steps, batch_size)"""
+    with open(filepath) as f:
+        results = json.load(f)["results"]
+    return {(r["name"], r["n_steps"], r["batch_size"]): r for r in results}
+
+
+def compare(baseline, results, threshold=1.2):
+    """Returns a list of (key, baseline seconds, seconds, ratio, is_regression) for the benchmarks in both results"""
+    rows = []
+    for key in results:
+        if key in baseline:
+            before = baseline[key]["seconds"]
+            after = results[key]["seconds"]
+            ratio = after / before if before > 0 else float("inf")
+            rows.append((key, before, after, ratio, ratio > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("results")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="The ratio above which a benchmark is reported as a regression",
+    )
+    args = parser.parse_args()
+
+    rows = compare(
+        load_results(args.baseline), load_results(args.results), args.threshold
+    )
+    for (name, n_steps, batch_size), before, after, ratio, is_regression in rows:
+        flag = "  REGRESSION" if is_regression else ""
+        print(
+            f"{name:40} {n_steps:>5} steps {batch_size:>6} patterns "
+            f"{before:>10.4f}s {after:>10.4f}s {ratio:>6.2f}x{flag}"
+        )
+
+    sys.exit(int(any(row[-1] for row in rows)))
+
+
+if __name__ == "__main__":
+    main()
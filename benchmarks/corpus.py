@@ -0,0 +1,147 @@
+"""
+A seeded generator of synthetic drum patterns for benchmarking.
+
+Patterns are drawn band by band from the instruments of the frequency bands in `rhythmtoolbox.midi_mapping`. Each band
+follows a metric profile, so that low instruments favour downbeats, mid instruments favour backbeats and high
+instruments play on most 8th and 16th notes, and the profiles are scaled to reach a target density.
+"""
+
+import numpy as np
+import pretty_midi as pm
+
+from rhythmtoolbox.midi_mapping import hi_instruments, low_instruments, mid_instruments
+
+BAND_INSTRUMENTS = {
+    "low": low_instruments,
+    "mid": mid_instruments,
+    "hi": hi_instruments,
+}
+
+# The relative probability of an onset of each band at each 16th note position of a bar
+BAND_PROFILES = {
+    "low": [
+        1.0,
+        0.1,
+        0.3,
+        0.1,
+        0.4,
+        0.1,
+        0.5,
+        0.2,
+        0.8,
+        0.1,
+        0.3,
+        0.2,
+        0.4,
+        0.1,
+        0.5,
+        0.2,
+    ],
+    "mid": [
+        0.1,
+        0.1,
+        0.2,
+        0.1,
+        1.0,
+        0.1,
+        0.2,
+        0.3,
+        0.1,
+        0.1,
+        0.2,
+        0.1,
+        1.0,
+        0.2,
+        0.3,
+        0.4,
+    ],
+    "hi": [
+        1.0,
+        0.4,
+        0.9,
+        0.4,
+        1.0,
+        0.4,
+        0.9,
+        0.4,
+        1.0,
+        0.4,
+        0.9,
+        0.4,
+        1.0,
+        0.4,
+        0.9,
+        0.4,
+    ],
+}
+
+
+def generate_pattlist(rng, n_steps=16, density=0.3, n_instruments=4):
+    """Generates a drum pattern as a pattern list.
+
+    Parameters
+        rng, np.random.Generator
+        The random number generator
+
+        n_steps, int
+        The number of 16th note steps of the pattern
+
+        density, float
+        The approximate fraction of steps with an onset of each instrument
+
+        n_instruments, int
+        The number of instruments, which are spread over the three frequency bands
+
+    Returns
+        A pattern list
+    """
+    bands = list(BAND_INSTRUMENTS)
+    pattlist = [[] for _ in range(n_steps)]
+
+    for ix in range(n_instruments):
+        band = bands[ix % len(bands)]
+        pitch = int(rng.choice(BAND_INSTRUMENTS[band]))
+
+        profile = np.resize(BAND_PROFILES[band], n_steps)
+        probabilities = np.minimum(profile * density / profile.mean(), 1)
+        for step in np.flatnonzero(rng.random(n_steps) < probabilities):
+            if pitch not in pattlist[step]:
+                pattlist[step].append(pitch)
+
+    return pattlist
+
+
+def generate_corpus(n_patterns, n_steps=16, seed=0, density=None, n_instruments=None):
+    """Generates a list of drum patterns with the same length.
+
+    The density and number of instruments of each pattern are drawn at random unless given.
+    """
+    rng = np.random.default_rng(seed)
+    return [
+        generate_pattlist(
+            rng,
+            n_steps,
+            rng.uniform(0.1, 0.5) if density is None else density,
+            int(rng.integers(2, 9)) if n_instruments is None else n_instruments,
+        )
+        for _ in range(n_patterns)
+    ]
+
+
+def write_midifile(pattlist, filepath, tempo=120):
+    """Writes a pattern list to a MIDI drum track with one 16th note per step"""
+    pmid = pm.PrettyMIDI(initial_tempo=tempo)
+    instrument = pm.Instrument(program=0, is_drum=True)
+    step_duration = 60 / tempo / 4
+
+    for step, notes in enumerate(pattlist):
+        start = step * step_duration
+        for pitch in notes:
+            instrument.notes.append(
+                pm.Note(
+                    velocity=100, pitch=pitch, start=start, end=start + step_duration
+                )
+            )
+
+    pmid.instruments.append(instrument)
+    pmid.write(filepath)
@@ -0,0 +1,264 @@
+"""
+Measures the throughput of the descriptor functions on a synthetic corpus and saves the results as JSON.
+
+    python -m benchmarks.run --output results.json
+
+Each benchmark is identified by the function, the number of steps of the patterns and the number of patterns, and
+records the best time of several repetitions. Two result files can be compared with `benchmarks.compare`.
+"""
+
+import argparse
+import datetime
+import inspect
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import rhythmtoolbox
+from rhythmtoolbox import (
+    midifile2descriptors,
+    pattlist2descriptors,
+    pattlist_to_pianoroll,
+    pianoroll2descriptors,
+    pianorolls2descriptors,
+)
+from rhythmtoolbox import descriptors as descriptors_module
+from rhythmtoolbox.midi_mapping import get_bands
+from rhythmtoolbox.tables import TABLE_FUNCTIONS, get_table
+
+from benchmarks.corpus import generate_corpus, write_midifile
+
+LENGTHS = [16, 64, 256]
+BATCH_SIZES = [1, 100, 1000]
+QUICK_LENGTHS = [16, 64]
+QUICK_BATCH_SIZES = [1, 10]
+
+# The number of MIDI files written for each length, which is capped to keep the corpus small
+MAX_MIDI_FILES = 100
+
+
+def time_call(fn, repeat):
+    """Returns the best time in seconds of `repeat` calls of `fn`"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def get_descriptor_functions():
+    """Returns the public functions of `rhythmtoolbox.descriptors` by name"""
+    return {
+        name: fn
+        for name, fn in inspect.getmembers(descriptors_module, inspect.isfunction)
+        if fn.__module__ == descriptors_module.__name__ and not name.startswith("_")
+    }
+
+
+def get_descriptor_benchmarks(corpus):
+    """Returns a benchmark of each function in `rhythmtoolbox.descriptors` on 16-step patterns from the corpus"""
+    rolls = np.stack([pattlist_to_pianoroll(pattlist) for pattlist in corpus])
+    patterns = (rolls.sum(axis=2) > 0).astype(int)
+    bands = get_bands(rolls)
+    n_onset_steps = patterns.sum(axis=1)
+
+    # Arguments of the batched functions by parameter name
+    batch_args = {
+        "roll": rolls,
+        "pattern": patterns,
+        "patterns": patterns,
+        "n_onset_steps": n_onset_steps,
+        "low_streams": bands[0],
+        "mid_streams": bands[1],
+        "hi_streams": bands[2],
+    }
+
+    # Arguments of the other functions for each pattern, as lists like those of the original implementations
+    item_args = {
+        "roll": list(rolls),
+        "pattern": patterns.tolist(),
+        "n_onset_steps": n_onset_steps.tolist(),
+        "low_stream": bands[0].tolist(),
+        "mid_stream": bands[1].tolist(),
+        "hi_stream": bands[2].tolist(),
+    }
+
+    benchmarks = {}
+    for name, fn in get_descriptor_functions().items():
+        params = list(inspect.signature(fn).parameters)
+        if all(p in batch_args for p in params) and name.endswith(("_batch", "_codes")):
+            args = [batch_args[p] for p in params]
+            benchmarks[name] = lambda fn=fn, args=args: fn(*args)
+        else:
+            items = list(zip(*(item_args[p] for p in params)))
+            benchmarks[name] = lambda fn=fn, items=items: [fn(*a) for a in items]
+
+    return benchmarks
+
+
+def get_benchmarks(n_steps, batch_size, seed, tmpdir):
+    """Returns the benchmarks of the top-level functions for a corpus of `batch_size` patterns of `n_steps` steps"""
+    corpus = generate_corpus(batch_size, n_steps, seed=seed)
+    rolls = [pattlist_to_pianoroll(pattlist) for pattlist in corpus]
+
+    benchmarks = {
+        "pattlist2descriptors": lambda: [pattlist2descriptors(p) for p in corpus],
+        "pianoroll2descriptors": lambda: [pianoroll2descriptors(r) for r in rolls],
+        "pianorolls2descriptors": lambda: pianorolls2descriptors(np.stack(rolls)),
+    }
+
+    filepaths = []
+    for ix, pattlist in enumerate(corpus[:MAX_MIDI_FILES]):
+        filepath = os.path.join(tmpdir, f"{n_steps}_{batch_size}_{ix}.mid")
+        write_midifile(pattlist, filepath)
+        filepaths.append(filepath)
+
+    for reader in ["pretty_midi", "smf"]:
+        benchmarks[f"midifile2descriptors[{reader}]"] = (
+            lambda reader=reader: [
+                midifile2descriptors(f, reader=reader) for f in filepaths
+            ]
+        ), len(filepaths)
+
+    if n_steps == 16:
+        benchmarks.update(get_descriptor_benchmarks(corpus))
+
+    return benchmarks
+
+
+# Imports rhythmtoolbox and describes a first pattern in a new interpreter, which builds the lookup tables it needs
+COLD_START_CODE = """
+import time
+start = time.perf_counter()
+import rhythmtoolbox
+imported = time.perf_counter()
+rhythmtoolbox.pattlist2descriptors([[36], [], [38, 42], []] * 4)
+print(imported - start, time.perf_counter() - imported)
+"""
+
+
+def time_cold_start(repeat):
+    """Returns the best times in seconds of `repeat` cold starts of a new interpreter, as a dict of the time of
+    `import rhythmtoolbox` and of the import followed by the first `pattlist2descriptors` call
+    """
+    best = {"import rhythmtoolbox": float("inf"), "cold start": float("inf")}
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", COLD_START_CODE],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        import_seconds, call_seconds = map(float, output.split())
+        best["import rhythmtoolbox"] = min(best["import rhythmtoolbox"], import_seconds)
+        best["cold start"] = min(best["cold start"], import_seconds + call_seconds)
+    return best
+
+
+def get_commit():
+    """Returns the current git commit of the repository, if any"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(lengths=LENGTHS, batch_sizes=BATCH_SIZES, seed=0, repeat=3, verbose=True):
+    """Runs all benchmarks and returns the results as a JSON-serializable dict"""
+    # The cold start of short-lived processes, including the lookup tables built by the first call, which is reported
+    # as a single pattern of 0 steps
+    results = []
+    for name, seconds in time_cold_start(repeat).items():
+        results.append(
+            {
+                "name": name,
+                "n_steps": 0,
+                "batch_size": 1,
+                "seconds": seconds,
+                "us_per_pattern": seconds * 1e6,
+            }
+        )
+        if verbose:
+            print(f"{name:40} {seconds * 1e3:>38.1f} ms")
+
+    # Build the lookup tables up front, so that their one-off cost, which is measured by the cold start, is not
+    # attributed to the first benchmark
+    for name in TABLE_FUNCTIONS:
+        get_table(name)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for n_steps in lengths:
+            for batch_size in batch_sizes:
+                benchmarks = get_benchmarks(n_steps, batch_size, seed, tmpdir)
+                for name, benchmark in benchmarks.items():
+                    fn, n_items = (
+                        benchmark
+                        if isinstance(benchmark, tuple)
+                        else (benchmark, batch_size)
+                    )
+                    seconds = time_call(fn, repeat)
+                    results.append(
+                        {
+                            "name": name,
+                            "n_steps": n_steps,
+                            "batch_size": n_items,
+                            "seconds": seconds,
+                            "us_per_pattern": seconds / n_items * 1e6,
+                        }
+                    )
+                    if verbose:
+                        print(
+                            f"{name:40} {n_steps:>5} steps {n_items:>6} patterns "
+                            f"{seconds / n_items * 1e6:>12.1f} us/pattern"
+                        )
+
+    return {
+        "metadata": {
+            "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "commit": get_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "rhythmtoolbox": os.path.dirname(rhythmtoolbox.__file__),
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--quick", action="store_true", help="Run on a small corpus as a smoke test"
+    )
+    args = parser.parse_args()
+
+    lengths, batch_sizes = (
+        (QUICK_LENGTHS, QUICK_BATCH_SIZES) if args.quick else (LENGTHS, BATCH_SIZES)
+    )
+    results = run(lengths, batch_sizes, seed=args.seed, repeat=args.repeat)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved {len(results['results'])} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
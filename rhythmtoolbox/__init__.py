@@ -1,25 +1,21 @@
-from collections import defaultdict
+import glob
+import multiprocessing
+import os
+from functools import lru_cache
 
 import numpy as np
-import pretty_midi as pm
-from scipy import ndimage
-
-from rhythmtoolbox.descriptors import (
-    balance,
-    bandness,
-    density,
-    evenness,
-    get_n_onset_steps,
-    noi,
-    poly_balance,
-    poly_density,
-    poly_evenness,
-    poly_sync,
-    step_density,
-    syncopation16,
-    syness,
-)
-from rhythmtoolbox.midi_mapping import get_bands
+
+from rhythmtoolbox import profiling
+from rhythmtoolbox.bitmask import BITMASK_DTYPE, BitmaskPattern, rolls_to_bitmasks
+from rhythmtoolbox.cache import DescriptorCache
+from rhythmtoolbox.descriptors import noi
+from rhythmtoolbox.graph import compute_descriptors
+from rhythmtoolbox.index import DescriptorIndex
+from rhythmtoolbox.midi_mapping import get_band_onsets, register_mapping
+from rhythmtoolbox.smf import SMF, read_smf
+from rhythmtoolbox.sparse import SparseRoll
+from rhythmtoolbox.streaming import DescriptorStream
+from rhythmtoolbox.tables import pack_patterns
 
 DESCRIPTOR_NAMES = [
     "noi",
@@ -46,6 +42,82 @@ DESCRIPTOR_NAMES = [
     "polySync",
 ]
 
+DESCRIPTOR_INDEX = {name: ix for ix, name in enumerate(DESCRIPTOR_NAMES)}
+
+# A record of all descriptors, e.g. for viewing a descriptor matrix with named columns
+DESCRIPTOR_DTYPE = np.dtype([(name, np.float64) for name in DESCRIPTOR_NAMES])
+
+
+def _get_descriptor_names(descriptors):
+    """Returns the names of the requested descriptors, or of all descriptors if None"""
+    if descriptors is None:
+        return DESCRIPTOR_NAMES
+
+    invalid = [d for d in descriptors if d not in DESCRIPTOR_INDEX]
+    if invalid:
+        raise ValueError(
+            f"Invalid descriptors `{', '.join(invalid)}`. Must be in DESCRIPTOR_NAMES"
+        )
+    return list(descriptors)
+
+
+def _get_output(n, out, dtype, n_columns=len(DESCRIPTOR_NAMES)):
+    """Returns `out` or a new (n, n_columns) array to write descriptors to, filled with NaN"""
+    shape = (n, n_columns)
+    if out is None:
+        out = np.empty(shape, dtype)
+    elif out.shape != shape:
+        raise ValueError(f"Invalid output shape `{out.shape}`. Must be {shape}")
+    out.fill(np.nan)
+    return out
+
+
+def _in_chunks(n, chunksize, out, compute):
+    """Calls `compute(start, stop, out[start:stop])` on consecutive chunks of at most `chunksize` rows"""
+    for start in range(0, n, chunksize):
+        stop = min(start + chunksize, n)
+        compute(start, stop, out[start:stop])
+    return out
+
+
+def descriptors2array(descriptors, out=None, dtype=np.float64):
+    """Converts descriptor dicts to a matrix with columns in the order of DESCRIPTOR_NAMES.
+
+    Parameters
+        descriptors, dict or list
+        A dict of {descriptor_name: descriptor_value}, or a list of B such dicts. None values are converted to NaN.
+
+        out, np.ndarray
+        A (B, len(DESCRIPTOR_NAMES)) array to write to, e.g. a slice of a larger array or a memmap
+
+        dtype, np.dtype
+        The dtype of the output array if `out` is not given
+
+    Returns
+        A (B, len(DESCRIPTOR_NAMES)) array, or a (len(DESCRIPTOR_NAMES),) array for a single dict
+    """
+    if isinstance(descriptors, dict):
+        row = None if out is None else out.reshape(1, -1)
+        return descriptors2array([descriptors], row, dtype)[0]
+
+    out = _get_output(len(descriptors), out, dtype)
+    for row, d in zip(out, descriptors):
+        row[:] = [np.nan if d[name] is None else d[name] for name in DESCRIPTOR_NAMES]
+
+    return out
+
+
+def as_records(values, descriptors=None):
+    """Views a (B, len(DESCRIPTOR_NAMES)) descriptor matrix as a (B,) structured array with a field per descriptor.
+
+    The matrix is not copied if it is C-contiguous. For a matrix of selected descriptors, pass their names in
+    `descriptors`.
+    """
+    values = np.ascontiguousarray(values)
+    names = _get_descriptor_names(descriptors)
+    dtype = np.dtype([(name, values.dtype) for name in names])
+    return values.view(dtype).reshape(values.shape[:-1])
+
 
 def pattlist_to_pianoroll(pattlist):
     """Convert a pattern list to a piano roll"""
@@ -55,24 +127,127 @@ def pattlist_to_pianoroll(pattlist):
     return roll
 
 
-def resample_pianoroll(roll, from_resolution, to_resolution):
-    """Associate each onset in the roll with its closest 16th note position"""
+def _as_resolution(resolution):
+    """Returns a resolution as an int, raising a ValueError if it is not a positive integer"""
+    if float(resolution) != int(resolution) or resolution <= 0:
+        raise ValueError(
+            f"Invalid resolution `{resolution}`. Must be a positive integer"
+        )
+    return int(resolution)
+
+
+def get_resample_steps(n_steps, from_resolution, to_resolution):
+    """Maps the steps of a roll to their nearest steps at another resolution, with integer arithmetic.
+
+    Returns (targets, n_target_steps), where targets[i] is the new step of step i. There are
+    ceil(n_steps * to_resolution / from_resolution) new steps, and steps that round past the last one are moved to it,
+    so that no onset is lost. Targets are non-decreasing. Resolutions must be positive integers, or integer-valued
+    floats such as 8.0.
+    """
+    from_resolution = _as_resolution(from_resolution)
+    to_resolution = _as_resolution(to_resolution)
+
+    n_target_steps = -(-n_steps * to_resolution // from_resolution)
+    targets = (2 * np.arange(n_steps) * to_resolution + from_resolution) // (
+        2 * from_resolution
+    )
+    return np.minimum(targets, n_target_steps - 1), n_target_steps
+
+
+@profiling.timed("resample")
+def resample_pianoroll(roll, from_resolution, to_resolution, out=None):
+    """Associate each onset in the roll with its closest step at the new resolution.
+
+    Each step is moved to its nearest new step, see `get_resample_steps`, and steps that are moved to the same new step
+    are merged, keeping the maximum velocity of each pitch. Every onset is kept, and upsampling does not repeat onsets.
+    The dtype of the roll is kept, e.g. uint8 or bool.
+
+    A 3D array is treated as a batch of piano rolls of shape (B, N, V).
+
+    Parameters
+        roll, np.ndarray
+        The piano roll of shape (N, V) or batch of shape (B, N, V)
+
+        from_resolution, to_resolution, int
+        The resolutions of the roll and of the result in MIDI ticks per beat
+
+        out, np.ndarray
+        An array to write the result to, of the shape of the result. When downsampling, it can be a view of the start
+        of `roll`, e.g. `roll[..., :n, :]`, to resample in place.
+    """
 
     if from_resolution == to_resolution:
-        return roll
+        if out is None:
+            return roll
+        out[...] = roll
+        return out
+
+    assert len(roll.shape) in (2, 3), "Piano roll must be a 2D array or a 3D batch"
+
+    targets, n_target_steps = get_resample_steps(
+        roll.shape[-2], from_resolution, to_resolution
+    )
+    shape = roll.shape[:-2] + (n_target_steps, roll.shape[-1])
+    if out is None:
+        out = np.empty(shape, roll.dtype)
+    elif out.shape != shape:
+        raise ValueError(f"Invalid out shape `{out.shape}`. Must be {shape}")
+
+    # Steps with the same target are contiguous. The maximum of each slice of steps is taken one offset at a time over
+    # all slices, repeating the last step of shorter slices, which is faster than np.maximum.reduceat.
+    starts = np.flatnonzero(np.diff(targets, prepend=-1))
+    ends = np.append(starts[1:], len(targets))
+    merged = np.take(roll, starts, axis=-2)
+    for offset in range(1, int((ends - starts).max(initial=1))):
+        rows = np.minimum(starts + offset, ends - 1)
+        np.maximum(merged, np.take(roll, rows, axis=-2), out=merged)
+
+    if len(starts) == n_target_steps:
+        out[...] = merged
+    else:
+        out[...] = 0
+        out[..., targets[starts], :] = merged
+    return out
+
+
+def _describe(names, bars, n_steps, noi, drums):
+    """Computes the given descriptors of a single pattern as a dict, with None for undefined descriptors"""
+    values = compute_descriptors(
+        ["n_onset_steps"] + names, bars[None], n_steps, noi, drums
+    )
+
+    # No descriptors are defined for empty patterns
+    if values["n_onset_steps"][0] == 0:
+        return {name: None for name in names}
+
+    return {
+        name: None if np.isnan(values[name][0]) else values[name][0] for name in names
+    }
+
+
+def _describe_batch(names, bars, n_steps, noi, drums, result):
+    """Computes the given descriptors of a batch of patterns, writing them to the columns of `result`"""
+    values = compute_descriptors(["n_onset_steps"] + names, bars, n_steps, noi, drums)
+    for ix, name in enumerate(names):
+        result[:, ix] = values[name]
+
+    # No descriptors are defined for empty patterns
+    result[values["n_onset_steps"] == 0] = np.nan
 
-    assert len(roll.shape) == 2, "Piano roll must be a 2D array"
+    return result
 
-    factor = to_resolution / from_resolution
 
-    return ndimage.zoom(roll, (factor, 1), order=0)
+def _select(result, names):
+    return {name: result[name] for name in names}
 
 
-def pianoroll2descriptors(roll, resolution=4, drums=True):
+def pianoroll2descriptors(
+    roll, resolution=4, drums=True, cache=None, descriptors=None, mapping="gm"
+):
     """Compute all descriptors from a piano roll representation of a polyphonic drum pattern.
 
     Notes
-        - A piano roll with a resolution other than 4 ticks per beat will be resampled, which can be lossy.
+        - A piano roll with a resolution other than 4 ticks per beat will be resampled to the nearest 16th notes.
         - Some descriptors are valid only for 16-step patterns and will be None if the pattern is not divisible by 16.
 
     Parameters
@@ -85,91 +260,122 @@ def pianoroll2descriptors(roll, resolution=4, drums=True):
         drums, bool
         Indicates whether the pattern is a drum pattern
 
+        cache, DescriptorCache
+        If given, descriptors are looked up in and added to the cache. All descriptors are cached.
+
+        descriptors, list
+        The names of the descriptors to compute. If given, only these descriptors and the values they depend on are
+        computed.
+
+        mapping, str
+        The mapping of pitches to frequency bands, "gm" for General MIDI by default. See
+        `midi_mapping.register_mapping`.
+
     Returns
          Descriptors in a dict of {descriptor_name: descriptor_value}
     """
 
     assert len(roll.shape) == 2, "Piano roll must be a 2D array"
 
-    # Initialize the output dictionary
-    result = {d: None for d in DESCRIPTOR_NAMES}
+    names = _get_descriptor_names(descriptors)
 
     # Resample to a 16-note resolution
     resampled = resample_pianoroll(roll, resolution, 4)
 
-    # No need to compute descriptors for empty patterns
-    n_onset_steps = get_n_onset_steps(resampled)
-    if n_onset_steps == 0:
-        return result
+    if cache is not None:
+        key = cache.make_key(SparseRoll.from_pianoroll(resampled), drums, mapping)
+        result = cache.lookup(
+            key,
+            lambda: pianoroll2descriptors(resampled, drums=drums, mapping=mapping),
+        )
+        return _select(result, names)
+
+    bars = rolls_to_bitmasks(resampled, pad=True, mapping=mapping)
+    return _describe(names, bars, len(resampled), lambda: [noi(resampled)], drums)
+
+
+def pianorolls2descriptors(
+    rolls,
+    resolution=4,
+    drums=True,
+    out=None,
+    dtype=np.float64,
+    chunksize=None,
+    descriptors=None,
+    mapping="gm",
+):
+    """Compute all descriptors for a batch of piano rolls of the same length.
+
+    This is equivalent to calling `pianoroll2descriptors` on each roll, but every descriptor is computed with array
+    operations across the batch, which is much faster for large numbers of short patterns.
+
+    Parameters
+        rolls, np.ndarray or list
+        A (B, N, V) array of piano rolls, or a list of B piano rolls of shape (N, V)
+
+        resolution, int
+        The resolution of the piano rolls in MIDI ticks per beat
+
+        drums, bool
+        Indicates whether the patterns are drum patterns
+
+        out, np.ndarray
+        A (B, len(DESCRIPTOR_NAMES)) array to write to, e.g. a slice of a larger array or a memmap
 
-    pattern = (resampled.sum(axis=1) > 0).astype(int)
+        dtype, np.dtype
+        The dtype of the output array if `out` is not given
 
-    if not drums:
-        result["noi"] = noi(resampled)
-        result["stepDensity"] = step_density(resampled)
-        result["polyDensity"] = density(pattern)
+        chunksize, int
+        If given, the rolls are processed in chunks of this many rolls to bound the memory of intermediate arrays
 
-        if len(resampled) % 16 == 0:
-            sub_descs = defaultdict(list)
-            for subroll in np.split(resampled, len(resampled) / 16):
-                subpattern = (subroll.sum(axis=1) > 0).astype(int)
-                sub_descs["balance"] = balance(subpattern)
-                sub_descs["evenness"] = evenness(subpattern)
-                sub_descs["sync"] = syncopation16(subpattern)
-                sub_descs["syness"] = syness(subpattern)
+        descriptors, list
+        The names of the descriptors to compute, which become the columns of the output instead of DESCRIPTOR_NAMES
 
-            for desc in sub_descs:
-                result[desc] = np.mean(sub_descs[desc])
+        mapping, str
+        The mapping of pitches to frequency bands, "gm" for General MIDI by default. See
+        `midi_mapping.register_mapping`.
 
-        for desc in DESCRIPTOR_NAMES:
-            if desc not in result:
-                result[desc] = None
+    Returns
+        A (B, len(DESCRIPTOR_NAMES)) float array with columns in the order of DESCRIPTOR_NAMES. Descriptors that are
+        None in the output of `pianoroll2descriptors` are NaN.
+    """
 
+    rolls = np.asarray(rolls)
+    assert len(rolls.shape) == 3, "Piano rolls must be a 3D array"
+
+    names = _get_descriptor_names(descriptors)
+    result = _get_output(len(rolls), out, dtype, len(names))
+
+    if chunksize is not None:
+        return _in_chunks(
+            len(rolls),
+            chunksize,
+            result,
+            lambda start, stop, chunk: pianorolls2descriptors(
+                rolls[start:stop],
+                resolution,
+                drums,
+                out=chunk,
+                descriptors=names,
+                mapping=mapping,
+            ),
+        )
+
+    if len(rolls) == 0:
         return result
 
-    # Get the onset pattern of each frequency band
-    low_band, mid_band, hi_band = get_bands(resampled)
-
-    # Compute descriptors that are valid for any pattern length
-    result["noi"] = noi(resampled)
-    result["lowDensity"] = density(low_band)
-    result["midDensity"] = density(mid_band)
-    result["hiDensity"] = density(hi_band)
-    result["polyDensity"] = poly_density(low_band, mid_band, hi_band)
-    result["stepDensity"] = step_density(resampled)
-    result["lowness"] = bandness(low_band, n_onset_steps)
-    result["midness"] = bandness(mid_band, n_onset_steps)
-    result["hiness"] = bandness(hi_band, n_onset_steps)
-
-    # Compute descriptors that are valid only for 16-step patterns
-    # For patterns w lengths greater than and divisible by 16, compute descriptors for each 16-step subpattern and return the mean
-    if len(resampled) % 16 == 0:
-        sub_descs = defaultdict(list)
-        for subroll in np.split(resampled, len(resampled) / 16):
-            sub_low, sub_mid, sub_hi = get_bands(subroll)
-            subpattern = (subroll.sum(axis=1) > 0).astype(int)
-
-            sub_descs["sync"].append(syncopation16(subpattern))
-            sub_descs["lowSync"].append(syncopation16(sub_low))
-            sub_descs["midSync"].append(syncopation16(sub_mid))
-            sub_descs["hiSync"].append(syncopation16(sub_hi))
-            sub_descs["syness"].append(syness(subpattern))
-            sub_descs["lowSyness"].append(syness(sub_low))
-            sub_descs["midSyness"].append(syness(sub_mid))
-            sub_descs["hiSyness"].append(syness(sub_hi))
-            sub_descs["balance"].append(balance(subpattern))
-            sub_descs["polyBalance"].append(poly_balance(sub_low, sub_mid, sub_hi))
-            sub_descs["evenness"].append(evenness(subpattern))
-            sub_descs["polyEvenness"].append(poly_evenness(sub_low, sub_mid, sub_hi))
-            sub_descs["polySync"].append(poly_sync(sub_low, sub_mid, sub_hi))
-
-        for desc in sub_descs:
-            result[desc] = np.mean(sub_descs[desc])
+    # Resample to a 16-note resolution
+    resampled = resample_pianoroll(rolls, resolution, 4)
 
-    return result
+    bars = rolls_to_bitmasks(resampled, pad=True, mapping=mapping)
+    return _describe_batch(
+        names, bars, resampled.shape[1], lambda: noi(resampled), drums, result
+    )
 
 
-def pattlist2descriptors(pattlist, resolution=4, drums=True):
+def pattlist2descriptors(
+    pattlist, resolution=4, drums=True, cache=None, descriptors=None, mapping="gm"
+):
     """Compute all descriptors from a pattern list representation of a polyphonic drum pattern.
 
     A pattern list is a list of lists representing time steps, each containing the MIDI note numbers that occur at that
@@ -185,25 +391,271 @@ def pattlist2descriptors(pattlist, resolution=4, drums=True):
         drums, bool
         Indicates whether the pattern is a drum pattern
 
+        cache, DescriptorCache
+        If given, descriptors are looked up in and added to the cache. All descriptors are cached.
+
+        descriptors, list
+        The names of the descriptors to compute. See `pianoroll2descriptors`.
+
+        mapping, str
+        The mapping of pitches to frequency bands. See `pianoroll2descriptors`.
+
     Returns
          Descriptors in a dict of {descriptor_name: descriptor_value}
     """
-    roll = pattlist_to_pianoroll(pattlist)
-    return pianoroll2descriptors(roll, resolution, drums=drums)
+    roll = SparseRoll.from_pattlist(pattlist)
+    return sparseroll2descriptors(
+        roll,
+        resolution,
+        drums=drums,
+        cache=cache,
+        descriptors=descriptors,
+        mapping=mapping,
+    )
 
 
-def get_subdivisions(pmid, resolution):
-    """Parse beats from a PrettyMIDI object and create an array of subdivisions at a given resolution.
+def sparseroll2descriptors(
+    roll, resolution=4, drums=True, cache=None, descriptors=None, mapping="gm"
+):
+    """Compute all descriptors from a sparse piano roll, without converting it to a dense piano roll.
 
-    :param pmid: PrettyMIDI object
+    The descriptors are the same as those of `pianoroll2descriptors` for the equivalent dense piano roll.
+
+    Parameters
+        roll, SparseRoll
+        The sparse piano roll
+
+        resolution, int
+        The resolution of the piano roll in MIDI ticks per beat
+
+        drums, bool
+        Indicates whether the pattern is a drum pattern
+
+        cache, DescriptorCache
+        If given, descriptors are looked up in and added to the cache. All descriptors are cached.
+
+        descriptors, list
+        The names of the descriptors to compute. See `pianoroll2descriptors`.
+
+        mapping, str
+        The mapping of pitches to frequency bands. See `pianoroll2descriptors`.
+
+    Returns
+         Descriptors in a dict of {descriptor_name: descriptor_value}
+    """
+
+    names = _get_descriptor_names(descriptors)
+
+    # Resample to a 16-note resolution
+    resampled = roll.resample(resolution, 4)
+
+    if cache is not None:
+        key = cache.make_key(resampled, drums, mapping)
+        result = cache.lookup(
+            key,
+            lambda: sparseroll2descriptors(resampled, drums=drums, mapping=mapping),
+        )
+        return _select(result, names)
+
+    bars = resampled.to_bitmasks(mapping)
+    return _describe(names, bars, len(resampled), lambda: [resampled.noi()], drums)
+
+
+def pianoroll2timeline(
+    roll,
+    resolution=4,
+    window=16,
+    hop=16,
+    drums=True,
+    out=None,
+    dtype=np.float64,
+    descriptors=None,
+    mapping="gm",
+):
+    """Compute the descriptors of consecutive windows of a piano roll, e.g. of each bar of a song.
+
+    Each row of the output holds the descriptors of `pianoroll2descriptors` for the window that starts `hop` steps
+    after the previous one. Windows that do not fit entirely in the roll are dropped. The bars of all windows are
+    packed from a single strided view of the roll, so overlapping windows share the work.
+
+    Parameters
+        roll, np.ndarray
+        The piano roll
+
+        resolution, int
+        The resolution of the piano roll in MIDI ticks per beat
+
+        window, int
+        The number of 16th note steps of each window. Descriptors that are valid only for 16-step patterns are NaN
+        if this is not a multiple of 16.
+
+        hop, int
+        The number of 16th note steps between the starts of consecutive windows
+
+        drums, bool
+        Indicates whether the pattern is a drum pattern
+
+        out, np.ndarray
+        A (n_windows, len(DESCRIPTOR_NAMES)) array to write to
+
+        dtype, np.dtype
+        The dtype of the output array if `out` is not given
+
+        descriptors, list
+        The names of the descriptors to compute, which become the columns of the output instead of DESCRIPTOR_NAMES
+
+        mapping, str
+        The mapping of pitches to frequency bands. See `pianoroll2descriptors`.
+
+    Returns
+        A (n_windows, len(DESCRIPTOR_NAMES)) float array with columns in the order of DESCRIPTOR_NAMES
+    """
+
+    assert len(roll.shape) == 2, "Piano roll must be a 2D array"
+
+    if window <= 0 or hop <= 0:
+        raise ValueError(
+            f"Invalid window `{window}` or hop `{hop}`. Must be positive integers"
+        )
+
+    names = _get_descriptor_names(descriptors)
+
+    # Resample to a 16-note resolution
+    resampled = resample_pianoroll(roll, resolution, 4)
+    n_steps = len(resampled)
+
+    n_windows = max(0, (n_steps - window) // hop + 1)
+    result = _get_output(n_windows, out, dtype, len(names))
+    if n_windows == 0:
+        return result
+
+    starts = np.arange(n_windows) * hop
+    n_bars = -(-window // 16)
+    bar_starts = starts[:, None] + np.arange(n_bars) * 16
+
+    # Pack the 16 steps that start at every step once, padding the end of the roll with silence
+    with profiling.stage("bands"):
+        bars = np.empty((n_windows, n_bars), dtype=BITMASK_DTYPE)
+        onsets = get_band_onsets(resampled, mapping)
+        patterns = [resampled.sum(axis=1) > 0] + list(onsets.T)
+        for field, pattern in zip(BITMASK_DTYPE.names, patterns):
+            padded = np.concatenate([pattern, np.zeros(16, bool)])
+            windows = np.lib.stride_tricks.sliding_window_view(padded, 16)
+            bars[field] = pack_patterns(windows)[bar_starts]
+
+        # Silence the steps of an incomplete last bar that are outside the window
+        if window % 16:
+            for field in BITMASK_DTYPE.names:
+                bars[field][:, -1] &= (1 << window % 16) - 1
+
+    def get_noi():
+        # Count the onsets of each pitch in every window from cumulative counts
+        onsets = resampled > 0
+        onsets = onsets[:, onsets.any(axis=0)]
+        counts = np.concatenate(
+            [np.zeros((1, onsets.shape[1]), int), np.cumsum(onsets, axis=0)]
+        )
+        return ((counts[starts + window] - counts[starts]) > 0).sum(axis=1)
+
+    return _describe_batch(names, bars, window, get_noi, drums, result)
+
+
+def bitmasks2descriptors(
+    bars, noi=None, out=None, dtype=np.float64, chunksize=None, descriptors=None
+):
+    """Compute all descriptors for a batch of drum patterns stored as bitmasks.
+
+    Parameters
+        bars, np.ndarray
+        A (B, n_bars) array of dtype BITMASK_DTYPE, e.g. from `rolls_to_bitmasks`
+
+        noi, np.ndarray
+        The number of instruments of each pattern. The noi column is NaN if not given.
+
+        out, np.ndarray
+        A (B, len(DESCRIPTOR_NAMES)) array to write to, e.g. a slice of a larger array or a memmap
+
+        dtype, np.dtype
+        The dtype of the output array if `out` is not given
+
+        chunksize, int
+        If given, the patterns are processed in chunks of this many patterns to bound the memory of intermediate arrays
+
+        descriptors, list
+        The names of the descriptors to compute, which become the columns of the output instead of DESCRIPTOR_NAMES
+
+    Returns
+        A (B, len(DESCRIPTOR_NAMES)) float array with columns in the order of DESCRIPTOR_NAMES
+    """
+
+    assert len(bars.shape) == 2, "Bitmasks must be a 2D array"
+
+    names = _get_descriptor_names(descriptors)
+    result = _get_output(len(bars), out, dtype, len(names))
+
+    if chunksize is not None:
+        return _in_chunks(
+            len(bars),
+            chunksize,
+            result,
+            lambda start, stop, chunk: bitmasks2descriptors(
+                bars[start:stop],
+                None if noi is None else np.asarray(noi)[start:stop],
+                out=chunk,
+                descriptors=names,
+            ),
+        )
+
+    if len(bars) == 0:
+        return result
+
+    return _describe_batch(
+        names,
+        bars,
+        bars.shape[1] * 16,
+        None if noi is None else lambda: noi,
+        True,
+        result,
+    )
+
+
+def bitmask2descriptors(pattern, descriptors=None):
+    """Compute all descriptors from a drum pattern stored as bitmasks.
+
+    Parameters
+        pattern, BitmaskPattern
+        The pattern
+
+        descriptors, list
+        The names of the descriptors to compute. See `pianoroll2descriptors`.
+
+    Returns
+         Descriptors in a dict of {descriptor_name: descriptor_value}
+    """
+    names = _get_descriptor_names(descriptors)
+    return _describe(names, pattern.bars, len(pattern), lambda: [pattern.noi], True)
+
+
+def get_beat_subdivisions(beats, resolution):
+    """Create an array of subdivisions of the given beat times at a given resolution.
+
+    Grids are cached by beat times and resolution, as many files share a tempo map. The returned array is read-only.
+
+    :param beats: Array of beat times
     :param resolution: Resolution of the output array
     :return: Array of subdivisions
     """
-    beats = pmid.get_beats()
+    beats = np.ascontiguousarray(beats, dtype=np.float64)
+    return _get_beat_subdivisions(beats.tobytes(), int(resolution))
+
+
+@lru_cache(maxsize=256)
+def _get_beat_subdivisions(beats_bytes, resolution):
+    beats = np.frombuffer(beats_bytes, dtype=np.float64)
 
     # Assume a single 4-beat bar
     if len(beats) <= 1:
-        beats = np.arange(0, 4)
+        beats = np.arange(0, 4, dtype=np.float64)
 
     beat_sep = beats[-1] - beats[-2]
     additional_beat = beats[-1] + beat_sep
@@ -213,16 +665,94 @@ def get_subdivisions(pmid, resolution):
     beats = np.append(beats, additional_beats)
 
     # Upsample beat times to the input resolution using linear interpolation
-    subdivisions = []
-    for start, end in zip(beats, beats[1:]):
-        for j in range(resolution):
-            subdivisions.append((end - start) / resolution * j + start)
-    subdivisions.append(beats[-1])
+    starts = beats[:-1, None]
+    ends = beats[1:, None]
+    subdivisions = (ends - starts) / resolution * np.arange(resolution) + starts
+    subdivisions = np.append(subdivisions.ravel(), beats[-1])
+
+    subdivisions.setflags(write=False)
+    return subdivisions
 
-    return np.array(subdivisions)
 
+@profiling.timed("subdivisions")
+def get_subdivisions(pmid, resolution):
+    """Parse beats from a PrettyMIDI object and create an array of subdivisions at a given resolution.
 
-def get_onset_roll_from_pmid(pmid, resolution=4):
+    :param pmid: PrettyMIDI object, or SMF object from `rhythmtoolbox.smf.read_smf`
+    :param resolution: Resolution of the output array
+    :return: Array of subdivisions
+    """
+    return get_beat_subdivisions(pmid.get_beats(), resolution)
+
+
+@profiling.timed("quantize")
+def quantize_times(times, grid):
+    """Finds the index of the nearest point of a sorted grid for each time, preferring the earliest on ties.
+
+    This is equivalent to `np.argmin(np.abs(t - grid))` for each time `t`, in a single pass over the times.
+
+    :param times: Array of times
+    :param grid: Sorted array of grid times
+    :return: Array of grid indices
+    """
+    times = np.asarray(times)
+    grid = np.asarray(grid)
+
+    upper = np.searchsorted(grid, times, side="left")
+    np.clip(upper, 1, len(grid) - 1, out=upper)
+    lower = upper - 1
+
+    # Choose the upper neighbour only if it is strictly closer, as argmin keeps the first minimum
+    nearest = np.where(
+        np.abs(times - grid[upper]) < np.abs(times - grid[lower]), upper, lower
+    )
+
+    # Move to the first of any repeated grid times
+    return np.searchsorted(grid, grid[nearest], side="left")
+
+
+def get_sparse_onset_roll(starts, pitches, velocities, subdivisions):
+    """Quantizes notes to a grid of subdivisions and returns a sparse piano roll preserving only onsets.
+
+    :param starts: Start times of the notes
+    :param pitches: MIDI pitches of the notes
+    :param velocities: Velocities of the notes
+    :param subdivisions: Array of subdivision times, e.g. from `get_subdivisions`
+    :return: SparseRoll with N steps, where N is the number of subdivisions
+    """
+    onsets, n_ticks = _quantize_onsets(starts, subdivisions)
+    return SparseRoll(onsets, pitches, velocities, n_ticks)
+
+
+def _quantize_onsets(starts, subdivisions):
+    """Returns the steps of note start times on a grid of subdivisions, and the number of steps of the grid"""
+    subdivisions = np.asarray(subdivisions)
+    starts = np.asarray(starts, dtype=subdivisions.dtype)
+    n_ticks = len(subdivisions) - 1
+
+    onsets = quantize_times(starts, subdivisions)
+
+    # If an onset is quantized to the last tick, move it to the previous tick
+    np.minimum(onsets, n_ticks - 1, out=onsets)
+
+    return onsets, n_ticks
+
+
+def get_onset_roll(starts, pitches, velocities, subdivisions):
+    """Quantizes notes to a grid of subdivisions and returns a piano roll preserving only onsets.
+
+    :param starts: Start times of the notes
+    :param pitches: MIDI pitches of the notes
+    :param velocities: Velocities of the notes
+    :param subdivisions: Array of subdivision times, e.g. from `get_subdivisions`
+    :return: Onset roll of shape (N, V), where N is the number of subdivisions and V is the number of MIDI pitches
+    """
+    return get_sparse_onset_roll(
+        starts, pitches, velocities, subdivisions
+    ).to_pianoroll()
+
+
+def get_onset_roll_from_pmid(pmid, resolution=4, sparse=False):
     """Converts a PrettyMIDI object to a piano roll at the given resolution, preserving only onsets.
 
     - If input MIDI is multi-track, we consider only the first track
@@ -230,38 +760,165 @@ def get_onset_roll_from_pmid(pmid, resolution=4):
 
     :param pmid: PrettyMIDI object
     :param resolution: Resolution of the piano roll in MIDI ticks per beat
+    :param sparse: If True, return a SparseRoll instead of a dense piano roll
     :return: Onset roll of shape (N, V), where N is the number of time steps and V is the number of MIDI pitches
     """
+    empty = SparseRoll([], [], [], 0)
+
     if not pmid.instruments:
-        return np.zeros((0, 128), np.uint8)
+        return empty if sparse else empty.to_pianoroll()
 
     # Consider only the first instrument
     instrument = pmid.instruments[0]
     if len(instrument.notes) == 0:
-        return np.zeros((0, 128), np.uint8)
+        return empty if sparse else empty.to_pianoroll()
 
     subdivisions = get_subdivisions(pmid, resolution=resolution)
 
-    n_ticks = len(subdivisions) - 1
+    notes = np.array(
+        [(note.start, note.pitch, note.velocity) for note in instrument.notes]
+    )
 
-    onsets_unquantized = [note.start for note in instrument.notes]
-    onsets = [np.argmin(np.abs(t - subdivisions)) for t in onsets_unquantized]
+    roll = get_sparse_onset_roll(
+        notes[:, 0], notes[:, 1].astype(int), notes[:, 2].astype(int), subdivisions
+    )
+    return roll if sparse else roll.to_pianoroll()
 
-    # If an onset is quantized to the last tick, move it to the previous tick
-    for ix, onset in enumerate(onsets):
-        if onset == n_ticks:
-            onsets[onsets.index(onset)] = onset - 1
 
-    pitches = [note.pitch for note in instrument.notes]
-    velocities = [note.velocity for note in instrument.notes]
+def get_onset_roll_from_smf(smf, resolution=4, sparse=False):
+    """Converts an SMF object to a piano roll at the given resolution, preserving only onsets.
 
-    onset_roll = np.zeros((n_ticks, 128), np.uint8)
-    onset_roll[onsets, pitches] = velocities
+    This is the equivalent of `get_onset_roll_from_pmid` for MIDI files read with `rhythmtoolbox.smf.read_smf`.
 
-    return onset_roll
+    :param smf: SMF object
+    :param resolution: Resolution of the piano roll in MIDI ticks per beat
+    :param sparse: If True, return a SparseRoll instead of a dense piano roll
+    :return: Onset roll of shape (N, V), where N is the number of time steps and V is the number of MIDI pitches
+    """
+    if not smf.instruments:
+        empty = SparseRoll([], [], [], 0)
+        return empty if sparse else empty.to_pianoroll()
+
+    # Consider only the first instrument
+    instrument = smf.instruments[0]
+
+    subdivisions = get_subdivisions(smf, resolution=resolution)
+    starts = smf.tick_to_time(instrument.start_ticks)
+
+    roll = get_sparse_onset_roll(
+        starts, instrument.pitches, instrument.velocities, subdivisions
+    )
+    return roll if sparse else roll.to_pianoroll()
+
+
+def read_onset_roll(filepath, resolution=4, reader="pretty_midi", sparse=False):
+    """Reads the onset roll of the first track of a MIDI file.
+
+    :param filepath: Path to a MIDI file
+    :param resolution: Resolution of the piano roll in MIDI ticks per beat
+    :param reader: "pretty_midi", or "smf" to use the lightweight reader in `rhythmtoolbox.smf`
+    :param sparse: If True, return a SparseRoll instead of a dense piano roll
+    :return: Onset roll of shape (N, V), where N is the number of time steps and V is the number of MIDI pitches
+    """
+    if reader == "pretty_midi":
+        import pretty_midi as pm
+
+        with profiling.stage("parse.pretty_midi"):
+            pmid = pm.PrettyMIDI(filepath, resolution=4)
+        return get_onset_roll_from_pmid(pmid, resolution=resolution, sparse=sparse)
+    if reader == "smf":
+        with profiling.stage("parse.smf"):
+            smf = read_smf(filepath)
+        return get_onset_roll_from_smf(smf, resolution=resolution, sparse=sparse)
+
+    raise ValueError(f"Invalid reader `{reader}`. Must be pretty_midi or smf")
 
 
-def midifile2descriptors(filepath, drums=True):
+def _get_instrument_notes(midi, instrument):
+    """Returns the start times, pitches and velocities of the notes of an instrument of a PrettyMIDI or SMF object"""
+    if isinstance(midi, SMF):
+        starts = midi.tick_to_time(instrument.start_ticks)
+        return starts, instrument.pitches, instrument.velocities
+
+    notes = np.array(
+        [(note.start, note.pitch, note.velocity) for note in instrument.notes]
+    ).reshape(-1, 3)
+    return notes[:, 0], notes[:, 1].astype(int), notes[:, 2].astype(int)
+
+
+def get_onset_rolls(midi, resolution=4, sparse=False):
+    """Converts every instrument of a MIDI file to a piano roll at the given resolution, preserving only onsets.
+
+    The notes of all instruments are quantized in a single pass against the subdivisions of the file, so all rolls
+    have the same number of steps and their steps are aligned.
+
+    :param midi: PrettyMIDI object, or SMF object from `rhythmtoolbox.smf.read_smf`
+    :param resolution: Resolution of the piano rolls in MIDI ticks per beat
+    :param sparse: If True, return SparseRolls instead of dense piano rolls
+    :return: A tuple (tracks, drum_roll), where tracks is a list of (program, is_drum, roll) tuples in the order of
+        `midi.instruments`, and drum_roll is the merged roll of the drum instruments, with no onsets if there are none.
+        Onsets of the same pitch on the same step of several drum tracks keep the maximum velocity.
+    """
+    empty = SparseRoll([], [], [], 0)
+    if not midi.instruments:
+        return [], empty if sparse else empty.to_pianoroll()
+
+    notes = [_get_instrument_notes(midi, instrument) for instrument in midi.instruments]
+    starts, pitches, velocities = (np.concatenate(x) for x in zip(*notes))
+    track_ix = np.repeat(np.arange(len(notes)), [len(n[0]) for n in notes])
+    is_drum = np.array([instrument.is_drum for instrument in midi.instruments])
+
+    subdivisions = get_subdivisions(midi, resolution=resolution)
+    onsets, n_ticks = _quantize_onsets(starts, subdivisions)
+
+    tracks = []
+    for ix, instrument in enumerate(midi.instruments):
+        in_track = track_ix == ix
+        roll = SparseRoll(
+            onsets[in_track], pitches[in_track], velocities[in_track], n_ticks
+        )
+        tracks.append(
+            (
+                int(instrument.program),
+                bool(instrument.is_drum),
+                roll if sparse else roll.to_pianoroll(),
+            )
+        )
+
+    # Drum tracks that play the same pitch on the same step keep the maximum velocity, as when resampling
+    in_drums = is_drum[track_ix]
+    drum_roll = SparseRoll(
+        onsets[in_drums], pitches[in_drums], velocities[in_drums], n_ticks
+    ).merge_onsets()
+    return tracks, drum_roll if sparse else drum_roll.to_pianoroll()
+
+
+def read_onset_rolls(filepath, resolution=4, reader="pretty_midi", sparse=False):
+    """Reads the onset rolls of every track of a MIDI file, parsing it once. See `get_onset_rolls`.
+
+    :param filepath: Path to a MIDI file
+    :param resolution: Resolution of the piano rolls in MIDI ticks per beat
+    :param reader: "pretty_midi", or "smf" to use the lightweight reader in `rhythmtoolbox.smf`
+    :param sparse: If True, return SparseRolls instead of dense piano rolls
+    :return: A tuple (tracks, drum_roll) of the (program, is_drum, roll) of each track and the merged drum roll
+    """
+    if reader == "pretty_midi":
+        import pretty_midi as pm
+
+        with profiling.stage("parse.pretty_midi"):
+            midi = pm.PrettyMIDI(filepath, resolution=4)
+    elif reader == "smf":
+        with profiling.stage("parse.smf"):
+            midi = read_smf(filepath)
+    else:
+        raise ValueError(f"Invalid reader `{reader}`. Must be pretty_midi or smf")
+
+    return get_onset_rolls(midi, resolution=resolution, sparse=sparse)
+
+
+def midifile2descriptors(
+    filepath, drums=True, reader="pretty_midi", descriptors=None, mapping="gm"
+):
     """Compute all descriptors from a MIDI file.
 
     Parameters
@@ -271,9 +928,174 @@ def midifile2descriptors(filepath, drums=True):
         drums, bool
         Indicates whether the pattern is a drum pattern
 
+        reader, str
+        The MIDI reader: "pretty_midi", or "smf" for the faster reader in `rhythmtoolbox.smf`
+
+        descriptors, list
+        The names of the descriptors to compute. See `pianoroll2descriptors`.
+
+        mapping, str
+        The mapping of pitches to frequency bands. See `pianoroll2descriptors`.
+
     Returns
          Descriptors in a dict of {descriptor_name: descriptor_value}
     """
-    pmid = pm.PrettyMIDI(filepath, resolution=4)
-    onset_roll = get_onset_roll_from_pmid(pmid)
-    return pianoroll2descriptors(onset_roll, drums=drums)
+    onset_roll = read_onset_roll(filepath, reader=reader, sparse=True)
+    return sparseroll2descriptors(
+        onset_roll, drums=drums, descriptors=descriptors, mapping=mapping
+    )
+
+
+def midifile2trackdescriptors(
+    filepath, reader="pretty_midi", descriptors=None, mapping="gm"
+):
+    """Compute the descriptors of every track of a MIDI file and of its merged drum tracks, parsing it once.
+
+    Parameters
+        filepath, str
+        Path to a MIDI file
+
+        reader, str
+        The MIDI reader, see `midifile2descriptors`
+
+        descriptors, list
+        The names of the descriptors to compute. See `pianoroll2descriptors`.
+
+        mapping, str
+        The mapping of pitches to frequency bands. See `pianoroll2descriptors`.
+
+    Returns
+        A tuple (tracks, drums), where tracks is a list of (program, is_drum, descriptors) tuples in the order of the
+        instruments of the file, each described as a drum pattern if it is a drum track, and drums is the descriptors
+        of the merged drum tracks, or None if the file has no drum tracks
+    """
+    tracks, drum_roll = read_onset_rolls(filepath, reader=reader, sparse=True)
+
+    track_descriptors = [
+        (
+            program,
+            is_drum,
+            sparseroll2descriptors(
+                roll, drums=is_drum, descriptors=descriptors, mapping=mapping
+            ),
+        )
+        for program, is_drum, roll in tracks
+    ]
+    drum_descriptors = None
+    if any(is_drum for _, is_drum, _ in tracks):
+        drum_descriptors = sparseroll2descriptors(
+            drum_roll, drums=True, descriptors=descriptors, mapping=mapping
+        )
+    return track_descriptors, drum_descriptors
+
+
+def _midifile2descriptors_job(job):
+    """Computes the descriptors of a MIDI file in a worker process, returning the error instead of raising it"""
+    filepath, drums, reader, descriptors, mapping = job
+    try:
+        descs = midifile2descriptors(filepath, drums, reader, descriptors, mapping)
+        return filepath, descs, None
+    except Exception as e:
+        return filepath, None, f"{type(e).__name__}: {e}"
+
+
+def imidifiles2descriptors(
+    filepaths,
+    drums=True,
+    workers=None,
+    chunksize=None,
+    ordered=True,
+    reader="pretty_midi",
+    descriptors=None,
+    mapping="gm",
+):
+    """Compute all descriptors from many MIDI files using a pool of worker processes, yielding results one at a time.
+
+    Parameters
+        filepaths, str or list
+        Paths to MIDI files, or a glob pattern such as "midi/**/*.mid"
+
+        drums, bool
+        Indicates whether the patterns are drum patterns
+
+        workers, int
+        The number of worker processes. Defaults to the number of CPUs. With a single worker, files are processed in
+        the calling process.
+
+        chunksize, int
+        The number of files sent to a worker at a time. Defaults to a value that gives each worker a few chunks.
+
+        ordered, bool
+        If True, results are yielded in the order of `filepaths`. Otherwise they are yielded as soon as they finish.
+
+        reader, str
+        The MIDI reader, see `midifile2descriptors`
+
+        descriptors, list
+        The names of the descriptors to compute. See `pianoroll2descriptors`.
+
+        mapping, str
+        The mapping of pitches to frequency bands. See `pianoroll2descriptors`. Mappings registered after the worker
+        processes are started, or in a parent process that does not fork, are not available to the workers.
+
+    Returns
+        A generator of (filepath, descriptors, error) tuples. If a file could not be processed, descriptors is None and
+        error is a message describing the exception; otherwise error is None.
+    """
+    if isinstance(filepaths, str):
+        filepaths = sorted(glob.glob(filepaths, recursive=True))
+    if descriptors is not None:
+        descriptors = _get_descriptor_names(descriptors)
+    jobs = [(filepath, drums, reader, descriptors, mapping) for filepath in filepaths]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs)))
+
+    if workers == 1:
+        yield from map(_midifile2descriptors_job, jobs)
+        return
+
+    if chunksize is None:
+        chunksize = max(1, len(jobs) // (workers * 4))
+
+    with multiprocessing.Pool(workers) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+        yield from imap(_midifile2descriptors_job, jobs, chunksize=chunksize)
+
+
+def midifiles2descriptors(
+    filepaths,
+    drums=True,
+    workers=None,
+    chunksize=None,
+    reader="pretty_midi",
+    descriptors=None,
+    mapping="gm",
+):
+    """Compute all descriptors from many MIDI files using a pool of worker processes.
+
+    Files that cannot be processed do not abort the run; their errors are collected instead.
+    See `imidifiles2descriptors` for a description of the parameters.
+
+    Returns
+        A tuple (descriptors, errors), where descriptors is a dict of {filepath: descriptors} in the order of
+        `filepaths`, and errors is a dict of {filepath: error message}
+    """
+    results = {}
+    errors = {}
+    for filepath, descs, error in imidifiles2descriptors(
+        filepaths,
+        drums=drums,
+        workers=workers,
+        chunksize=chunksize,
+        reader=reader,
+        descriptors=descriptors,
+        mapping=mapping,
+    ):
+        if error is None:
+            results[filepath] = descs
+        else:
+            errors[filepath] = error
+
+    return results, errors
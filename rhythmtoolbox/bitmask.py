@@ -0,0 +1,163 @@
+"""
+A compact representation of polyphonic drum patterns as bitmasks.
+
+Each 16-step bar of a pattern is stored as four uint16 bitmasks: one for the steps with onsets of any instrument and one
+for each frequency band, where bit i is set if there is an onset at step i of the bar. A bar takes 8 bytes, compared to
+the kilobytes of a piano roll, so that large corpora can be kept in memory as a single structured array.
+"""
+
+import numpy as np
+
+from rhythmtoolbox import profiling
+from rhythmtoolbox.descriptors import noi
+from rhythmtoolbox.midi_mapping import BANDS, get_band_matrix, get_band_onsets
+from rhythmtoolbox.tables import pack_patterns, unpack_patterns
+
+BITMASK_DTYPE = np.dtype(
+    [("any", np.uint16), ("low", np.uint16), ("mid", np.uint16), ("hi", np.uint16)]
+)
+
+# The pitch used for each band when converting bitmasks back to a pattern list
+BAND_PITCHES = {"low": 36, "mid": 38, "hi": 42}
+
+
+def _check_n_steps(n_steps):
+    if n_steps == 0 or n_steps % 16 != 0:
+        raise ValueError(
+            f"Invalid pattern length `{n_steps}`. Must be a positive multiple of 16"
+        )
+
+
+@profiling.timed("bands")
+def rolls_to_bitmasks(rolls, pad=False, mapping="gm"):
+    """Packs piano rolls at a 16th note resolution into bitmasks.
+
+    rolls, np.ndarray
+        A piano roll of shape (N, V), or a batch of piano rolls of shape (B, N, V), where N is a multiple of 16
+
+    pad, bool
+        If True, N can be any length and an incomplete last bar is padded with silence
+
+    mapping, str
+        The mapping of pitches to frequency bands, see `midi_mapping.register_mapping`
+
+    Returns an array of dtype BITMASK_DTYPE of shape (ceil(N / 16),) or (B, ceil(N / 16))
+    """
+    n_steps = rolls.shape[-2]
+    if not pad:
+        _check_n_steps(n_steps)
+
+    n_bars = -(-n_steps // 16)
+    shape = rolls.shape[:-2] + (n_bars, 16)
+    padding = [(0, 0)] * (len(shape) - 2) + [(0, n_bars * 16 - n_steps)]
+
+    def pack(pattern):
+        return pack_patterns(np.pad(pattern, padding).reshape(shape))
+
+    bars = np.empty(shape[:-1], dtype=BITMASK_DTYPE)
+    bars["any"] = pack(rolls.sum(axis=-1) > 0)
+    onsets = get_band_onsets(rolls, mapping)
+    for ix, band in enumerate(BANDS):
+        bars[band] = pack(onsets[..., ix])
+
+    return bars
+
+
+class BitmaskPattern:
+    """A polyphonic drum pattern stored as the bitmasks of each bar and its number of instruments.
+
+    bars, np.ndarray
+        Array of dtype BITMASK_DTYPE with one element per 16-step bar
+
+    noi, int
+        The number of instruments of the pattern, which cannot be recovered from the bitmasks
+    """
+
+    __slots__ = ("bars", "noi")
+
+    def __init__(self, bars, noi):
+        self.bars = np.asarray(bars, dtype=BITMASK_DTYPE).reshape(-1)
+        self.noi = int(noi)
+
+    @classmethod
+    def from_pianoroll(cls, roll, resolution=4, mapping="gm"):
+        """Creates a pattern from a piano roll, resampled to a 16th note resolution"""
+        from rhythmtoolbox import resample_pianoroll
+
+        assert len(roll.shape) == 2, "Piano roll must be a 2D array"
+
+        resampled = resample_pianoroll(roll, resolution, 4)
+        return cls(rolls_to_bitmasks(resampled, mapping=mapping), noi(resampled))
+
+    @classmethod
+    def from_pattlist(cls, pattlist, resolution=4, mapping="gm"):
+        """Creates a pattern from a pattern list without building a piano roll"""
+        if resolution != 4:
+            from rhythmtoolbox import pattlist_to_pianoroll
+
+            return cls.from_pianoroll(
+                pattlist_to_pianoroll(pattlist), resolution, mapping
+            )
+
+        _check_n_steps(len(pattlist))
+
+        bars = np.zeros(len(pattlist) // 16, dtype=BITMASK_DTYPE)
+        pitches = set()
+        matrix = get_band_matrix(mapping)
+        band_instruments = [
+            (band, set(np.nonzero(matrix[:, ix])[0].tolist()))
+            for ix, band in enumerate(BANDS)
+        ]
+
+        for ix, notes in enumerate(pattlist):
+            if len(notes) == 0:
+                continue
+
+            bar, step = divmod(ix, 16)
+            bit = 1 << step
+            bars["any"][bar] |= bit
+            pitches.update(notes)
+            for band, instruments in band_instruments:
+                if not instruments.isdisjoint(notes):
+                    bars[band][bar] |= bit
+
+        return cls(bars, len(pitches))
+
+    @classmethod
+    def from_midifile(cls, filepath, reader="pretty_midi", mapping="gm"):
+        """Creates a pattern from the first track of a MIDI file. See `midifile2descriptors` for the readers."""
+        from rhythmtoolbox import read_onset_roll
+
+        return cls.from_pianoroll(
+            read_onset_roll(filepath, reader=reader), mapping=mapping
+        )
+
+    def to_pattlist(self):
+        """Converts the pattern to a pattern list, using one representative pitch per band (see BAND_PITCHES)"""
+        steps = {band: unpack_patterns(self.bars[band]).reshape(-1) for band in BANDS}
+        return [
+            [BAND_PITCHES[band] for band in BANDS if steps[band][ix]]
+            for ix in range(len(self))
+        ]
+
+    @property
+    def nbytes(self):
+        """The number of bytes used by the bitmasks"""
+        return self.bars.nbytes
+
+    def __len__(self):
+        return len(self.bars) * 16
+
+    def __eq__(self, other):
+        if not isinstance(other, BitmaskPattern):
+            return NotImplemented
+        return self.noi == other.noi and np.array_equal(self.bars, other.bars)
+
+    def __repr__(self):
+        bars = ", ".join(
+            "("
+            + ", ".join(f"{band}={bar[band]:#06x}" for band in ["any"] + BANDS)
+            + ")"
+            for bar in self.bars
+        )
+        return f"BitmaskPattern(bars=[{bars}], noi={self.noi})"
@@ -0,0 +1,70 @@
+"""
+Memoization of descriptors by pattern content.
+
+Descriptors depend only on which pitches have onsets at which 16th-note steps, so patterns are keyed by the positions
+of their onsets after resampling. Equal patterns with different dtypes, velocities or input resolutions share an entry.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+
+class DescriptorCache:
+    """A bounded cache of descriptors that evicts the least recently used pattern.
+
+    maxsize, int
+        The maximum number of patterns to keep
+
+    The numbers of lookups that were found in the cache and that had to be computed are counted in `hits` and `misses`.
+    """
+
+    def __init__(self, maxsize=65536):
+        if maxsize <= 0:
+            raise ValueError(f"Invalid maxsize `{maxsize}`. Must be positive")
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def make_key(roll, drums, mapping="gm"):
+        """Returns the key of a SparseRoll at a 16th note resolution, described as a drum pattern or not with a mapping
+        of pitches to frequency bands"""
+        cells = np.unique(roll.steps * 128 + roll.pitches)
+        return roll.n_steps, bool(drums), mapping, cells.tobytes()
+
+    def lookup(self, key, compute):
+        """Returns a copy of the descriptors cached for the key, calling `compute()` to compute them on a miss"""
+        try:
+            result = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            result = compute()
+            self._entries[key] = result
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+
+        return dict(result)
+
+    def clear(self):
+        """Removes all patterns and resets the counters"""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __repr__(self):
+        return (
+            f"DescriptorCache(maxsize={self.maxsize}, size={len(self)}, "
+            f"hits={self.hits}, misses={self.misses})"
+        )
@@ -142,17 +142,17 @@ def density(pattern):
 
 def noi(roll):
     """Returns the number of instruments (noi) used in the roll"""
-    return (roll.sum(axis=0) > 0).sum()
+    return (roll.sum(axis=-2) > 0).sum(axis=-1)
 
 
 def get_n_onset_steps(roll):
     """Returns the number of steps with onsets"""
-    return (roll.sum(axis=1) > 0).sum()
+    return (roll.sum(axis=-1) > 0).sum(axis=-1)
 
 
 def step_density(roll):
     """Returns the percentage of steps with onsets"""
-    return get_n_onset_steps(roll) / len(roll)
+    return get_n_onset_steps(roll) / roll.shape[-2]
 
 
 def bandness(pattern, n_onset_steps):
@@ -173,6 +173,38 @@ def syness(pattern):
     return syncopation16(pattern) / d if d else 0
 
 
+def _instrumental_weight(event, event_next):
+    """Returns the instrumental weight of a polyphonic syncopation between two [low, mid, hi] events, or None"""
+    # analyze what type of syncopation is found to assign instrumental weight
+    # instrumental weight depends on the relationship between the instruments in the pair
+
+    instrumental_weight = None
+
+    # Three-stream syncopation
+    # Low against mid and hi
+    if event[0] == 1 and event_next[1] == 1 and event_next[2] == 1:
+        instrumental_weight = 2
+
+    # Mid against low and high
+    if event[1] == 1 and event_next[0] == 1 and event_next[2] == 1:
+        instrumental_weight = 1
+
+    # Two-stream syncopation
+    # Low or mid against high
+    if (event[0] == 1 or event[1] == 1) and event_next == [0, 0, 1]:
+        instrumental_weight = 5
+
+    # Low against mid (NOTE: not defined in [Witek et al., 2014])
+    if event == [1, 0, 0] and event_next == [0, 1, 0]:
+        instrumental_weight = 2
+
+    # Mid against low (NOTE: not defined in [Witek et al., 2014])
+    if event == [0, 1, 0] and event_next == [1, 0, 0]:
+        instrumental_weight = 2
+
+    return instrumental_weight
+
+
 def poly_sync(low_stream, mid_stream, hi_stream):
     """Computes the polyphonic syncopation of a rhythm, as described in [Witek et al., 2014].
 
@@ -204,32 +236,7 @@ def poly_sync(low_stream, mid_stream, hi_stream):
         # syncopation occurs when adjacent events are different, and succeeding event has greater or equal metric weight
         if event != event_next and salience_w[next_ix] >= salience_w[ix]:
             # only process if there is a syncopation
-            # analyze what type of syncopation is found to assign instrumental weight
-            # instrumental weight depends on the relationship between the instruments in the pair
-
-            instrumental_weight = None
-
-            # Three-stream syncopation
-            # Low against mid and hi
-            if event[0] == 1 and event_next[1] == 1 and event_next[2] == 1:
-                instrumental_weight = 2
-
-            # Mid against low and high
-            if event[1] == 1 and event_next[0] == 1 and event_next[2] == 1:
-                instrumental_weight = 1
-
-            # Two-stream syncopation
-            # Low or mid against high
-            if (event[0] == 1 or event[1] == 1) and event_next == [0, 0, 1]:
-                instrumental_weight = 5
-
-            # Low against mid (NOTE: not defined in [Witek et al., 2014])
-            if event == [1, 0, 0] and event_next == [0, 1, 0]:
-                instrumental_weight = 2
-
-            # Mid against low (NOTE: not defined in [Witek et al., 2014])
-            if event == [0, 1, 0] and event_next == [1, 0, 0]:
-                instrumental_weight = 2
+            instrumental_weight = _instrumental_weight(event, event_next)
 
             local_syncopation = 0
             if instrumental_weight:
@@ -285,3 +292,162 @@ def poly_balance(low_stream, mid_stream, hi_stream):
 def poly_density(low_stream, mid_stream, hi_stream):
     # compute the total number of onsets
     return density(low_stream) + density(mid_stream) + density(hi_stream)
+
+
+# Batched descriptors
+#
+# The following functions compute the descriptors above for many patterns at once. Patterns are stacked along the
+# leading axes of an array and each descriptor is computed along the last axis, e.g. a (B, 16) array of monophonic
+# patterns results in a (B,) array of values.
+
+ISO_ANGLE_16 = 2 * math.pi / 16
+
+
+def density_batch(patterns):
+    """Computes the density of each pattern along the last axis"""
+    return (np.asarray(patterns) > 0).sum(axis=-1)
+
+
+def _sync_contributions():
+    """Returns the syncopation contributed by an onset at each step of a 16-step pattern that precedes a silence"""
+    salience_lhl = np.array([5, 1, 2, 1, 3, 1, 2, 1, 4, 1, 2, 1, 3, 1, 2, 1])
+    return np.roll(salience_lhl, -1) - salience_lhl
+
+
+SYNC_CONTRIBUTIONS = _sync_contributions()
+
+# Awareness of each quarter of a 16-step pattern, as in `syncopation16_awareness`
+AWARENESS = np.repeat([5, 1, 4, 2], 4)
+
+
+def _sync_mask(patterns):
+    """Returns a mask of the onsets that precede a silence in each pattern along the last axis"""
+    patterns = np.asarray(patterns) > 0
+    return patterns & ~np.roll(patterns, -1, axis=-1)
+
+
+def syncopation16_batch(patterns):
+    """Computes the syncopation of each 16-step pattern along the last axis. See `syncopation16`."""
+    return _sync_mask(patterns) @ SYNC_CONTRIBUTIONS
+
+
+def syncopation16_awareness_batch(patterns):
+    """Computes the awareness-weighted syncopation of each 16-step pattern along the last axis. See
+    `syncopation16_awareness`."""
+    return _sync_mask(patterns) @ (SYNC_CONTRIBUTIONS * AWARENESS)
+
+
+def syness_batch(patterns):
+    """Computes the syncopation divided by the number of onsets of each pattern along the last axis"""
+    d = density_batch(patterns)
+    sync = syncopation16_batch(patterns)
+    return np.divide(sync, d, out=np.zeros(d.shape), where=d > 0)
+
+
+def _circular_sum(patterns):
+    """Returns the sum of the unit vectors at the onset positions of each pattern along the last axis"""
+    angles = np.arange(patterns.shape[-1]) * ISO_ANGLE_16
+    return patterns @ np.cos(angles), patterns @ np.sin(angles)
+
+
+def balance_batch(patterns):
+    """Computes the balance of each 16-step pattern along the last axis. See `balance`."""
+    patterns = (np.asarray(patterns) > 0).astype(float)
+    d = patterns.sum(axis=-1)
+    x, y = _circular_sum(patterns)
+    magnitude = np.divide(np.hypot(x, y), d, out=np.zeros(d.shape), where=d > 0)
+    return 1 - magnitude
+
+
+def evenness_batch(patterns):
+    """Computes the evenness of each 16-step pattern along the last axis. See `evenness`."""
+    patterns = np.asarray(patterns) > 0
+    d = patterns.sum(axis=-1)
+    safe_d = np.maximum(d, 1)[..., None]
+
+    # The i-th onset of a pattern is compared to the i-th vertex of a d-sided polygon rotated to the first onset
+    ranks = np.cumsum(patterns, axis=-1) - 1
+    first_onset_step = np.argmax(patterns, axis=-1)[..., None]
+    steps = np.arange(patterns.shape[-1])
+    iso_angles = ranks * (2 * math.pi / safe_d)
+    cosines = np.abs(
+        np.cos(iso_angles - steps * ISO_ANGLE_16 + first_onset_step * ISO_ANGLE_16)
+    )
+
+    return np.where(patterns, cosines, 0).sum(axis=-1) / safe_d[..., 0]
+
+
+def poly_balance_batch(low_streams, mid_streams, hi_streams):
+    """Computes the polyphonic balance of each pattern along the last axis. See `poly_balance`."""
+    low_streams = (np.asarray(low_streams) > 0).astype(float)
+    mid_streams = (np.asarray(mid_streams) > 0).astype(float)
+    hi_streams = (np.asarray(hi_streams) > 0).astype(float)
+
+    d = (
+        low_streams.sum(axis=-1) * 3
+        + mid_streams.sum(axis=-1) * 2
+        + hi_streams.sum(axis=-1)
+    )
+
+    # As in `poly_balance`, the high band vectors are weighted by 2
+    x_low, y_low = _circular_sum(low_streams)
+    x_mid, y_mid = _circular_sum(mid_streams)
+    x_hi, y_hi = _circular_sum(hi_streams)
+    x = 3 * x_low + 2 * x_mid + 2 * x_hi
+    y = 3 * y_low + 2 * y_mid + 2 * y_hi
+
+    magnitude = np.divide(np.hypot(x, y), d, out=np.zeros(d.shape), where=d > 0)
+    return 1 - magnitude
+
+
+def _poly_sync_tables():
+    """Builds the lookup tables of the polyphonic syncopation kernel.
+
+    Each step of a polyphonic pattern is encoded as a 3-bit code, low + 2 * mid + 4 * hi. The instrumental weight of a
+    pair of adjacent steps is then found at [code, next_code] in an 8x8 transition table, where 0 means that the pair
+    is not a syncopation.
+    """
+
+    # Metric profile as described by Witek et al. (2014)
+    salience_w = np.array(
+        [0, -3, -2, -3, -1, -3, -2, -3, -1, -3, -2, -3, -1, -3, -2, -3]
+    )
+
+    weights = np.zeros((8, 8), dtype=int)
+    for code in range(8):
+        event = [code & 1, code >> 1 & 1, code >> 2 & 1]
+        for next_code in range(8):
+            event_next = [next_code & 1, next_code >> 1 & 1, next_code >> 2 & 1]
+            if event != event_next:
+                weights[code, next_code] = _instrumental_weight(event, event_next) or 0
+
+    # The metric part of a syncopation at each step, which is masked if the next step has a lower metric weight
+    next_salience_w = np.roll(salience_w, -1)
+    metric_weights = np.where(
+        next_salience_w >= salience_w, abs(salience_w - next_salience_w), -1
+    )
+
+    return weights, metric_weights
+
+
+POLY_SYNC_WEIGHTS, POLY_SYNC_METRIC_WEIGHTS = _poly_sync_tables()
+
+
+def poly_sync_codes(low_streams, mid_streams, hi_streams):
+    """Encodes the low, mid and hi state of each step as a 3-bit code"""
+    return (
+        (np.asarray(low_streams) > 0)
+        + (np.asarray(mid_streams) > 0) * 2
+        + (np.asarray(hi_streams) > 0) * 4
+    ).astype(np.uint8)
+
+
+def poly_sync_batch(low_streams, mid_streams, hi_streams):
+    """Computes the polyphonic syncopation of each 16-step pattern along the last axis. See `poly_sync`."""
+    codes = poly_sync_codes(low_streams, mid_streams, hi_streams)
+    instrumental_weights = POLY_SYNC_WEIGHTS[codes, np.roll(codes, -1, axis=-1)]
+
+    is_sync = (instrumental_weights > 0) & (POLY_SYNC_METRIC_WEIGHTS >= 0)
+    local_syncopation = POLY_SYNC_METRIC_WEIGHTS + instrumental_weights
+
+    return np.where(is_sync, local_syncopation, 0).sum(axis=-1)
@@ -0,0 +1,185 @@
+"""
+Pairwise rhythmic distances between patterns, computed in tiles.
+
+The distance matrix of a large corpus may not fit in memory, so it is computed one tile of rows and columns at a time
+and written to an output array, which can be a memmap on disk. Tiles can be computed by several threads.
+
+Rhythmic distances are computed from patterns packed as bitmasks (see `rhythmtoolbox.bitmask`):
+
+- hamming: the number of steps that differ, counted with a popcount table
+- pad: the Hamming distance with each difference weighted by the awareness of its quarter of the bar, as in Pad
+- sad: the difference in syncopation of each quarter of the bar, weighted by the awareness of the quarter, as in Sad
+
+Polyphonic distances are the sums of the distances of the frequency bands. Distances in descriptor space are Euclidean
+distances between descriptor vectors, which can be standardized and weighted first with `DescriptorIndex.transform`.
+
+See Gómez Marín, D., Jordà Puig, S., & Boyer, H. (2015). Pad and Sad: Two awareness-Weighted rhythmic similarity
+distances. In Proceedings of the 16th International Society for Music Information Retrieval (ISMIR) Conference.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from rhythmtoolbox.descriptors import AWARENESS, SYNC_CONTRIBUTIONS, _sync_mask
+from rhythmtoolbox.midi_mapping import BANDS
+from rhythmtoolbox.tables import get_table, unpack_patterns
+
+
+def _as_masks(patterns, fields):
+    """Returns patterns as a (N, K) array of uint16 bitmasks, with the masks of the given fields of each bar"""
+    patterns = np.asarray(patterns)
+    if patterns.dtype.names is not None:
+        patterns = np.stack([patterns[field] for field in fields], axis=-1)
+    elif patterns.dtype != np.uint16:
+        raise ValueError(
+            f"Invalid patterns dtype `{patterns.dtype}`. Must be BITMASK_DTYPE or uint16"
+        )
+    return patterns.reshape(len(patterns), -1)
+
+
+def _quarter_syncopation(masks):
+    """Returns the syncopation of each quarter of each bitmask, weighted by the awareness of the quarter"""
+    contributions = _sync_mask(unpack_patterns(masks)) * (
+        SYNC_CONTRIBUTIONS * AWARENESS
+    )
+    quarters = contributions.reshape(masks.shape + (4, 4)).sum(axis=-1)
+    return quarters.reshape(len(masks), -1).astype(np.int16)
+
+
+def _popcount_distance(table):
+    """Returns a tile function that sums the table values of the XOR of each pair of masks"""
+    # The table values are small counts, which are faster to gather as bytes
+    table = table.astype(np.uint8)
+    max_value = int(table.max())
+
+    def distance(a, b):
+        # Sums are accumulated as uint16 while they cannot overflow, i.e. for patterns of up to a few hundred bars
+        dtype = np.uint16 if a.shape[1] * max_value < 2**16 else np.int64
+        result = np.zeros((len(a), len(b)), dtype)
+        for k in range(a.shape[1]):
+            result += table[a[:, k, None] ^ b[None, :, k]]
+        return result
+
+    return distance
+
+
+def _l1_distance(a, b):
+    result = np.zeros((len(a), len(b)), np.int32)
+    for k in range(a.shape[1]):
+        result += np.abs(a[:, k, None] - b[None, :, k])
+    return result
+
+
+def _euclidean_distance(a, b):
+    result = np.zeros((len(a), len(b)))
+    for k in range(a.shape[1]):
+        result += (a[:, k, None] - b[None, :, k]) ** 2
+    return np.sqrt(result, out=result)
+
+
+# Each metric is a function that prepares the patterns, and a function that computes a tile from prepared patterns
+METRICS = {
+    "hamming": (_as_masks, lambda: _popcount_distance(get_table("density"))),
+    "pad": (_as_masks, lambda: _popcount_distance(get_table("densityAwareness"))),
+    "sad": (
+        lambda patterns, fields: _quarter_syncopation(_as_masks(patterns, fields)),
+        lambda: _l1_distance,
+    ),
+    "euclidean": (
+        lambda values, fields: np.asarray(values, dtype=np.float64),
+        lambda: _euclidean_distance,
+    ),
+}
+
+
+def pairwise_distances(
+    x,
+    y=None,
+    metric="hamming",
+    fields=BANDS,
+    out=None,
+    dtype=np.float32,
+    tile_size=512,
+    workers=1,
+):
+    """Computes the distances between every pattern of `x` and every pattern of `y`.
+
+    Parameters
+        x, np.ndarray
+        For rhythmic metrics, N patterns as an array of dtype BITMASK_DTYPE of shape (N,) or (N, n_bars), or as uint16
+        bitmasks of monophonic patterns. For "euclidean", a (N, D) matrix of descriptors.
+
+        y, np.ndarray
+        M patterns like `x`, with the same number of bars. If not given, the distances between the patterns of `x`
+        are computed, which are symmetric so that only half of the tiles are computed.
+
+        metric, str
+        One of METRICS
+
+        fields, list
+        The fields of patterns of dtype BITMASK_DTYPE to compare. Polyphonic distances, the sum of the distances of the
+        frequency bands, by default. Use ["any"] to compare the steps with onsets of any instrument.
+
+        out, np.ndarray
+        A (N, M) array to write to, e.g. a memmap from `np.lib.format.open_memmap`
+
+        dtype, np.dtype
+        The dtype of the output array if `out` is not given
+
+        tile_size, int
+        The number of rows and columns of each tile
+
+        workers, int
+        The number of threads that compute tiles
+
+    Returns
+        A (N, M) array of distances
+    """
+    if metric not in METRICS:
+        raise ValueError(
+            f"Invalid metric `{metric}`. Must be one of {', '.join(METRICS)}"
+        )
+    if tile_size <= 0:
+        raise ValueError(f"Invalid tile_size `{tile_size}`. Must be positive")
+
+    prepare, get_distance = METRICS[metric]
+    distance = get_distance()
+    symmetric = y is None
+    a = prepare(x, fields)
+    b = a if symmetric else prepare(y, fields)
+    if a.shape[1:] != b.shape[1:]:
+        raise ValueError(
+            f"Invalid patterns shapes `{a.shape}` and `{b.shape}`. Must have the same number of bars or descriptors"
+        )
+
+    shape = (len(a), len(b))
+    if out is None:
+        out = np.empty(shape, dtype)
+    elif out.shape != shape:
+        raise ValueError(f"Invalid output shape `{out.shape}`. Must be {shape}")
+
+    def compute(tile):
+        rows, cols = tile
+        values = distance(a[rows], b[cols])
+        out[rows, cols] = values
+        if symmetric and rows != cols:
+            out[cols, rows] = values.T
+
+    starts = range(0, max(shape), tile_size)
+    tiles = [
+        (slice(i, i + tile_size), slice(j, j + tile_size))
+        for i in starts[: -(-shape[0] // tile_size)]
+        for j in starts[: -(-shape[1] // tile_size)]
+        if not symmetric or j >= i
+    ]
+
+    if workers == 1:
+        for tile in tiles:
+            compute(tile)
+    else:
+        with ThreadPoolExecutor(workers) as executor:
+            for _ in executor.map(compute, tiles):
+                pass
+
+    return out
@@ -0,0 +1,172 @@
+"""
+Selective computation of descriptors from bitmasks.
+
+Descriptors and the intermediate values they share, such as the number of steps with onsets or the unpacked band
+patterns, are nodes of a small dependency graph. Computing a set of descriptors evaluates only the nodes they depend
+on, each once.
+
+All nodes are computed for a batch of patterns stored as bitmasks, an array of dtype BITMASK_DTYPE of shape
+(B, n_bars), and result in arrays of shape (B,).
+"""
+
+import numpy as np
+
+from rhythmtoolbox import profiling
+from rhythmtoolbox.descriptors import poly_balance_batch, poly_sync_batch
+from rhythmtoolbox.midi_mapping import BANDS
+from rhythmtoolbox.tables import get_table, lookup, unpack_patterns
+
+
+def _density(masks):
+    return get_table("density")[masks].sum(axis=-1)
+
+
+def _bar_mean(descriptor, field):
+    """Returns a node function that averages a monophonic descriptor of a bitmask field over the bars"""
+    return lambda bars: lookup(descriptor, bars[field]).mean(axis=-1)
+
+
+def _poly_evenness(bars):
+    evenness = get_table("evenness")
+    return (
+        evenness[bars["low"]] * 3 + evenness[bars["mid"]] * 2 + evenness[bars["hi"]]
+    ).mean(axis=-1)
+
+
+# Each node is computed by calling its function with the values of its dependencies.
+# The inputs `bars`, `n_steps` and `noi` are provided by the caller.
+NODES = {
+    "n_onset_steps": (("bars",), lambda bars: _density(bars["any"])),
+    "band_patterns": (
+        ("bars",),
+        lambda bars: [unpack_patterns(bars[band]) for band in BANDS],
+    ),
+    "lowDensity": (("bars",), lambda bars: _density(bars["low"])),
+    "midDensity": (("bars",), lambda bars: _density(bars["mid"])),
+    "hiDensity": (("bars",), lambda bars: _density(bars["hi"])),
+    "polyDensity": (
+        ("lowDensity", "midDensity", "hiDensity"),
+        lambda low, mid, hi: low + mid + hi,
+    ),
+    "lowness": (("lowDensity", "n_onset_steps"), lambda d, n: d / np.maximum(n, 1)),
+    "midness": (("midDensity", "n_onset_steps"), lambda d, n: d / np.maximum(n, 1)),
+    "hiness": (("hiDensity", "n_onset_steps"), lambda d, n: d / np.maximum(n, 1)),
+    "stepDensity": (
+        ("n_onset_steps", "n_steps"),
+        lambda n, n_steps: n / max(n_steps, 1),
+    ),
+    "sync": (("bars",), _bar_mean("sync", "any")),
+    "lowSync": (("bars",), _bar_mean("sync", "low")),
+    "midSync": (("bars",), _bar_mean("sync", "mid")),
+    "hiSync": (("bars",), _bar_mean("sync", "hi")),
+    "syness": (("bars",), _bar_mean("syness", "any")),
+    "lowSyness": (("bars",), _bar_mean("syness", "low")),
+    "midSyness": (("bars",), _bar_mean("syness", "mid")),
+    "hiSyness": (("bars",), _bar_mean("syness", "hi")),
+    "balance": (("bars",), _bar_mean("balance", "any")),
+    "polyBalance": (
+        ("band_patterns",),
+        lambda bands: poly_balance_batch(*bands).mean(axis=-1),
+    ),
+    "evenness": (("bars",), _bar_mean("evenness", "any")),
+    "polyEvenness": (("bars",), _poly_evenness),
+    "polySync": (
+        ("band_patterns",),
+        lambda bands: poly_sync_batch(*bands).mean(axis=-1),
+    ),
+}
+
+# Intermediate values that are not descriptors
+INTERMEDIATES = ["n_onset_steps", "band_patterns"]
+
+# Descriptors that are defined for non-drum patterns
+NON_DRUM_DESCRIPTORS = [
+    "noi",
+    "polyDensity",
+    "stepDensity",
+    "sync",
+    "syness",
+    "balance",
+    "evenness",
+]
+
+# Without frequency bands, the polyphonic density is the number of steps with onsets
+NON_DRUM_NODES = {
+    **{
+        name: node
+        for name, node in NODES.items()
+        if name in INTERMEDIATES or name in NON_DRUM_DESCRIPTORS
+    },
+    "polyDensity": (("n_onset_steps",), lambda n: n),
+}
+
+# Descriptors that are valid only for 16-step patterns, computed as the mean over the bars of longer patterns
+BAR_DESCRIPTORS = [
+    "sync",
+    "lowSync",
+    "midSync",
+    "hiSync",
+    "syness",
+    "lowSyness",
+    "midSyness",
+    "hiSyness",
+    "balance",
+    "polyBalance",
+    "evenness",
+    "polyEvenness",
+    "polySync",
+]
+
+
+def compute_descriptors(names, bars, n_steps, noi=None, drums=True):
+    """Computes the given descriptors and the intermediate values they depend on.
+
+    Parameters
+        names, list
+        The names of the descriptors, or of other nodes such as `n_onset_steps`
+
+        bars, np.ndarray
+        A (B, n_bars) array of dtype BITMASK_DTYPE. An incomplete last bar must be padded with silence.
+
+        n_steps, int
+        The number of steps of the patterns
+
+        noi, callable
+        A function that returns the number of instruments of each pattern, called only if `noi` is requested. The
+        noi descriptor is NaN if not given.
+
+        drums, bool
+        Indicates whether the patterns are drum patterns
+
+    Returns
+        A dict of {name: (B,) array of values}. Descriptors that are not defined for the patterns are NaN.
+    """
+    values = {"bars": bars, "n_steps": n_steps}
+    nodes = NODES if drums else NON_DRUM_NODES
+    undefined = np.full(len(bars), np.nan)
+
+    def get(name):
+        if name not in values:
+            if name == "noi":
+                if noi is None:
+                    values[name] = undefined
+                else:
+                    with profiling.stage("descriptors.noi"):
+                        values[name] = np.asarray(noi())
+            else:
+                deps, fn = nodes[name]
+                args = [get(dep) for dep in deps]
+                with profiling.stage(f"descriptors.{name}"):
+                    values[name] = fn(*args)
+        return values[name]
+
+    result = {}
+    for name in names:
+        if name != "noi" and name not in nodes:
+            result[name] = undefined
+        elif name in BAR_DESCRIPTORS and (n_steps == 0 or n_steps % 16 != 0):
+            result[name] = undefined
+        else:
+            result[name] = get(name)
+
+    return result
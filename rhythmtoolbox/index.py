@@ -0,0 +1,297 @@
+"""
+Nearest neighbour queries over descriptor vectors.
+
+A DescriptorIndex stores the descriptors of a corpus of patterns, e.g. from `pianorolls2descriptors`, as points of a
+rhythm space in which each descriptor is standardized to zero mean and unit variance over the corpus and then scaled by
+a weight. The most similar patterns to a query are its nearest points in Euclidean distance. They are found with a
+KD-tree, which answers single queries over millions of patterns in milliseconds, as the descriptors of drum patterns
+are concentrated in a small part of the space. Large batches of queries can be faster by brute force over blocks of
+points, which is a matrix product per block.
+"""
+
+import numpy as np
+
+METHODS = ["kdtree", "brute"]
+
+
+class DescriptorIndex:
+    """An index of descriptor vectors for k-nearest neighbour and radius queries.
+
+    values, np.ndarray or list
+        A (N, D) matrix of descriptors, e.g. from `pianorolls2descriptors`, or a list of N descriptor dicts
+
+    descriptors, list
+        The names of the D descriptors in the columns of `values`, or of the descriptors to index from dicts. All
+        descriptors by default.
+
+    weights, dict or list
+        The weight of each descriptor, as a dict of {descriptor_name: weight} or a list of D weights. 1 by default.
+
+    method, str
+        "kdtree" to use a `scipy.spatial.cKDTree`, or "brute" to compare queries with blocks of points
+
+    block_size, int
+        The number of points compared at once by brute force
+
+    Undefined descriptors, which are NaN or None, are placed at the mean of the corpus. Indices returned by queries are
+    row numbers of `values`.
+    """
+
+    def __init__(
+        self,
+        values,
+        descriptors=None,
+        weights=None,
+        method="kdtree",
+        block_size=65536,
+    ):
+        from rhythmtoolbox import _get_descriptor_names
+
+        self.descriptors = _get_descriptor_names(descriptors)
+        values = self._as_matrix(values)
+
+        mean = np.nanmean(values, axis=0) if len(values) else np.zeros(values.shape[1])
+        std = np.nanstd(values, axis=0) if len(values) else np.ones(values.shape[1])
+        mean[np.isnan(mean)] = 0
+        std[np.isnan(std) | (std == 0)] = 1
+
+        self._init(mean, std, self._get_weights(weights), None, method, block_size)
+        self.points = self.transform(values)
+        self._build()
+
+    def _init(self, mean, std, weights, points, method, block_size):
+        if method not in METHODS:
+            raise ValueError(
+                f"Invalid method `{method}`. Must be one of {', '.join(METHODS)}"
+            )
+        if block_size <= 0:
+            raise ValueError(f"Invalid block_size `{block_size}`. Must be positive")
+
+        self.mean = mean
+        self.std = std
+        self.weights = weights
+        self.points = points
+        self.method = method
+        self.block_size = block_size
+
+    def _build(self):
+        self._tree = None
+        self._sq_norms = None
+        if self.method == "kdtree":
+            from scipy.spatial import cKDTree
+
+            self._tree = cKDTree(self.points)
+        else:
+            self._sq_norms = np.einsum("ij,ij->i", self.points, self.points)
+
+    def _get_weights(self, weights):
+        if weights is None:
+            return np.ones(len(self.descriptors))
+
+        if isinstance(weights, dict):
+            invalid = [d for d in weights if d not in self.descriptors]
+            if invalid:
+                raise ValueError(
+                    f"Invalid weights for `{', '.join(invalid)}`, which are not indexed"
+                )
+            weights = [weights.get(name, 1) for name in self.descriptors]
+
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape != (len(self.descriptors),):
+            raise ValueError(
+                f"Invalid weights shape `{weights.shape}`. Must be ({len(self.descriptors)},)"
+            )
+        return weights
+
+    def _as_matrix(self, values):
+        """Returns descriptor dicts, or a single dict or vector, as a 2D matrix of the indexed descriptors"""
+        from rhythmtoolbox import DESCRIPTOR_INDEX, descriptors2array
+
+        if isinstance(values, dict) or (
+            isinstance(values, (list, tuple)) and values and isinstance(values[0], dict)
+        ):
+            columns = [DESCRIPTOR_INDEX[name] for name in self.descriptors]
+            values = descriptors2array(values)[..., columns]
+
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values.reshape(1, -1)
+        if values.ndim != 2 or values.shape[1] != len(self.descriptors):
+            raise ValueError(
+                f"Invalid descriptors shape `{values.shape}`. Must be (N, {len(self.descriptors)})"
+            )
+        return values
+
+    def transform(self, values):
+        """Maps descriptors to points of the index space"""
+        points = (self._as_matrix(values) - self.mean) / self.std
+        points[np.isnan(points)] = 0
+        points *= self.weights
+        return points
+
+    def _query_blocks(self, queries):
+        """Yields the start of each block of points and the squared distances of the queries to its points"""
+        q_sq_norms = np.einsum("ij,ij->i", queries, queries)
+        for start in range(0, len(self.points), self.block_size):
+            stop = start + self.block_size
+            sq_dists = queries @ self.points[start:stop].T
+            sq_dists *= -2
+            sq_dists += q_sq_norms[:, None]
+            sq_dists += self._sq_norms[None, start:stop]
+            np.maximum(sq_dists, 0, out=sq_dists)
+            yield start, sq_dists
+
+    def _query_chunks(self, queries):
+        """Splits queries into chunks whose distances to a block of points fit in about 64 MB"""
+        chunksize = max(1, 2**23 // self.block_size)
+        for start in range(0, len(queries), chunksize):
+            yield queries[start : start + chunksize]
+
+    def query(self, values, k=1, workers=1):
+        """Finds the k nearest indexed patterns to each query.
+
+        values, np.ndarray, dict or list
+            The descriptors of the queries, as a (M, D) or (D,) array, a descriptor dict or a list of M dicts
+
+        k, int
+            The number of neighbours. At most the number of indexed patterns are returned.
+
+        workers, int
+            The number of threads of KD-tree queries, or -1 for all CPUs
+
+        Returns (distances, indices), two (M, k) arrays sorted by increasing distance
+        """
+        if k <= 0:
+            raise ValueError(f"Invalid k `{k}`. Must be positive")
+
+        queries = self.transform(values)
+        k = min(k, len(self))
+        if k == 0:
+            return np.empty((len(queries), 0)), np.empty((len(queries), 0), int)
+
+        if self._tree is not None:
+            distances, indices = self._tree.query(queries, k=k, workers=workers)
+            return distances.reshape(-1, k), indices.reshape(-1, k)
+
+        distances = np.empty((len(queries), k))
+        indices = np.empty((len(queries), k), int)
+        row = 0
+        for chunk in self._query_chunks(queries):
+            rows = slice(row, row + len(chunk))
+            distances[rows], indices[rows] = self._knn_brute(chunk, k)
+            row += len(chunk)
+        return distances, indices
+
+    def _knn_brute(self, queries, k):
+        best = np.full((len(queries), k), np.inf)
+        best_ix = np.zeros((len(queries), k), int)
+
+        for start, sq_dists in self._query_blocks(queries):
+            # Keep the k nearest points of the block, then the k nearest of those and the best so far
+            if k < sq_dists.shape[1]:
+                ix = np.argpartition(sq_dists, k - 1, axis=1)[:, :k]
+                sq_dists = np.take_along_axis(sq_dists, ix, axis=1)
+            else:
+                ix = np.broadcast_to(np.arange(sq_dists.shape[1]), sq_dists.shape)
+
+            candidates = np.concatenate([best, sq_dists], axis=1)
+            candidates_ix = np.concatenate([best_ix, ix + start], axis=1)
+            keep = np.argpartition(candidates, k - 1, axis=1)[:, :k]
+            best = np.take_along_axis(candidates, keep, axis=1)
+            best_ix = np.take_along_axis(candidates_ix, keep, axis=1)
+
+        order = np.argsort(best, axis=1, kind="stable")
+        best = np.sqrt(np.take_along_axis(best, order, axis=1))
+        return best, np.take_along_axis(best_ix, order, axis=1)
+
+    def query_radius(self, values, r, workers=1):
+        """Finds the indexed patterns within a distance of each query.
+
+        values, np.ndarray, dict or list
+            The descriptors of the queries, as for `query`
+
+        r, float
+            The maximum distance, in the index space
+
+        workers, int
+            The number of threads of KD-tree queries, or -1 for all CPUs
+
+        Returns (distances, indices), two lists with an array per query sorted by increasing distance
+        """
+        queries = self.transform(values)
+
+        if self._tree is not None:
+            neighbours = self._tree.query_ball_point(queries, r, workers=workers)
+            matches = []
+            for query, ix in zip(queries, neighbours):
+                ix = np.asarray(ix, dtype=int)
+                matches.append(
+                    (np.sqrt(((self.points[ix] - query) ** 2).sum(axis=1)), ix)
+                )
+        else:
+            matches = []
+            for chunk in self._query_chunks(queries):
+                matches.extend(self._radius_brute(chunk, r))
+
+        distances, indices = [], []
+        for dists, ix in matches:
+            order = np.lexsort((ix, dists))
+            distances.append(dists[order])
+            indices.append(ix[order])
+        return distances, indices
+
+    def _radius_brute(self, queries, r):
+        found = [([], []) for _ in queries]
+        for start, sq_dists in self._query_blocks(queries):
+            rows, cols = np.nonzero(sq_dists <= r * r)
+            bounds = np.searchsorted(rows, np.arange(len(queries) + 1))
+            for (dists, ix), lo, hi in zip(found, bounds[:-1], bounds[1:]):
+                dists.append(np.sqrt(sq_dists[rows[lo:hi], cols[lo:hi]]))
+                ix.append(cols[lo:hi] + start)
+
+        return [
+            (
+                np.concatenate(dists) if dists else np.empty(0),
+                np.concatenate(ix) if ix else np.empty(0, int),
+            )
+            for dists, ix in found
+        ]
+
+    def save(self, filepath):
+        """Saves the index to an .npz file"""
+        np.savez(
+            filepath,
+            descriptors=np.array(self.descriptors),
+            mean=self.mean,
+            std=self.std,
+            weights=self.weights,
+            points=self.points,
+            method=np.array(self.method),
+            block_size=np.array(self.block_size),
+        )
+
+    @classmethod
+    def load(cls, filepath):
+        """Loads an index saved with `save`"""
+        with np.load(filepath, allow_pickle=False) as data:
+            index = cls.__new__(cls)
+            index.descriptors = data["descriptors"].tolist()
+            index._init(
+                data["mean"],
+                data["std"],
+                data["weights"],
+                data["points"],
+                str(data["method"]),
+                int(data["block_size"]),
+            )
+        index._build()
+        return index
+
+    def __len__(self):
+        return len(self.points)
+
+    def __repr__(self):
+        return (
+            f"DescriptorIndex(n_patterns={len(self)}, n_descriptors={len(self.descriptors)}, "
+            f"method={self.method!r})"
+        )
@@ -1,4 +1,11 @@
-"""A mapping of the General MIDI Percussion Key Map (GMPKM) to three frequency levels: low, mid, and high"""
+"""A mapping of the General MIDI Percussion Key Map (GMPKM) to three frequency levels: low, mid, and high
+
+Mappings of MIDI pitches to the bands are compiled into a (128, 3) boolean matrix, so that the bands of every step of a
+piano roll, or of a batch of piano rolls, are computed with a single matrix product. The General MIDI mapping below is
+registered as "gm", and mappings of other kits can be added with `register_mapping`.
+"""
+
+import numpy as np
 
 low_instruments = [35, 36, 41, 45, 47, 64]
 mid_instruments = [37, 38, 39, 40, 43, 48, 50, 58, 61, 62, 65, 77]
@@ -90,34 +97,99 @@ GM_dict = {
 }
 
 
-def get_band(roll, band="low"):
+# The names of the frequency bands, in the order of the columns of a band matrix
+BANDS = ["low", "mid", "hi"]
+
+# The band matrix of each mapping, and the pitches in any band with their rows of the matrix as floats
+_MAPPINGS = {}
+
+
+def register_mapping(name, low, mid, hi):
+    """Registers a mapping of MIDI pitches to the low, mid and high frequency bands.
+
+    name, str
+        The name used to select the mapping, e.g. `pianoroll2descriptors(roll, mapping=name)`
+
+    low, mid, hi, list
+        The MIDI pitches of the instruments in each band. A pitch can be in several bands, or in none.
+
+    Mappings are module state, so worker processes that are not forked must register them again.
+    """
+    matrix = np.zeros((128, len(BANDS)), bool)
+    for ix, pitches in enumerate([low, mid, hi]):
+        pitches = np.asarray(pitches, dtype=int).reshape(-1)
+        if np.any((pitches < 0) | (pitches > 127)):
+            raise ValueError(f"Invalid {BANDS[ix]} pitches. Must be in [0, 127]")
+        matrix[pitches, ix] = True
+
+    matrix.setflags(write=False)
+    pitches = np.nonzero(matrix.any(axis=1))[0]
+    _MAPPINGS[name] = (matrix, pitches, matrix[pitches].astype(np.float32))
+
+
+def _get_mapping(mapping):
+    try:
+        return _MAPPINGS[mapping]
+    except KeyError:
+        raise ValueError(
+            f"Invalid mapping `{mapping}`. Must be one of {', '.join(_MAPPINGS)}"
+        ) from None
+
+
+def get_band_matrix(mapping="gm"):
+    """Returns the read-only (128, 3) boolean matrix of a mapping, where [pitch, band] is True if the pitch is in the
+    band"""
+    return _get_mapping(mapping)[0]
+
+
+register_mapping("gm", low_instruments, mid_instruments, hi_instruments)
+
+
+def _band_counts(roll, mapping, bands=slice(None)):
+    """Returns the number of onsets of each band at each step, as a product of the columns of the roll with the band
+    matrix that skips the pitches in no band"""
+    _, pitches, weights = _get_mapping(mapping)
+    if len(pitches) and pitches[-1] >= roll.shape[-1]:
+        keep = pitches < roll.shape[-1]
+        pitches, weights = pitches[keep], weights[keep]
+    onsets = np.take(roll, pitches, axis=-1).astype(np.float32)
+    return onsets @ weights[:, bands]
+
+
+def get_band_onsets(roll, mapping="gm"):
+    """Returns a boolean array of shape (..., N, 3) indicating the steps with onsets in each frequency band.
+
+    roll, np.array
+        Piano roll of shape (N, V), or a batch of piano rolls of shape (B, N, V)
+
+    mapping, str
+        The name of a registered mapping
+    """
+    return _band_counts(roll, mapping) > 0
+
+
+def get_band(roll, band="low", mapping="gm"):
     """Returns a monophonic onset pattern of instruments in the given frequency band.
 
     roll, np.array
-        Piano roll
+        Piano roll, or a batch of piano rolls of shape (B, N, V)
 
     band, str
         "low", "mid", or "hi"
-    """
-    range_map = {
-        "low": low_instruments,
-        "mid": mid_instruments,
-        "hi": hi_instruments,
-    }
 
-    if band not in range_map:
+    mapping, str
+        The name of a registered mapping
+    """
+    if band not in BANDS:
         raise ValueError(f"Invalid band `{band}`. Must be low, mid, or hi")
 
-    return (roll[:, range_map[band]].sum(axis=1) > 0).astype(int)
+    return (_band_counts(roll, mapping, BANDS.index(band)) > 0).astype(int)
 
 
-def get_bands(roll):
+def get_bands(roll, mapping="gm"):
     """Parses the low, mid, and high frequency bands of a piano roll"""
-    return (
-        get_band(roll, band="low"),
-        get_band(roll, band="mid"),
-        get_band(roll, band="hi"),
-    )
+    onsets = get_band_onsets(roll, mapping).astype(int)
+    return onsets[..., 0], onsets[..., 1], onsets[..., 2]
 
 
 def event_to_8number(midi_notes):
@@ -164,3 +236,125 @@ def event_to_3number(midi_notes):
     output.sort()
 
     return output
+
+
+# Reductions of whole rolls. Each reduction maps the pitches of GM_dict to the columns of the reduced roll with a
+# 128-entry lookup array, where -1 is a pitch without a column.
+
+
+def _gm_lookup(get_target):
+    lookup = np.full(128, -1)
+    for pitch, values in GM_dict.items():
+        lookup[pitch] = get_target(values)
+    lookup.setflags(write=False)
+    return lookup
+
+
+GM_PITCHES = np.array(sorted(GM_dict))
+
+# The column of each pitch in a roll of the 8 instruments of `event_to_8number`, or -1 for pitches without one
+GM_8NUMBER = _gm_lookup(lambda values: values[4] - 1 if values[4] > 0 else -1)
+
+# The column of each pitch in a roll of the 3 bands of `event_to_3number`
+GM_3NUMBER = _gm_lookup(lambda values: ["low", "mid", "high"].index(values[1]))
+
+
+def _check_unknown(roll, unknown, allowed=("raise", "drop")):
+    """Raises a ValueError if `unknown` is not one of `allowed`, or if it is "raise" and the roll has onsets of pitches
+    that are not in GM_dict"""
+    if unknown not in allowed:
+        raise ValueError(
+            f"Invalid unknown `{unknown}`. Must be one of {', '.join(allowed)}"
+        )
+    if unknown != "raise":
+        return
+
+    is_unknown = np.ones(roll.shape[-1], bool)
+    is_unknown[GM_PITCHES[GM_PITCHES < roll.shape[-1]]] = False
+    pitches = np.nonzero(
+        (roll[..., is_unknown] > 0).reshape(-1, is_unknown.sum()).any(axis=0)
+    )[0]
+    if len(pitches):
+        pitches = np.nonzero(is_unknown)[0][pitches]
+        raise ValueError(
+            f"Unknown pitches `{', '.join(map(str, pitches))}`. Use unknown='drop' to ignore them"
+        )
+
+
+def _reduce_roll(roll, lookup, n_columns):
+    """Reduces the pitches of a roll to columns, keeping the maximum velocity of the pitches of each column"""
+    targets = lookup[: roll.shape[-1]]
+    pitches = np.nonzero(targets >= 0)[0]
+    pitches = pitches[np.argsort(targets[pitches], kind="stable")]
+    columns, starts = np.unique(targets[pitches], return_index=True)
+
+    reduced = np.zeros(roll.shape[:-1] + (n_columns,), roll.dtype)
+    if len(pitches):
+        reduced[..., columns] = np.maximum.reduceat(
+            np.take(roll, pitches, axis=-1), starts, axis=-1
+        )
+    return reduced
+
+
+def roll_to_8number(roll, unknown="raise"):
+    """Reduces a piano roll to the 8 instruments of `event_to_8number` in a single pass.
+
+    roll, np.ndarray
+        Piano roll of shape (N, V), or a batch of piano rolls of shape (B, N, V)
+
+    unknown, str
+        "raise" to raise a ValueError if the roll has onsets of pitches that are not in GM_dict, before any reduction,
+        or "drop" to ignore them
+
+    Returns a roll of shape (..., N, 8), where column i is instrument i + 1 with the maximum velocity of its pitches.
+    Pitches without an instrument, which are -1 in `event_to_8number`, are dropped.
+    """
+    _check_unknown(roll, unknown)
+    return _reduce_roll(roll, GM_8NUMBER, 8)
+
+
+def roll_to_3number(roll, unknown="raise"):
+    """Reduces a piano roll to the low, mid and high bands of `event_to_3number` in a single pass.
+
+    roll, np.ndarray
+        Piano roll of shape (N, V), or a batch of piano rolls of shape (B, N, V)
+
+    unknown, str
+        How to handle pitches that are not in GM_dict. See `roll_to_8number`.
+
+    Returns a roll of shape (..., N, 3) with the maximum velocity of the pitches of each band
+    """
+    _check_unknown(roll, unknown)
+    return _reduce_roll(roll, GM_3NUMBER, 3)
+
+
+def remap_roll(roll, column=2, unknown="raise"):
+    """Replaces each pitch of a piano roll with its substitute in a column of GM_dict, in a single pass.
+
+    roll, np.ndarray
+        Piano roll of shape (N, V), or a batch of piano rolls of shape (B, N, V)
+
+    column, int
+        The column of GM_dict with the substitute pitches: 2 for simplified MIDI, or 5, 6 or 7 for the 8, 16 and 3
+        note conversions
+
+    unknown, str
+        "raise" to raise a ValueError if the roll has onsets of pitches that are not in GM_dict, "drop" to remove them,
+        or "keep" to keep them unchanged
+
+    Returns a roll of shape (..., N, 128), where each pitch has the maximum velocity of the pitches it replaces
+    """
+    if column not in (2, 5, 6, 7):
+        raise ValueError(f"Invalid column `{column}`. Must be 2, 5, 6, or 7")
+
+    _check_unknown(roll, unknown, ("raise", "drop", "keep"))
+    lookup = _get_remap_lookup(column, unknown == "keep")
+    return _reduce_roll(roll, lookup, 128)
+
+
+def _get_remap_lookup(column, keep_unknown):
+    lookup = _gm_lookup(lambda values: values[column]).copy()
+    if keep_unknown:
+        unknown = lookup < 0
+        lookup[unknown] = np.nonzero(unknown)[0]
+    return lookup
@@ -0,0 +1,142 @@
+"""
+Opt-in timing of the stages of descriptor computation.
+
+When enabled, the hot paths of the package record the number of calls and the cumulative wall time of each stage:
+
+- parse.pretty_midi, parse.smf: reading a MIDI file
+- subdivisions: computing the grid of subdivisions from the beats
+- quantize: quantizing note onsets to the grid
+- resample: resampling piano rolls to a 16th note resolution
+- tables: building a lookup table of `rhythmtoolbox.tables`, once per process
+- bands: extracting the frequency bands and packing them into bitmasks
+- descriptors.<name>: computing a descriptor, or an intermediate value such as `n_onset_steps`, excluding the time of
+  its dependencies
+
+Stages can be nested, e.g. tables within the descriptor that first uses them, so the times of different stages do not
+add up to the total time. Profiling is disabled by default, in which case each instrumented call costs a single flag
+check. Stats are kept per process, so the stages of the workers of `midifiles2descriptors` are not included.
+"""
+
+import time
+from functools import wraps
+
+_enabled = False
+_stats = {}
+_sinks = []
+
+
+def enable():
+    """Starts recording stages"""
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """Stops recording stages. The stats recorded so far are kept."""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Clears the recorded stats"""
+    _stats.clear()
+
+
+def add_sink(sink):
+    """Registers a function called with `(stage, seconds)` after each recorded call, e.g. to forward timings to a
+    metrics system"""
+    _sinks.append(sink)
+
+
+def remove_sink(sink):
+    _sinks.remove(sink)
+
+
+def record(name, seconds):
+    """Adds a call of the given duration to the stats of a stage"""
+    stats = _stats.get(name)
+    if stats is None:
+        _stats[name] = [1, seconds]
+    else:
+        stats[0] += 1
+        stats[1] += seconds
+
+    for sink in _sinks:
+        sink(name, seconds)
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def stage(name):
+    """Returns a context manager that records the time of its block as a call of a stage, if profiling is enabled"""
+    return _Timer(name) if _enabled else _NULL_TIMER
+
+
+def timed(name):
+    """Decorator that records each call of a function as a call of a stage, if profiling is enabled"""
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def get_stats():
+    """Returns the recorded stats in a dict of {stage: {"calls": int, "seconds": float}}"""
+    return {
+        name: {"calls": calls, "seconds": seconds}
+        for name, (calls, seconds) in _stats.items()
+    }
+
+
+def report():
+    """Returns the recorded stats as a table, sorted by decreasing cumulative time"""
+    rows = sorted(_stats.items(), key=lambda item: item[1][1], reverse=True)
+    width = max([len("stage")] + [len(name) for name in _stats])
+
+    lines = [f"{'stage':<{width}} {'calls':>10} {'seconds':>12} {'us/call':>12}"]
+    for name, (calls, seconds) in rows:
+        lines.append(
+            f"{name:<{width}} {calls:>10} {seconds:>12.6f} {seconds / calls * 1e6:>12.1f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,244 @@
+"""
+Queries for the patterns of a stored table whose descriptors fall in target ranges or are near target values.
+
+A DescriptorTable wraps the descriptors of a corpus, e.g. from `bitmasks2descriptors`, or of an enumerated space from
+`rhythmtoolbox.space`, optionally with the bitmasks of its patterns. Rows are split into blocks, and the minimum and
+maximum of each descriptor in each block are computed on first use. A query skips the blocks whose bounds cannot
+contain a match, which makes queries over tables with correlated neighbouring rows, such as enumerated spaces, read
+only a small part of the table.
+"""
+
+import numpy as np
+
+from rhythmtoolbox.bitmask import BITMASK_DTYPE, BitmaskPattern
+from rhythmtoolbox.midi_mapping import BANDS
+
+
+class DescriptorTable:
+    """A table of descriptors that can be queried by range and by distance to a target.
+
+    values, np.ndarray
+        A structured array with a field per descriptor, e.g. a space from `rhythmtoolbox.space`, or a (N, D) matrix of
+        descriptors with columns named by `descriptors`. Memmaps are read one block at a time.
+
+    descriptors, list
+        The names of the columns of a matrix, DESCRIPTOR_NAMES by default
+
+    bars, np.ndarray
+        The patterns of the rows, as a (N, n_bars) array of dtype BITMASK_DTYPE. Without patterns, queries return only
+        the indices of the matching rows.
+
+    block_size, int
+        The number of rows of each block
+    """
+
+    def __init__(self, values, descriptors=None, bars=None, block_size=65536):
+        if block_size <= 0:
+            raise ValueError(f"Invalid block_size `{block_size}`. Must be positive")
+
+        if values.dtype.names is None:
+            from rhythmtoolbox import as_records
+
+            values = as_records(values, descriptors)
+        if bars is not None and len(bars) != len(values):
+            raise ValueError(
+                f"Invalid bars length `{len(bars)}`. Must be {len(values)}, the number of rows"
+            )
+
+        self.values = values
+        self.bars = bars
+        self.block_size = block_size
+        self._bounds = {}
+        self._scales = {}
+
+    @classmethod
+    def from_bitmasks(cls, bars, noi=None, descriptors=None, block_size=65536):
+        """Computes the descriptors of patterns stored as bitmasks. See `bitmasks2descriptors`."""
+        from rhythmtoolbox import _get_descriptor_names, bitmasks2descriptors
+
+        names = _get_descriptor_names(descriptors)
+        values = bitmasks2descriptors(
+            bars, noi, chunksize=block_size, descriptors=names
+        )
+        return cls(values, names, bars, block_size)
+
+    @classmethod
+    def from_space(cls, space, block_size=65536):
+        """Wraps a space from `rhythmtoolbox.space`.
+
+        The patterns of a polyphonic space are made of its low, mid and high bands. Rows of the monophonic space are
+        indexed by bitmask, so the indices of the matches are the bitmasks of their patterns.
+        """
+        if not all(band in space.dtype.names for band in BANDS):
+            return cls(space, block_size=block_size)
+
+        bars = np.empty((len(space), 1), BITMASK_DTYPE)
+        for band in BANDS:
+            bars[band][:, 0] = space[band]
+        bars["any"] = bars["low"] | bars["mid"] | bars["hi"]
+        return cls(space, bars=bars, block_size=block_size)
+
+    @property
+    def descriptors(self):
+        return list(self.values.dtype.names)
+
+    def _check_names(self, names):
+        invalid = [name for name in names if name not in self.values.dtype.names]
+        if invalid:
+            raise ValueError(
+                f"Invalid descriptors `{', '.join(invalid)}`. Must be in {', '.join(self.descriptors)}"
+            )
+
+    def _blocks(self):
+        return range(0, len(self), self.block_size)
+
+    def _get_bounds(self, name):
+        """Returns the minimum and maximum of a descriptor in each block, ignoring NaN"""
+        if name not in self._bounds:
+            mins = np.full(len(self._blocks()), np.nan)
+            maxs = np.full(len(self._blocks()), np.nan)
+            for ix, start in enumerate(self._blocks()):
+                column = np.asarray(self.values[name][start : start + self.block_size])
+                defined = column[~np.isnan(column)]
+                if len(defined):
+                    mins[ix], maxs[ix] = defined.min(), defined.max()
+            self._bounds[name] = mins, maxs
+        return self._bounds[name]
+
+    def _get_scale(self, name):
+        """Returns the inverse of the standard deviation of a descriptor, used to compare distances between
+        descriptors"""
+        if name not in self._scales:
+            std = np.nanstd(self.values[name])
+            self._scales[name] = 1 / std if std > 0 else 1.0
+        return self._scales[name]
+
+    def _candidate_blocks(self, ranges):
+        """Returns the blocks whose bounds intersect all ranges"""
+        keep = np.ones(len(self._blocks()), bool)
+        for name, (low, high) in ranges.items():
+            mins, maxs = self._get_bounds(name)
+            if low is not None:
+                keep &= maxs >= low
+            if high is not None:
+                keep &= mins <= high
+        return np.nonzero(keep)[0]
+
+    def _match(self, start, ranges):
+        """Returns a mask of the rows of a block that are in all ranges"""
+        stop = min(start + self.block_size, len(self))
+        mask = np.ones(stop - start, bool)
+        for name, (low, high) in ranges.items():
+            column = self.values[name][start:stop]
+            if low is not None:
+                mask &= column >= low
+            if high is not None:
+                mask &= column <= high
+        return mask
+
+    def filter(self, ranges, limit=None):
+        """Finds the rows whose descriptors are in the given ranges.
+
+        ranges, dict
+            A dict of {descriptor_name: (low, high)} of inclusive bounds, where None is unbounded, e.g.
+            {"sync": (4, 8), "lowness": (0.3, None)}
+
+        limit, int
+            The maximum number of rows to return
+
+        Returns the sorted indices of the matching rows. Rows with undefined descriptors never match.
+        """
+        self._check_names(ranges)
+
+        found = []
+        n_found = 0
+        for block in self._candidate_blocks(ranges):
+            start = block * self.block_size
+            found.append(np.nonzero(self._match(start, ranges))[0] + start)
+            n_found += len(found[-1])
+            if limit is not None and n_found >= limit:
+                break
+
+        indices = np.concatenate(found) if found else np.empty(0, int)
+        return indices[:limit]
+
+    def nearest(self, target, k=10, ranges=None, weights=None):
+        """Finds the k rows nearest to target descriptor values, optionally among the rows in given ranges.
+
+        target, dict
+            A dict of {descriptor_name: value}. The distance is Euclidean over these descriptors, each divided by its
+            standard deviation over the table.
+
+        k, int
+            The number of rows
+
+        ranges, dict
+            Ranges that the rows must be in, see `filter`
+
+        weights, dict
+            A dict of {descriptor_name: weight} to scale the target descriptors, 1 by default
+
+        Returns (distances, indices), two arrays of at most k values sorted by increasing distance
+        """
+        ranges = {} if ranges is None else ranges
+        weights = {} if weights is None else weights
+        self._check_names(list(target) + list(ranges))
+        if k <= 0:
+            raise ValueError(f"Invalid k `{k}`. Must be positive")
+
+        names = list(target)
+        values = np.array([target[name] for name in names], dtype=np.float64)
+        scales = np.array(
+            [weights.get(name, 1) * self._get_scale(name) for name in names]
+        )
+
+        # The distance from the target to the bounding box of each block is a lower bound of the distance to its rows
+        blocks = self._candidate_blocks(ranges)
+        sq_bounds = np.zeros(len(blocks))
+        for name, value, scale in zip(names, values, scales):
+            mins, maxs = self._get_bounds(name)
+            gap = np.maximum(np.maximum(mins[blocks] - value, value - maxs[blocks]), 0)
+            sq_bounds += (np.nan_to_num(gap, nan=np.inf) * scale) ** 2
+
+        best = np.empty(0)
+        best_ix = np.empty(0, int)
+        for ix in np.argsort(sq_bounds, kind="stable"):
+            if len(best) == k and sq_bounds[ix] > best[-1]:
+                break
+
+            start = blocks[ix] * self.block_size
+            stop = min(start + self.block_size, len(self))
+            sq_dists = np.zeros(stop - start)
+            for name, value, scale in zip(names, values, scales):
+                sq_dists += ((self.values[name][start:stop] - value) * scale) ** 2
+            sq_dists[~self._match(start, ranges) | np.isnan(sq_dists)] = np.inf
+
+            candidates = np.concatenate([best, sq_dists])
+            candidates_ix = np.concatenate([best_ix, np.arange(start, stop)])
+            order = np.argsort(candidates, kind="stable")[:k]
+            order = order[np.isfinite(candidates[order])]
+            best, best_ix = candidates[order], candidates_ix[order]
+
+        return np.sqrt(best), best_ix
+
+    def to_bitmasks(self, indices):
+        """Returns the patterns of the given rows as a (n, n_bars) array of dtype BITMASK_DTYPE"""
+        if self.bars is None:
+            raise ValueError("The table has no patterns")
+        return np.asarray(self.bars[indices])
+
+    def to_pattlists(self, indices):
+        """Returns the patterns of the given rows as pattern lists, with a representative pitch per band. See
+        `BitmaskPattern.to_pattlist`."""
+        return [
+            BitmaskPattern(bars, 0).to_pattlist() for bars in self.to_bitmasks(indices)
+        ]
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return (
+            f"DescriptorTable(n_rows={len(self)}, n_descriptors={len(self.descriptors)}, "
+            f"patterns={self.bars is not None})"
+        )
@@ -0,0 +1,398 @@
+"""
+A lightweight reader of Standard MIDI Files (SMF).
+
+Only the parts of a MIDI file that are needed to compute onset rolls are read: the notes of each instrument, the tempo
+map and the time signature map. The conventions of pretty_midi are followed closely (instruments are identified by
+program, channel and track, notes are created when they are closed, beats are tracked through tempo and time signature
+changes), so that the onset rolls are the same as those computed from a PrettyMIDI object, at a fraction of the cost.
+"""
+
+import numpy as np
+
+# The largest tick that pretty_midi accepts before considering a file corrupt
+MAX_TICK = 1e7
+
+# Number of data bytes of each channel message type, by the high nibble of its status byte
+N_DATA_BYTES = {0x80: 2, 0x90: 2, 0xA0: 2, 0xB0: 2, 0xC0: 1, 0xD0: 1, 0xE0: 2}
+
+DRUM_CHANNEL = 9
+
+
+class SMFInstrument:
+    """The notes of one instrument of a MIDI file, identified by program, channel and track.
+
+    Notes are stored as arrays of start ticks, end ticks, pitches and velocities, in the order in which they are closed.
+    """
+
+    __slots__ = (
+        "program",
+        "channel",
+        "track",
+        "is_drum",
+        "start_ticks",
+        "end_ticks",
+        "pitches",
+        "velocities",
+        "_notes",
+        "event_ticks",
+    )
+
+    def __init__(self, program, channel, track):
+        self.program = program
+        self.channel = channel
+        self.track = track
+        self.is_drum = channel == DRUM_CHANNEL
+        self._notes = []
+        # Ticks of control changes and pitch bends, which count towards the end of the file
+        self.event_ticks = []
+
+    def _finalize(self):
+        notes = np.array(self._notes, dtype=np.int64).reshape(-1, 4)
+        self.start_ticks, self.end_ticks, self.pitches, self.velocities = notes.T
+        del self._notes
+
+
+class SMF:
+    """A MIDI file read by `read_smf`.
+
+    resolution, int
+        Ticks per beat
+
+    tick_scales, list
+        Tempo changes as (tick, seconds per tick) tuples
+
+    time_signatures, list
+        Time signature changes as (time in seconds, numerator, denominator) tuples
+
+    instruments, list
+        The instruments with notes, as SMFInstrument objects in the order used by pretty_midi
+    """
+
+    __slots__ = (
+        "resolution",
+        "tick_scales",
+        "time_signatures",
+        "instruments",
+        "meta_ticks",
+    )
+
+    def __init__(
+        self, resolution, tick_scales, time_signatures, instruments, meta_ticks
+    ):
+        self.resolution = resolution
+        self.tick_scales = tick_scales
+        self.time_signatures = time_signatures
+        self.instruments = instruments
+        # Ticks of meta events that count towards the end of the file
+        self.meta_ticks = meta_ticks
+
+    def tick_to_time(self, ticks):
+        """Converts absolute ticks to times in seconds, following the tempo map"""
+        ticks = np.asarray(ticks)
+        times = np.zeros(ticks.shape)
+
+        # Times are accumulated over tempo segments exactly as pretty_midi does, so that they are bit-for-bit equal
+        last_end_time = 0
+        segments = self.tick_scales + [(np.inf, None)]
+        for (start_tick, tick_scale), (end_tick, _) in zip(segments, segments[1:]):
+            in_segment = (ticks >= start_tick) & (ticks <= end_tick)
+            times[in_segment] = last_end_time + tick_scale * (
+                ticks[in_segment] - start_tick
+            )
+            if end_tick != np.inf:
+                last_end_time = last_end_time + tick_scale * (end_tick - start_tick)
+
+        return times
+
+    def get_tempo_changes(self):
+        """Returns the times of the tempo changes in seconds and the tempi in quarter notes per minute"""
+        ticks = [tick for tick, _ in self.tick_scales]
+        tempi = [
+            60.0 / (tick_scale * self.resolution) for _, tick_scale in self.tick_scales
+        ]
+        return self.tick_to_time(ticks), np.array(tempi)
+
+    def get_end_time(self):
+        """Returns the time of the last event in seconds"""
+        ticks = list(self.meta_ticks) + [tick for tick, _ in self.tick_scales]
+        for instrument in self.instruments:
+            ticks.extend(instrument.end_ticks.tolist())
+            ticks.extend(instrument.event_ticks)
+
+        times = self.tick_to_time(ticks).tolist() + [
+            ts[0] for ts in self.time_signatures
+        ]
+        return max(times) if times else 0.0
+
+    def get_beats(self, start_time=0.0):
+        """Returns the beat locations in seconds, following the tempo and time signature changes.
+
+        This is a port of `PrettyMIDI.get_beats`.
+        """
+        tempo_change_times, tempi = self.get_tempo_changes()
+        time_signatures = sorted(self.time_signatures, key=lambda ts: ts[0])
+
+        beats = [start_time]
+        tempo_idx = 0
+        while (
+            tempo_idx < tempo_change_times.shape[0] - 1
+            and beats[-1] > tempo_change_times[tempo_idx + 1]
+        ):
+            tempo_idx += 1
+        ts_idx = 0
+        while (
+            ts_idx < len(time_signatures) - 1
+            and beats[-1] >= time_signatures[ts_idx + 1][0]
+        ):
+            ts_idx += 1
+
+        def get_current_bpm():
+            if time_signatures:
+                _, numerator, denominator = time_signatures[ts_idx]
+                return _qpm_to_bpm(tempi[tempo_idx], numerator, denominator)
+            return tempi[tempo_idx]
+
+        def gt_or_close(a, b):
+            return a > b or np.isclose(a, b)
+
+        end_time = self.get_end_time()
+        while beats[-1] < end_time:
+            bpm = get_current_bpm()
+            next_beat = beats[-1] + 60.0 / bpm
+            # The beat passes a tempo change boundary
+            if (
+                tempo_idx < tempo_change_times.shape[0] - 1
+                and next_beat > tempo_change_times[tempo_idx + 1]
+            ):
+                next_beat = beats[-1]
+                beat_remaining = 1.0
+                while (
+                    tempo_idx < tempo_change_times.shape[0] - 1
+                    and next_beat + beat_remaining * 60.0 / bpm
+                    >= tempo_change_times[tempo_idx + 1]
+                ):
+                    overshot_ratio = (tempo_change_times[tempo_idx + 1] - next_beat) / (
+                        60.0 / bpm
+                    )
+                    next_beat += overshot_ratio * 60.0 / bpm
+                    beat_remaining -= overshot_ratio
+                    tempo_idx = tempo_idx + 1
+                    bpm = get_current_bpm()
+                next_beat += beat_remaining * 60.0 / bpm
+            # The beat has just passed the first time signature change
+            if time_signatures and ts_idx == 0:
+                current_ts_time = time_signatures[ts_idx][0]
+                if current_ts_time > beats[-1] and gt_or_close(
+                    next_beat, current_ts_time
+                ):
+                    next_beat = current_ts_time
+            # The beat passes the next time signature change
+            if ts_idx < len(time_signatures) - 1:
+                next_ts_time = time_signatures[ts_idx + 1][0]
+                if gt_or_close(next_beat, next_ts_time):
+                    next_beat = next_ts_time
+                    ts_idx += 1
+                    bpm = get_current_bpm()
+            beats.append(next_beat)
+
+        # The last beat passes the end of the file
+        return np.array(beats[:-1])
+
+
+def _qpm_to_bpm(quarter_note_tempo, numerator, denominator):
+    """Converts a tempo in quarter notes per minute to beats per minute, as in `pretty_midi.qpm_to_bpm`"""
+    if denominator in [1, 2, 4, 8, 16, 32]:
+        # Simple triple
+        if numerator == 3:
+            return quarter_note_tempo * denominator / 4.0
+        # Compound meter
+        elif numerator % 3 == 0:
+            return quarter_note_tempo / 3.0 * denominator / 4.0
+        else:
+            return quarter_note_tempo * denominator / 4.0
+    return quarter_note_tempo
+
+
+def _read_varlen(data, pos):
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, pos
+
+
+def _read_track(data, pos, end):
+    """Parses the events of a track chunk.
+
+    Returns a list of (tick, kind, a, b, c) tuples, where kind is the status byte with the channel removed for channel
+    messages (a = channel), or the meta event type offset by 0x100 for meta events.
+    """
+    events = []
+    tick = 0
+    status = None
+    while pos < end:
+        delta, pos = _read_varlen(data, pos)
+        tick += delta
+
+        byte = data[pos]
+        if byte & 0x80:
+            pos += 1
+            if byte == 0xFF:
+                meta_type = data[pos]
+                length, pos = _read_varlen(data, pos + 1)
+                events.append((tick, 0x100 + meta_type, data[pos : pos + length], 0, 0))
+                pos += length
+                continue
+            if byte in (0xF0, 0xF7):
+                length, pos = _read_varlen(data, pos)
+                pos += length
+                continue
+            if byte >= 0xF0:
+                raise ValueError(f"Unsupported MIDI status byte {byte:#x}")
+            status = byte
+        elif status is None:
+            raise ValueError("MIDI data byte without a running status")
+
+        kind = status & 0xF0
+        if N_DATA_BYTES[kind] == 2:
+            events.append((tick, kind, status & 0x0F, data[pos], data[pos + 1]))
+            pos += 2
+        else:
+            events.append((tick, kind, status & 0x0F, data[pos], 0))
+            pos += 1
+
+    return events
+
+
+def _load_instruments(tracks):
+    """Pairs note-ons and note-offs into notes for each instrument, as in `PrettyMIDI._load_instruments`"""
+    instrument_map = {}
+    # Control changes and pitch bends that appear before the first note of an instrument
+    stragglers = {}
+
+    def get_instrument(program, channel, track, create_new):
+        if (program, channel, track) in instrument_map:
+            return instrument_map[(program, channel, track)]
+        if not create_new and (channel, track) in stragglers:
+            return stragglers[(channel, track)]
+        instrument = SMFInstrument(program, channel, track)
+        if create_new:
+            if (channel, track) in stragglers:
+                instrument.event_ticks = stragglers[(channel, track)].event_ticks
+            instrument_map[(program, channel, track)] = instrument
+        else:
+            stragglers[(channel, track)] = instrument
+        return instrument
+
+    for track_idx, events in enumerate(tracks):
+        last_note_on = {}
+        current_program = [0] * 16
+        for tick, kind, channel, a, b in events:
+            if kind == 0xC0:
+                current_program[channel] = a
+            elif kind == 0x90 and b > 0:
+                last_note_on.setdefault((channel, a), []).append((tick, b))
+            elif kind == 0x80 or kind == 0x90:
+                key = (channel, a)
+                if key not in last_note_on:
+                    continue
+
+                # One note-off closes all the notes that were opened on a previous tick
+                open_notes = last_note_on[key]
+                notes_to_close = [n for n in open_notes if n[0] != tick]
+                notes_to_keep = [n for n in open_notes if n[0] == tick]
+
+                for start_tick, velocity in notes_to_close:
+                    program = current_program[channel]
+                    instrument = get_instrument(program, channel, track_idx, True)
+                    instrument._notes.append((start_tick, tick, a, velocity))
+
+                if notes_to_close and notes_to_keep:
+                    last_note_on[key] = notes_to_keep
+                else:
+                    del last_note_on[key]
+            elif kind == 0xB0 or kind == 0xE0:
+                program = current_program[channel]
+                instrument = get_instrument(program, channel, track_idx, False)
+                instrument.event_ticks.append(tick)
+
+    instruments = list(instrument_map.values())
+    for instrument in instruments:
+        instrument._finalize()
+
+    return instruments
+
+
+def read_smf(filepath):
+    """Reads the notes, tempo map and time signature map of a Standard MIDI File.
+
+    :param filepath: Path to a MIDI file
+    :return: SMF object
+    """
+    with open(filepath, "rb") as f:
+        data = f.read()
+
+    if data[:4] != b"MThd":
+        raise ValueError(f"{filepath} is not a Standard MIDI File")
+
+    header_length = int.from_bytes(data[4:8], "big")
+    n_tracks = int.from_bytes(data[10:12], "big")
+    division = int.from_bytes(data[12:14], "big")
+    if division & 0x8000:
+        raise ValueError("SMPTE time division is not supported")
+
+    tracks = []
+    pos = 8 + header_length
+    while pos + 8 <= len(data) and len(tracks) < n_tracks:
+        chunk_type = data[pos : pos + 4]
+        length = int.from_bytes(data[pos + 4 : pos + 8], "big")
+        start = pos + 8
+        pos = start + length
+        if chunk_type == b"MTrk":
+            tracks.append(_read_track(data, start, min(pos, len(data))))
+
+    if not tracks:
+        raise ValueError(f"{filepath} has no tracks")
+
+    max_tick = max((events[-1][0] for events in tracks if events), default=0) + 1
+    if max_tick > MAX_TICK:
+        raise ValueError(
+            f"MIDI file has a largest tick of {max_tick}, it is likely corrupt"
+        )
+
+    # Tempo changes, as in `PrettyMIDI._load_tempo_changes`, only on the first track
+    tick_scales = [(0, 60.0 / (120.0 * division))]
+    time_signature_ticks = []
+    meta_ticks = []
+    for tick, kind, payload, _, _ in tracks[0]:
+        if kind == 0x151:
+            bpm = 6e7 / int.from_bytes(payload, "big")
+            tick_scale = 60.0 / (bpm * division)
+            if tick == 0:
+                tick_scales = [(0, tick_scale)]
+            elif tick_scale != tick_scales[-1][1]:
+                tick_scales.append((tick, tick_scale))
+        elif kind == 0x158:
+            time_signature_ticks.append((tick, payload[0], 2 ** payload[1]))
+        elif kind == 0x159:
+            meta_ticks.append(tick)
+
+    # Lyrics and text events count towards the end of the file on all tracks
+    for events in tracks:
+        meta_ticks.extend(
+            tick for tick, kind, _, _, _ in events if kind in (0x101, 0x105)
+        )
+
+    smf = SMF(division, tick_scales, [], _load_instruments(tracks), meta_ticks)
+
+    times = smf.tick_to_time([tick for tick, _, _ in time_signature_ticks])
+    smf.time_signatures = [
+        (time, numerator, denominator)
+        for time, (_, numerator, denominator) in zip(
+            times.tolist(), time_signature_ticks
+        )
+    ]
+
+    return smf
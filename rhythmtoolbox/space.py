@@ -0,0 +1,189 @@
+"""
+Exhaustive tables of the descriptors of every pattern in a rhythm space.
+
+Generative maps enumerate candidate 16-step patterns and look up their descriptors. Instead of recomputing them, the
+descriptors of a whole space of patterns are computed once and saved as a structured .npy file, which is loaded as a
+read-only memmap so that only the rows that are read are loaded into memory.
+
+- The monophonic space has a row for each of the 2^16 monophonic patterns, indexed by bitmask.
+- A polyphonic space has a row for each combination of low, mid and high band bitmasks from given sets, e.g. a fixed
+  low band with every mid and high band. Rows are computed in chunks, possibly by several worker processes that write
+  to the same file.
+"""
+
+import multiprocessing
+import os
+
+import numpy as np
+
+from rhythmtoolbox.bitmask import BITMASK_DTYPE
+from rhythmtoolbox.midi_mapping import BANDS
+from rhythmtoolbox.tables import N_PATTERNS, get_table
+
+MONOPHONIC_DESCRIPTORS = [
+    "density",
+    "sync",
+    "syness",
+    "syncAwareness",
+    "balance",
+    "evenness",
+]
+
+# The largest number of rows of a polyphonic space, about 640 MB with the polyphonic descriptors, which allows one band
+# with all patterns. Spaces of up to MAX_LARGE_ROWS rows, which allow two such bands, must be requested explicitly.
+MAX_ROWS = 2**24
+MAX_LARGE_ROWS = 2**32
+
+POLYPHONIC_DESCRIPTORS = [
+    "polyDensity",
+    "polySync",
+    "polyBalance",
+    "polyEvenness",
+]
+
+
+def load_space(filepath):
+    """Loads a space saved by `build_monophonic_space` or `build_polyphonic_space` as a read-only memmap"""
+    return np.load(filepath, mmap_mode="r")
+
+
+def build_monophonic_space(filepath):
+    """Computes the descriptors of every 16-step monophonic pattern and saves them to a .npy file.
+
+    The file contains a structured array of 2^16 rows, where row i is the pattern of bitmask i, with a `mask` field and
+    a field for each of MONOPHONIC_DESCRIPTORS.
+
+    Returns the table as a read-only memmap
+    """
+    dtype = np.dtype(
+        [("mask", np.uint16)] + [(name, np.float64) for name in MONOPHONIC_DESCRIPTORS]
+    )
+    table = np.empty(N_PATTERNS, dtype)
+    table["mask"] = np.arange(N_PATTERNS)
+    for name in MONOPHONIC_DESCRIPTORS:
+        table[name] = get_table(name)
+
+    np.save(filepath, table)
+    return load_space(filepath)
+
+
+def _get_band_masks(masks):
+    """Returns the bitmasks of a band as an array, or all bitmasks if None"""
+    if masks is None:
+        return np.arange(N_PATTERNS, dtype=np.uint16)
+
+    masks = np.asarray(masks).reshape(-1)
+    if len(masks) == 0 or masks.min() < 0 or masks.max() >= N_PATTERNS:
+        raise ValueError("Invalid band masks. Must be one or more ints in [0, 2^16)")
+    return masks.astype(np.uint16)
+
+
+def _polyphonic_space_job(job):
+    """Computes the rows [start, stop) of a polyphonic space and writes them to its file"""
+    from rhythmtoolbox import _describe_batch
+
+    filepath, start, stop, band_masks, names = job
+
+    shape = tuple(len(masks) for masks in band_masks)
+    ix = np.unravel_index(np.arange(start, stop), shape)
+
+    bars = np.empty((stop - start, 1), BITMASK_DTYPE)
+    for band, masks, band_ix in zip(BANDS, band_masks, ix):
+        bars[band][:, 0] = masks[band_ix]
+    bars["any"] = bars["low"] | bars["mid"] | bars["hi"]
+
+    values = np.empty((stop - start, len(names)))
+    _describe_batch(names, bars, 16, None, True, values)
+
+    space = np.load(filepath, mmap_mode="r+")
+    for band in BANDS:
+        space[band][start:stop] = bars[band][:, 0]
+    for name, column in zip(names, values.T):
+        space[name][start:stop] = column
+    space.flush()
+
+
+def build_polyphonic_space(
+    filepath,
+    low=None,
+    mid=None,
+    hi=None,
+    descriptors=None,
+    chunksize=65536,
+    workers=None,
+    allow_large=False,
+):
+    """Computes the descriptors of every combination of band patterns and saves them to a .npy file.
+
+    Parameters
+        filepath, str
+        The path of the .npy file
+
+        low, mid, hi, int or list
+        The bitmasks of each band to combine, or all 16-step patterns if None. The space can have at most MAX_ROWS rows,
+        so at most one band can be None, unless `allow_large` is True.
+
+        descriptors, list
+        The names of the descriptors to compute, POLYPHONIC_DESCRIPTORS by default. Each pattern has the onsets of its
+        bands only, so descriptors that depend on other instruments, such as noi, are not defined.
+
+        chunksize, int
+        The number of rows computed at a time
+
+        workers, int
+        The number of worker processes. Defaults to the number of CPUs. With a single worker, rows are computed in the
+        calling process.
+
+        allow_large, bool
+        If True, the space can have up to MAX_LARGE_ROWS rows, so that two bands can be None. Such a space takes over
+        100 GB of disk space.
+
+    Returns
+        The table as a read-only memmap of a structured array with `low`, `mid` and `hi` fields and a field for each
+        descriptor. Rows are in the order of `itertools.product(low, mid, hi)`, and descriptors of empty patterns are
+        NaN.
+    """
+    from rhythmtoolbox import _get_descriptor_names
+
+    names = _get_descriptor_names(
+        POLYPHONIC_DESCRIPTORS if descriptors is None else descriptors
+    )
+    if chunksize <= 0:
+        raise ValueError(f"Invalid chunksize `{chunksize}`. Must be positive")
+
+    dtype = np.dtype(
+        [(band, np.uint16) for band in BANDS] + [(name, np.float64) for name in names]
+    )
+    band_masks = [_get_band_masks(masks) for masks in (low, mid, hi)]
+    n_rows = int(np.prod([len(masks) for masks in band_masks], dtype=object))
+    if n_rows > MAX_LARGE_ROWS:
+        raise ValueError(
+            f"Invalid band masks. The space would have {n_rows} rows, more than MAX_LARGE_ROWS ({MAX_LARGE_ROWS}). "
+            "Give the patterns of at least two bands"
+        )
+    if n_rows > MAX_ROWS and not allow_large:
+        raise ValueError(
+            f"Invalid band masks. The space would have {n_rows} rows and take {n_rows * dtype.itemsize / 1e9:.0f} GB, "
+            f"more than MAX_ROWS ({MAX_ROWS}). Give the patterns of more bands, or pass allow_large=True"
+        )
+    space = np.lib.format.open_memmap(filepath, mode="w+", dtype=dtype, shape=(n_rows,))
+    del space
+
+    jobs = [
+        (filepath, start, min(start + chunksize, n_rows), band_masks, names)
+        for start in range(0, n_rows, chunksize)
+    ]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs)))
+
+    if workers == 1:
+        for job in jobs:
+            _polyphonic_space_job(job)
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for _ in pool.imap_unordered(_polyphonic_space_job, jobs):
+                pass
+
+    return load_space(filepath)
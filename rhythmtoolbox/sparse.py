@@ -0,0 +1,142 @@
+"""
+A sparse representation of piano rolls as lists of onsets.
+
+A drum pattern typically uses a handful of the 128 MIDI pitches, so most of a dense (N, 128) piano roll is zeros. A
+SparseRoll stores only the step, pitch and velocity of each onset, so that its memory is proportional to the number of
+onsets rather than to the length of the pattern.
+"""
+
+import numpy as np
+
+from rhythmtoolbox import profiling
+from rhythmtoolbox.bitmask import BITMASK_DTYPE
+from rhythmtoolbox.midi_mapping import BANDS, get_band_matrix
+
+
+class SparseRoll:
+    """A piano roll stored as the coordinates of its onsets.
+
+    steps, np.ndarray
+        The time step of each onset
+
+    pitches, np.ndarray
+        The MIDI pitch of each onset
+
+    velocities, np.ndarray
+        The velocity of each onset. Onsets with a velocity of 0 are dropped.
+
+    n_steps, int
+        The number of time steps of the roll
+    """
+
+    __slots__ = ("steps", "pitches", "velocities", "n_steps")
+
+    def __init__(self, steps, pitches, velocities, n_steps):
+        steps = np.asarray(steps, dtype=np.int64).reshape(-1)
+        pitches = np.asarray(pitches, dtype=np.int64).reshape(-1)
+        velocities = np.asarray(velocities).reshape(-1)
+
+        keep = velocities > 0
+        self.steps = steps[keep]
+        self.pitches = pitches[keep]
+        self.velocities = velocities[keep]
+        self.n_steps = int(n_steps)
+
+    @classmethod
+    def from_pianoroll(cls, roll):
+        """Creates a sparse roll from the positive entries of a (N, V) piano roll"""
+        assert len(roll.shape) == 2, "Piano roll must be a 2D array"
+
+        steps, pitches = np.nonzero(roll > 0)
+        return cls(steps, pitches, roll[steps, pitches], len(roll))
+
+    @classmethod
+    def from_pattlist(cls, pattlist):
+        """Creates a sparse roll from a pattern list, with a velocity of 1 for each onset"""
+        steps = np.repeat(np.arange(len(pattlist)), [len(p) for p in pattlist])
+        pitches = [pitch for notes in pattlist for pitch in notes]
+        return cls(steps, pitches, np.ones(len(steps)), len(pattlist))
+
+    def to_pianoroll(self, dtype=np.uint8):
+        """Converts the sparse roll to a dense (N, 128) piano roll. Repeated onsets keep the last velocity."""
+        roll = np.zeros((self.n_steps, 128), dtype)
+        roll[self.steps, self.pitches] = self.velocities
+        return roll
+
+    @profiling.timed("resample")
+    def resample(self, from_resolution, to_resolution):
+        """Associate each onset with its closest step at the new resolution.
+
+        This is the sparse equivalent of `resample_pianoroll`. Onsets of the same pitch that are moved to the same step
+        are merged, keeping the maximum velocity.
+        """
+        if from_resolution == to_resolution:
+            return self
+
+        from rhythmtoolbox import get_resample_steps
+
+        targets, n_steps = get_resample_steps(
+            self.n_steps, from_resolution, to_resolution
+        )
+        resampled = SparseRoll(
+            targets[self.steps], self.pitches, self.velocities, n_steps
+        )
+        return resampled.merge_onsets()
+
+    def merge_onsets(self):
+        """Returns a roll with one onset for each step and pitch, keeping the maximum velocity of repeated onsets"""
+        # Keep the last onset of each (step, pitch) after sorting by velocity, which has the maximum velocity
+        order = np.lexsort((self.velocities, self.pitches, self.steps))
+        steps, pitches = self.steps[order], self.pitches[order]
+        last = np.ones(len(order), bool)
+        last[:-1] = (steps[1:] != steps[:-1]) | (pitches[1:] != pitches[:-1])
+
+        return SparseRoll(
+            steps[last], pitches[last], self.velocities[order][last], self.n_steps
+        )
+
+    def noi(self):
+        """Returns the number of instruments (noi) used in the roll"""
+        return len(np.unique(self.pitches))
+
+    def onset_steps(self):
+        """Returns the sorted steps with onsets"""
+        return np.unique(self.steps)
+
+    def step_density(self):
+        """Returns the percentage of steps with onsets"""
+        return len(self.onset_steps()) / self.n_steps
+
+    def get_bands(self, mapping="gm"):
+        """Returns the sorted steps with onsets in the low, mid and high frequency bands. See
+        `midi_mapping.get_bands`."""
+        in_bands = get_band_matrix(mapping)[self.pitches]
+        return [np.unique(self.steps[in_bands[:, ix]]) for ix in range(len(BANDS))]
+
+    @profiling.timed("bands")
+    def to_bitmasks(self, mapping="gm"):
+        """Packs the onsets into an array of dtype BITMASK_DTYPE with one element per 16-step bar.
+
+        A final incomplete bar is padded with silence.
+        """
+        bars = np.zeros(-(-self.n_steps // 16), dtype=BITMASK_DTYPE)
+        bar, step = np.divmod(self.steps, 16)
+        bits = (1 << step).astype(np.uint16)
+
+        # Setting a bit several times is the same as setting it once, so repeated onsets need not be removed
+        np.bitwise_or.at(bars["any"], bar, bits)
+        in_bands = get_band_matrix(mapping)[self.pitches]
+        for ix, band in enumerate(BANDS):
+            np.bitwise_or.at(bars[band], bar[in_bands[:, ix]], bits[in_bands[:, ix]])
+        return bars
+
+    @property
+    def nbytes(self):
+        """The number of bytes used by the onsets"""
+        return self.steps.nbytes + self.pitches.nbytes + self.velocities.nbytes
+
+    def __len__(self):
+        return self.n_steps
+
+    def __repr__(self):
+        return f"SparseRoll(n_onsets={len(self.steps)}, n_steps={self.n_steps})"
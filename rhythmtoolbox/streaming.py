@@ -0,0 +1,251 @@
+"""
+Descriptors of a live pattern, updated one step at a time.
+
+A DescriptorStream keeps the last bars of a pattern received from a step sequencer, with each step stored at its metric
+position. Every bar is kept as the bitmasks of its onsets, together with running counts of the onsets of each band and
+pitch, the polyphonic syncopation of each pair of adjacent steps, and running sums over the bars of the values of the
+lookup tables in `rhythmtoolbox.tables`. Adding a step updates only the values that depend on that step, and reading
+the descriptors divides the running sums by the number of bars, so neither depends on the length of the window.
+"""
+
+import math
+from functools import lru_cache
+
+from rhythmtoolbox.descriptors import POLY_SYNC_METRIC_WEIGHTS, POLY_SYNC_WEIGHTS
+from rhythmtoolbox.midi_mapping import BANDS, get_band_matrix
+from rhythmtoolbox.tables import get_table
+
+FIELDS = ["any"] + BANDS
+
+# The tables of the monophonic descriptors that are averaged over the bars of each field
+BAR_TABLES = ["sync", "syness", "balance", "evenness"]
+
+_POLY_SYNC_WEIGHTS = POLY_SYNC_WEIGHTS.tolist()
+_POLY_SYNC_METRIC_WEIGHTS = POLY_SYNC_METRIC_WEIGHTS.tolist()
+
+
+@lru_cache(maxsize=None)
+def _get_tables():
+    """Returns the lookup tables as lists, which are faster than arrays to index with a single int"""
+    names = [
+        "density",
+        "sync",
+        "syness",
+        "balance",
+        "evenness",
+        "circularX",
+        "circularY",
+    ]
+    return {name: get_table(name).tolist() for name in names}
+
+
+def _pair_sync(code, next_code, pos):
+    """Returns the polyphonic syncopation of the steps at `pos` and the next position. See `poly_sync_batch`."""
+    weight = _POLY_SYNC_WEIGHTS[code][next_code]
+    metric_weight = _POLY_SYNC_METRIC_WEIGHTS[pos]
+    if weight > 0 and metric_weight >= 0:
+        return metric_weight + weight
+    return 0
+
+
+class DescriptorStream:
+    """Computes the descriptors of the last bars of a live pattern, updated one step at a time.
+
+    n_bars, int
+        The number of 16-step bars in the window
+
+    drums, bool
+        Indicates whether the pattern is a drum pattern
+
+    mapping, str
+        The mapping of pitches to frequency bands, see `midi_mapping.register_mapping`
+
+    Each step is stored at its metric position in the window, replacing the step at the same position `n_bars` bars
+    earlier. After a whole number of windows, the descriptors are equal to those of `pattlist2descriptors` for the last
+    `n_bars` bars.
+    """
+
+    def __init__(self, n_bars=1, drums=True, mapping="gm"):
+        if n_bars <= 0:
+            raise ValueError(f"Invalid n_bars `{n_bars}`. Must be positive")
+
+        self.n_bars = n_bars
+        self.drums = drums
+        self.n_steps = n_bars * 16
+        self._tables = _get_tables()
+
+        # The code of the bands of each pitch, with a bit for each of the low, mid and high bands
+        self._pitch_codes = (get_band_matrix(mapping) @ [1, 2, 4]).tolist()
+        self.reset()
+
+    def reset(self):
+        """Clears the window"""
+        self.step = 0
+        # The notes of each slot are kept in a list that is reused by the steps stored in the slot
+        self._notes = [[] for _ in range(self.n_steps)]
+        self._codes = [0] * self.n_steps
+        self._pair_syncs = [0] * self.n_steps
+        self._poly_syncs = [0] * self.n_bars
+        self._masks = {field: [0] * self.n_bars for field in FIELDS}
+        self._densities = dict.fromkeys(FIELDS, 0)
+        self._pitch_counts = [0] * 128
+        self._noi = 0
+        self._poly_balances = [1.0] * self.n_bars
+        self._poly_sync_sum = 0
+        self._resync()
+
+    def _resync(self):
+        """Recomputes the running sums over bars, which removes the rounding errors of their updates"""
+        self._sums = {
+            field: {
+                name: math.fsum(self._tables[name][mask] for mask in masks)
+                for name in BAR_TABLES
+            }
+            for field, masks in self._masks.items()
+        }
+        self._poly_balance_sum = math.fsum(self._poly_balances)
+
+    def _set_onset(self, field, bar, bit, onset):
+        """Sets or clears the bit of a step in the mask of a field, updating its running sums.
+
+        Returns True if the mask changed
+        """
+        masks = self._masks[field]
+        old = masks[bar]
+        if bool(old & bit) == onset:
+            return False
+
+        new = old ^ bit
+        masks[bar] = new
+        self._densities[field] += 1 if onset else -1
+        sums = self._sums[field]
+        for name in BAR_TABLES:
+            table = self._tables[name]
+            sums[name] += table[new] - table[old]
+        return True
+
+    def push(self, notes):
+        """Adds a step to the window.
+
+        notes, list
+            The MIDI note numbers of the onsets at the step
+        """
+        slot = self.step % self.n_steps
+        bar, pos = divmod(slot, 16)
+        self.step += 1
+
+        # Running sums are recomputed once per window, so that rounding errors do not accumulate
+        if slot == 0:
+            self._resync()
+
+        # Update the number of instruments
+        counts = self._pitch_counts
+        slot_notes = self._notes[slot]
+        for pitch in slot_notes:
+            counts[pitch] -= 1
+            if counts[pitch] == 0:
+                self._noi -= 1
+        for pitch in notes:
+            if counts[pitch] == 0:
+                self._noi += 1
+            counts[pitch] += 1
+        slot_notes.clear()
+        slot_notes.extend(notes)
+
+        # Update the bitmasks, onset counts and running sums
+        code = 0
+        for pitch in notes:
+            code |= self._pitch_codes[pitch]
+        bit = 1 << pos
+        self._set_onset("any", bar, bit, len(notes) > 0)
+        low_changed = self._set_onset("low", bar, bit, code & 1 > 0)
+        mid_changed = self._set_onset("mid", bar, bit, code & 2 > 0)
+        hi_changed = self._set_onset("hi", bar, bit, code & 4 > 0)
+        if low_changed or mid_changed or hi_changed:
+            poly_balance = self._poly_balance(bar)
+            self._poly_balance_sum += poly_balance - self._poly_balances[bar]
+            self._poly_balances[bar] = poly_balance
+
+        # Update the syncopation of the pairs of steps ending and starting at this step
+        if code != self._codes[slot]:
+            self._codes[slot] = code
+            start = bar * 16
+            for pair_pos in ((pos - 1) % 16, pos):
+                pair_slot = start + pair_pos
+                pair_sync = _pair_sync(
+                    self._codes[pair_slot],
+                    self._codes[start + (pair_pos + 1) % 16],
+                    pair_pos,
+                )
+                self._poly_syncs[bar] += pair_sync - self._pair_syncs[pair_slot]
+                self._poly_sync_sum += pair_sync - self._pair_syncs[pair_slot]
+                self._pair_syncs[pair_slot] = pair_sync
+
+    @property
+    def position(self):
+        """The metric position of the next step in its bar"""
+        return self.step % 16
+
+    def _bar_mean(self, table, field):
+        return self._sums[field][table] / self.n_bars
+
+    def _poly_balance(self, bar):
+        """Returns the polyphonic balance of a bar. See `poly_balance_batch`."""
+        density = self._tables["density"]
+        x_table = self._tables["circularX"]
+        y_table = self._tables["circularY"]
+        low, mid, hi = (self._masks[band][bar] for band in BANDS)
+
+        d = density[low] * 3 + density[mid] * 2 + density[hi]
+        if d == 0:
+            return 1.0
+
+        # The band vectors are weighted as in `poly_balance_batch`
+        x = 3 * x_table[low] + 2 * x_table[mid] + 2 * x_table[hi]
+        y = 3 * y_table[low] + 2 * y_table[mid] + 2 * y_table[hi]
+        return 1 - math.hypot(x, y) / d
+
+    def descriptors(self):
+        """Returns the descriptors of the window in a dict of {descriptor_name: descriptor_value}.
+
+        Descriptors that are not defined, and all descriptors of an empty window, are None.
+        """
+        from rhythmtoolbox import DESCRIPTOR_NAMES
+
+        result = dict.fromkeys(DESCRIPTOR_NAMES)
+
+        n_onset_steps = self._densities["any"]
+        if n_onset_steps == 0:
+            return result
+
+        result["noi"] = self._noi
+        result["stepDensity"] = n_onset_steps / self.n_steps
+        result["sync"] = self._bar_mean("sync", "any")
+        result["syness"] = self._bar_mean("syness", "any")
+        result["balance"] = self._bar_mean("balance", "any")
+        result["evenness"] = self._bar_mean("evenness", "any")
+
+        if not self.drums:
+            result["polyDensity"] = n_onset_steps
+            return result
+
+        for band in BANDS:
+            density = self._densities[band]
+            result[f"{band}Density"] = density
+            result[f"{band}ness"] = density / n_onset_steps
+            result[f"{band}Sync"] = self._bar_mean("sync", band)
+            result[f"{band}Syness"] = self._bar_mean("syness", band)
+        result["polyDensity"] = sum(self._densities[band] for band in BANDS)
+
+        result["polyEvenness"] = (
+            self._bar_mean("evenness", "low") * 3
+            + self._bar_mean("evenness", "mid") * 2
+            + self._bar_mean("evenness", "hi")
+        )
+        result["polyBalance"] = self._poly_balance_sum / self.n_bars
+        result["polySync"] = self._poly_sync_sum / self.n_bars
+
+        return result
+
+    def __repr__(self):
+        return f"DescriptorStream(n_bars={self.n_bars}, drums={self.drums}, step={self.step})"
@@ -0,0 +1,154 @@
+"""
+Lookup tables of monophonic descriptors for every possible 16-step pattern.
+
+A monophonic 16-step pattern is packed into a uint16 bitmask, where bit i is set if there is an onset at step i. As
+there are only 2^16 such patterns, each monophonic descriptor can be precomputed once for all of them, after which
+describing a pattern is a single table lookup.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+from rhythmtoolbox import profiling
+from rhythmtoolbox.descriptors import AWARENESS, ISO_ANGLE_16, SYNC_CONTRIBUTIONS
+
+N_PATTERNS = 2**16
+
+BIT_WEIGHTS = 1 << np.arange(16)
+
+
+def _bit_sum_table(weights):
+    """Returns the sum of the weights of the set bits of every bitmask, as the sum of the tables of its two bytes"""
+    byte_bits = (np.arange(256)[:, None] >> np.arange(8)) & 1
+    low = byte_bits @ np.asarray(weights[:8])
+    high = byte_bits @ np.asarray(weights[8:])
+    return (high[:, None] + low[None, :]).reshape(-1)
+
+
+def _sync_masks():
+    """Returns the bitmask of the onsets that precede a silence of every bitmask, as in `descriptors._sync_mask`"""
+    masks = np.arange(N_PATTERNS, dtype=np.uint16)
+    next_steps = (masks >> 1) | (masks << 15)
+    return masks & ~next_steps
+
+
+def _syness_table():
+    density = get_table("density")
+    return np.divide(
+        get_table("sync"), density, out=np.zeros(N_PATTERNS), where=density > 0
+    )
+
+
+def _balance_table():
+    density = get_table("density")
+    magnitude = np.divide(
+        np.hypot(get_table("circularX"), get_table("circularY")),
+        density,
+        out=np.zeros(N_PATTERNS),
+        where=density > 0,
+    )
+    return 1 - magnitude
+
+
+def _evenness_table():
+    """Computes the evenness of every bitmask from tables of its two bytes. See `descriptors.evenness_batch`.
+
+    Evenness does not change when a pattern is rotated, so each pattern is rotated to start with its first onset. The
+    i-th onset, at step s, is then compared to the i-th vertex of a d-sided polygon, at an angle of 2pi * (16i - ds) /
+    16d. The sum of the cosines of the onsets of the high byte only depends on d, the byte and the number of onsets of
+    the low byte, which gives the ranks of its onsets.
+    """
+    byte_bits = (np.arange(256)[:, None] >> np.arange(8)) & 1
+    byte_density = byte_bits.sum(axis=1)
+
+    # The numerators of the angles are in [-256, 384), so their cosines are looked up by d and numerator
+    d = np.arange(1, 17)[:, None, None]
+    cosines = np.abs(np.cos(2 * np.pi * np.arange(-256, 384) / (16 * d[:, 0])))
+
+    def byte_sums(first_step, n_before):
+        """Returns the sums of cosines of the onsets of each byte by (d, number of onsets before the byte, byte)"""
+        sums = np.zeros((16, n_before, 256))
+        before = np.arange(n_before)[:, None]
+        for bit in range(8):
+            # Each byte with this highest bit adds the onset of the bit to the byte without it
+            without = np.arange(2**bit)
+            rank = before + byte_density[without]
+            numerators = 16 * rank - d * (first_step + bit) + 256
+            sums[:, :, without + 2**bit] = (
+                sums[:, :, without] + cosines[d - 1, numerators]
+            )
+        return sums
+
+    low, high = byte_sums(0, 1), byte_sums(8, 9)
+
+    masks = np.arange(N_PATTERNS)
+    lowest_bit = np.argmax(byte_bits, axis=1)
+    first_step = np.where(
+        masks & 255, lowest_bit[masks & 255], 8 + lowest_bit[masks >> 8]
+    )
+    rotated = masks >> first_step
+
+    density = np.maximum(get_table("density"), 1)
+    low_byte, high_byte = rotated & 255, rotated >> 8
+    row = density - 1
+    total = (
+        low.reshape(-1)[row * 256 + low_byte]
+        + high.reshape(-1)[(row * 9 + byte_density[low_byte]) * 256 + high_byte]
+    )
+    return total / density
+
+
+# Each table is built from the bitmasks of every 16-step pattern. Additive descriptors are sums over the set bits,
+# which are computed from 256-entry tables of each byte, and the others are derived from them.
+TABLE_FUNCTIONS = {
+    "density": lambda: _bit_sum_table(np.ones(16, int)),
+    "sync": lambda: _bit_sum_table(SYNC_CONTRIBUTIONS)[_sync_masks()],
+    "syness": _syness_table,
+    "syncAwareness": lambda: _bit_sum_table(SYNC_CONTRIBUTIONS * AWARENESS)[
+        _sync_masks()
+    ],
+    "balance": _balance_table,
+    "evenness": _evenness_table,
+    # The sum of the unit vectors at the onset positions, used for polyphonic balance
+    "circularX": lambda: _bit_sum_table(np.cos(np.arange(16) * ISO_ANGLE_16)),
+    "circularY": lambda: _bit_sum_table(np.sin(np.arange(16) * ISO_ANGLE_16)),
+    # The number of onsets weighted by the awareness of their quarter, used for the Pad distance
+    "densityAwareness": lambda: _bit_sum_table(AWARENESS),
+}
+
+
+def pack_patterns(patterns):
+    """Packs 16-step monophonic patterns along the last axis into uint16 bitmasks"""
+    patterns = np.asarray(patterns)
+    assert patterns.shape[-1] == 16, "Patterns must have 16 steps"
+    return ((patterns > 0) @ BIT_WEIGHTS).astype(np.uint16)
+
+
+def unpack_patterns(masks):
+    """Unpacks uint16 bitmasks into 16-step monophonic patterns of 0s and 1s along a new last axis"""
+    masks = np.asarray(masks, dtype=np.uint16)
+    return ((masks[..., None] & BIT_WEIGHTS) > 0).astype(np.uint8)
+
+
+@lru_cache(maxsize=None)
+def get_table(descriptor):
+    """Returns a read-only table of the given monophonic descriptor for every 16-step pattern, indexed by bitmask.
+
+    descriptor, str
+        One of TABLE_FUNCTIONS
+    """
+    if descriptor not in TABLE_FUNCTIONS:
+        raise ValueError(
+            f"Invalid descriptor `{descriptor}`. Must be one of {', '.join(TABLE_FUNCTIONS)}"
+        )
+
+    with profiling.stage("tables"):
+        table = TABLE_FUNCTIONS[descriptor]()
+    table.setflags(write=False)
+    return table
+
+
+def lookup(descriptor, masks):
+    """Returns the value of the given monophonic descriptor for each bitmask"""
+    return get_table(descriptor)[masks]
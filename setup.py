@@ -10,6 +10,7 @@ setup(
     packages=find_packages(
         exclude=[
             "tests*",
+            "benchmarks*",
         ]
     ),
     install_requires=["numpy~=1.24.2", "pretty_midi~=0.2.10", "scipy~=1.10.1"],
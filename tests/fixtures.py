@@ -1,3 +1,5 @@
+import numpy as np
+
 from rhythmtoolbox import pattlist_to_pianoroll
 
 # TODO: add test case for non-16-step pattern
@@ -194,3 +196,12 @@ UNBALANCED_1_DESCRIPTORS = {
     "polyEvenness": 4.691341716182545,
     "polySync": 0.0,
 }
+
+
+def assert_descriptors_equal(a, b):
+    assert a.keys() == b.keys()
+    for k in a:
+        if a[k] is None:
+            assert b[k] is None
+        else:
+            assert np.isclose(a[k], b[k])
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from .fixtures import (
+    BOSKA_3,
+    BOSKA_3_DESCRIPTORS,
+    BOSKA_3_PATTLIST,
+    BOSKA_8,
+    BOSKA_8_PATTLIST,
+    BOSKA_9_PATTLIST,
+    BOSKA_9_DESCRIPTORS,
+)
+
+from rhythmtoolbox import (
+    DESCRIPTOR_NAMES,
+    BitmaskPattern,
+    bitmask2descriptors,
+    bitmasks2descriptors,
+    pattlist_to_pianoroll,
+    pianoroll2descriptors,
+    pianorolls2descriptors,
+    rolls_to_bitmasks,
+)
+from rhythmtoolbox.midi_mapping import BANDS, get_bands
+from rhythmtoolbox.tables import pack_patterns
+
+
+def test_rolls_to_bitmasks():
+    bars = rolls_to_bitmasks(BOSKA_3)
+    assert bars.shape == (1,)
+    assert bars.nbytes == 8
+    assert bars["any"][0] == pack_patterns(BOSKA_3.sum(axis=1) > 0)
+    for band, pattern in zip(BANDS, get_bands(BOSKA_3)):
+        assert bars[band][0] == pack_patterns(pattern)
+
+    bars = rolls_to_bitmasks(np.stack([np.concatenate([BOSKA_3, BOSKA_8])] * 5))
+    assert bars.shape == (5, 2)
+
+    with pytest.raises(ValueError):
+        rolls_to_bitmasks(BOSKA_3[:12])
+
+
+def test_BitmaskPattern():
+    pattern = BitmaskPattern.from_pattlist(BOSKA_3_PATTLIST)
+    assert pattern == BitmaskPattern.from_pianoroll(BOSKA_3)
+    assert pattern == BitmaskPattern.from_midifile("midi/boska/3.mid")
+    assert pattern.noi == BOSKA_3_DESCRIPTORS["noi"]
+    assert len(pattern) == 16
+    assert pattern.nbytes == 8
+
+    pattlist = BOSKA_8_PATTLIST + BOSKA_9_PATTLIST
+    assert BitmaskPattern.from_pattlist(pattlist) == BitmaskPattern.from_pianoroll(
+        np.concatenate([BOSKA_8, pattlist_to_pianoroll(BOSKA_9_PATTLIST)])
+    )
+
+    # Converting back to a pattern list keeps one pitch per band
+    v = BitmaskPattern.from_pattlist(pattern.to_pattlist())
+    assert np.array_equal(v.bars, pattern.bars)
+    assert v.noi == 3
+
+
+def test_bitmask2descriptors():
+    v = bitmask2descriptors(BitmaskPattern.from_pattlist(BOSKA_9_PATTLIST))
+    assert set(v) == set(BOSKA_9_DESCRIPTORS)
+    for k in v:
+        assert np.isclose(v[k], BOSKA_9_DESCRIPTORS[k])
+
+    v = bitmask2descriptors(BitmaskPattern(np.zeros(1), 0))
+    assert all(v[k] is None for k in v)
+
+
+def test_bitmasks2descriptors():
+    rng = np.random.default_rng(0)
+    rolls = (rng.random((100, 32, 128)) < 0.02).astype(np.uint8)
+
+    v = bitmasks2descriptors(
+        rolls_to_bitmasks(rolls), [r.any(axis=0).sum() for r in rolls]
+    )
+    assert v.shape == (100, len(DESCRIPTOR_NAMES))
+    assert np.allclose(v, pianorolls2descriptors(rolls), equal_nan=True)
+
+    v = bitmasks2descriptors(rolls_to_bitmasks(rolls[:1]))
+    assert np.isnan(v[0, DESCRIPTOR_NAMES.index("noi")])
+    expected = pianoroll2descriptors(rolls[0])
+    for ix, name in enumerate(DESCRIPTOR_NAMES[1:], 1):
+        assert np.isclose(v[0, ix], expected[name])
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from .fixtures import BOSKA_3, BOSKA_3_PATTLIST, BOSKA_8, BOSKA_9_PATTLIST
+
+from rhythmtoolbox import (
+    DescriptorCache,
+    pattlist2descriptors,
+    pattlist_to_pianoroll,
+    pianoroll2descriptors,
+    resample_pianoroll,
+)
+
+
+def test_descriptor_cache():
+    cache = DescriptorCache(maxsize=2)
+
+    expected = pianoroll2descriptors(BOSKA_3)
+    assert pianoroll2descriptors(BOSKA_3, cache=cache) == expected
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    # Equal patterns with different dtypes, velocities and sources share an entry
+    assert (
+        pianoroll2descriptors((BOSKA_3 * 100).astype(np.uint8), cache=cache) == expected
+    )
+    assert pattlist2descriptors(BOSKA_3_PATTLIST, cache=cache) == expected
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    # Patterns are resampled before they are looked up
+    upsampled = np.repeat(BOSKA_8, 2, axis=0)
+    pianoroll2descriptors(upsampled, resolution=8, cache=cache)
+    pianoroll2descriptors(resample_pianoroll(upsampled, 8, 4), cache=cache)
+    assert (cache.hits, cache.misses) == (3, 2)
+
+    # Drum and non-drum descriptors are cached separately
+    assert pianoroll2descriptors(BOSKA_3, drums=False, cache=cache) == (
+        pianoroll2descriptors(BOSKA_3, drums=False)
+    )
+    assert (cache.hits, cache.misses) == (3, 3)
+
+    # The least recently used pattern is evicted
+    pianoroll2descriptors(BOSKA_3, cache=cache)
+    pattlist2descriptors(BOSKA_9_PATTLIST, cache=cache)
+    assert len(cache) == 2
+    pianoroll2descriptors(BOSKA_3, cache=cache)
+    pianoroll2descriptors(BOSKA_3, drums=False, cache=cache)
+    assert (cache.hits, cache.misses) == (4, 6)
+
+    # Results are copies
+    pianoroll2descriptors(BOSKA_3, cache=cache)["noi"] = -1
+    assert pianoroll2descriptors(BOSKA_3, cache=cache) == expected
+
+    cache.clear()
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (0, 0)
+
+    assert pattlist2descriptors(BOSKA_9_PATTLIST, cache=cache) == pianoroll2descriptors(
+        pattlist_to_pianoroll(BOSKA_9_PATTLIST), cache=cache
+    )
+    assert pianoroll2descriptors(BOSKA_8, cache=cache) != expected
+
+    with pytest.raises(ValueError):
+        DescriptorCache(maxsize=0)
@@ -1,3 +1,6 @@
+import itertools
+
+import numpy as np
 from .fixtures import (
     BOSKA_3,
     BOSKA_3_DESCRIPTORS,
@@ -20,10 +23,14 @@ from rhythmtoolbox.descriptors import (
     poly_density,
     poly_evenness,
     poly_sync,
+    poly_sync_batch,
     step_density,
     syncopation16,
     syncopation16_awareness,
+    syncopation16_awareness_batch,
+    syncopation16_batch,
     syness,
+    syness_batch,
 )
 from rhythmtoolbox.midi_mapping import get_bands
 
@@ -175,3 +182,43 @@ def test_polyDensity():
 
     lowband, midband, hiband = get_bands(BOSKA_9)
     assert poly_density(lowband, midband, hiband) == BOSKA_9_DESCRIPTORS["polyDensity"]
+
+
+# All 2^16 monophonic 16-step patterns
+ALL_PATTERNS = ((np.arange(2**16)[:, None] >> np.arange(16)) & 1).astype(int)
+
+
+def test_syncopation16_batch():
+    sync = syncopation16_batch(ALL_PATTERNS)
+    awareness = syncopation16_awareness_batch(ALL_PATTERNS)
+    synesses = syness_batch(ALL_PATTERNS)
+    for ix, pattern in enumerate(ALL_PATTERNS.tolist()):
+        assert sync[ix] == syncopation16(pattern)
+        assert awareness[ix] == syncopation16_awareness(pattern)
+        assert synesses[ix] == syness(pattern)
+
+
+def test_poly_sync_batch():
+    # Every transition between two 3-band events at every position of the bar
+    events = list(itertools.product([0, 1], repeat=3))
+    streams = []
+    for event, event_next in itertools.product(events, events):
+        for ix in range(16):
+            stream = np.zeros((3, 16), dtype=int)
+            stream[:, ix] = event
+            stream[:, (ix + 1) % 16] = event_next
+            streams.append(stream)
+
+    rng = np.random.default_rng(0)
+    streams = np.concatenate([streams, rng.integers(0, 2, (2000, 3, 16))])
+
+    v = poly_sync_batch(streams[:, 0], streams[:, 1], streams[:, 2])
+    for ix, (low, mid, hi) in enumerate(streams.tolist()):
+        assert v[ix] == poly_sync(low, mid, hi)
+
+    lowband, midband, hiband = get_bands(np.stack([BOSKA_3, BOSKA_8, BOSKA_9]))
+    assert poly_sync_batch(lowband, midband, hiband).tolist() == [
+        BOSKA_3_DESCRIPTORS["polySync"],
+        BOSKA_8_DESCRIPTORS["polySync"],
+        BOSKA_9_DESCRIPTORS["polySync"],
+    ]
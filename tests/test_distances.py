@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from rhythmtoolbox import BITMASK_DTYPE
+from rhythmtoolbox.descriptors import AWARENESS, syncopation16_awareness
+from rhythmtoolbox.distances import _quarter_syncopation, pairwise_distances
+from rhythmtoolbox.midi_mapping import BANDS
+from rhythmtoolbox.tables import unpack_patterns
+
+
+def random_bars(rng, shape):
+    bars = np.zeros(shape, BITMASK_DTYPE)
+    for field in BITMASK_DTYPE.names:
+        bars[field] = rng.integers(0, 2**16, size=shape, dtype=np.uint16)
+    return bars
+
+
+def test_hamming_and_pad():
+    rng = np.random.default_rng(0)
+    bars = random_bars(rng, (50, 2))
+
+    # Differences of each step of each band
+    patterns = np.concatenate(
+        [unpack_patterns(bars[band]) for band in BANDS], axis=1
+    ).astype(int)
+    diffs = np.abs(patterns[:, None] - patterns[None])
+
+    expected = diffs.sum(axis=(-1, -2))
+    assert np.array_equal(pairwise_distances(bars, tile_size=16), expected)
+    assert np.array_equal(
+        pairwise_distances(bars, tile_size=7, workers=3, dtype=np.uint16), expected
+    )
+
+    expected = (diffs * AWARENESS).sum(axis=(-1, -2))
+    assert np.array_equal(pairwise_distances(bars, metric="pad"), expected)
+
+    # Monophonic patterns
+    expected = np.abs(
+        unpack_patterns(bars["any"][:10, 0])[:, None].astype(int)
+        - unpack_patterns(bars["any"][:, 0])[None]
+    ).sum(axis=-1)
+    assert np.array_equal(
+        pairwise_distances(bars[:10, 0], bars[:, 0], fields=["any"]), expected
+    )
+    assert np.array_equal(
+        pairwise_distances(bars["any"][:10, 0], bars["any"][:, 0]), expected
+    )
+
+
+def test_long_patterns():
+    # Sums of patterns of 1000 bars do not fit in 16 bits
+    rng = np.random.default_rng(3)
+    bars = random_bars(rng, (3, 1000))
+    patterns = np.concatenate(
+        [unpack_patterns(bars[band]) for band in BANDS], axis=1
+    ).astype(int)
+    diffs = np.abs(patterns[:, None] - patterns[None])
+
+    expected = diffs.sum(axis=(-1, -2))
+    assert np.array_equal(pairwise_distances(bars, dtype=np.int64), expected)
+
+    expected = (diffs * AWARENESS).sum(axis=(-1, -2))
+    assert expected.max() >= 2**16
+    assert np.array_equal(
+        pairwise_distances(bars, metric="pad", dtype=np.int64), expected
+    )
+
+
+def test_sad():
+    rng = np.random.default_rng(1)
+    bars = random_bars(rng, (40,))
+
+    # The awareness-weighted syncopation is the sum of the syncopation of the quarters
+    quarters = _quarter_syncopation(bars["any"][:, None])
+    for pattern, q in zip(unpack_patterns(bars["any"]), quarters):
+        assert q.sum() == syncopation16_awareness(pattern.tolist())
+
+    distances = pairwise_distances(bars, metric="sad", fields=["any"])
+    assert np.array_equal(distances, distances.T)
+    assert np.all(np.diag(distances) == 0)
+    assert distances[0, 1] == np.abs(quarters[0] - quarters[1]).sum()
+    assert np.array_equal(
+        pairwise_distances(bars[:5], bars, metric="sad", fields=["any"], tile_size=3),
+        distances[:5],
+    )
+
+
+def test_euclidean_memmap(tmp_path):
+    rng = np.random.default_rng(2)
+    values = rng.normal(size=(30, 22))
+    out = np.lib.format.open_memmap(
+        tmp_path / "distances.npy", mode="w+", dtype=np.float64, shape=(30, 30)
+    )
+
+    pairwise_distances(values, metric="euclidean", out=out, tile_size=8)
+    out.flush()
+
+    expected = np.linalg.norm(values[:, None] - values[None], axis=-1)
+    assert np.allclose(np.load(tmp_path / "distances.npy"), expected)
+
+
+def test_invalid():
+    bars = np.zeros((3, 1), BITMASK_DTYPE)
+    with pytest.raises(ValueError):
+        pairwise_distances(bars, metric="manhattan")
+    with pytest.raises(ValueError):
+        pairwise_distances(bars, np.zeros((3, 2), BITMASK_DTYPE))
+    with pytest.raises(ValueError):
+        pairwise_distances(bars, out=np.zeros((3, 4)))
+    with pytest.raises(ValueError):
+        pairwise_distances(np.zeros((3, 1), np.int64))
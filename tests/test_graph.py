@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from .fixtures import BOSKA_3, BOSKA_3_PATTLIST, BOSKA_8
+
+from rhythmtoolbox import (
+    BitmaskPattern,
+    bitmask2descriptors,
+    bitmasks2descriptors,
+    midifile2descriptors,
+    pattlist2descriptors,
+    pianoroll2descriptors,
+    pianorolls2descriptors,
+    rolls_to_bitmasks,
+)
+from rhythmtoolbox.graph import NODES, compute_descriptors
+
+
+def test_compute_descriptors(monkeypatch):
+    calls = []
+    for name, (deps, fn) in NODES.items():
+        monkeypatch.setitem(
+            NODES,
+            name,
+            (deps, lambda *args, fn=fn, name=name: calls.append(name) or fn(*args)),
+        )
+
+    bars = rolls_to_bitmasks(np.stack([BOSKA_3, BOSKA_8]))
+    values = compute_descriptors(["lowness", "hiness", "polyDensity"], bars, 16)
+    assert sorted(calls) == sorted(
+        [
+            "n_onset_steps",
+            "lowDensity",
+            "midDensity",
+            "hiDensity",
+            "lowness",
+            "hiness",
+            "polyDensity",
+        ]
+    )
+    assert np.array_equal(
+        values["polyDensity"],
+        [pianoroll2descriptors(roll)["polyDensity"] for roll in [BOSKA_3, BOSKA_8]],
+    )
+
+    calls.clear()
+    values = compute_descriptors(["polySync", "polyBalance", "noi"], bars, 16)
+    assert sorted(calls) == ["band_patterns", "polyBalance", "polySync"]
+    assert np.isnan(values["noi"]).all()
+
+    values = compute_descriptors(["sync", "lowSync"], bars[:, :0], 0, drums=False)
+    assert np.isnan(values["sync"]).all() and np.isnan(values["lowSync"]).all()
+
+
+def test_selected_descriptors():
+    names = ["polySync", "noi", "stepDensity", "midness"]
+    expected = pianoroll2descriptors(BOSKA_3)
+
+    for result in [
+        pianoroll2descriptors(BOSKA_3, descriptors=names),
+        pattlist2descriptors(BOSKA_3_PATTLIST, descriptors=names),
+        bitmask2descriptors(BitmaskPattern.from_pianoroll(BOSKA_3), descriptors=names),
+        midifile2descriptors("midi/boska/3.mid", descriptors=names),
+    ]:
+        assert list(result) == names
+        for name in names:
+            assert np.isclose(result[name], expected[name])
+
+    assert pianoroll2descriptors(BOSKA_3, drums=False, descriptors=["midness"]) == {
+        "midness": None
+    }
+
+    rolls = np.stack([BOSKA_3, BOSKA_8, np.zeros_like(BOSKA_3)])
+    values = pianorolls2descriptors(rolls, descriptors=names, chunksize=2)
+    assert values.shape == (3, 4)
+    assert np.allclose(values[0], [expected[name] for name in names])
+    assert np.isnan(values[2]).all()
+
+    bars = rolls_to_bitmasks(rolls)
+    assert np.allclose(
+        bitmasks2descriptors(bars, values[:, 1], descriptors=names),
+        values,
+        equal_nan=True,
+    )
+
+    with pytest.raises(ValueError):
+        pianoroll2descriptors(BOSKA_3, descriptors=["sync", "tempo"])
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from .fixtures import BOSKA_3, BOSKA_8, BOSKA_9_PATTLIST
+
+from rhythmtoolbox import (
+    DescriptorIndex,
+    pattlist2descriptors,
+    pianoroll2descriptors,
+)
+
+
+@pytest.mark.parametrize("method", ["brute", "kdtree"])
+def test_query(method):
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(500, 22))
+    values[::7, 3] = np.nan
+    queries = rng.normal(size=(10, 22))
+    weights = {"noi": 0, "sync": 2}
+
+    index = DescriptorIndex(values, weights=weights, method=method, block_size=64)
+    distances, indices = index.query(queries, k=5)
+    assert distances.shape == indices.shape == (10, 5)
+
+    # Compare with the distances to all points
+    points = (values - np.nanmean(values, axis=0)) / np.nanstd(values, axis=0)
+    points[np.isnan(points)] = 0
+    query_points = (queries - np.nanmean(values, axis=0)) / np.nanstd(values, axis=0)
+    scale = np.ones(22)
+    scale[[0, 9]] = [0, 2]
+    all_distances = np.linalg.norm((query_points[:, None] - points) * scale, axis=-1)
+
+    assert np.allclose(distances, np.sort(all_distances, axis=1)[:, :5])
+    assert np.allclose(np.take_along_axis(all_distances, indices, axis=1), distances)
+
+    radius_distances, radius_indices = index.query_radius(queries, 4)
+    for d, ix, expected in zip(radius_distances, radius_indices, all_distances):
+        assert np.array_equal(np.sort(ix), np.nonzero(expected <= 4)[0])
+        assert np.allclose(d, expected[ix])
+        assert np.all(np.diff(d) >= 0)
+
+
+def test_descriptor_dicts(tmp_path):
+    patterns = [
+        pianoroll2descriptors(BOSKA_3),
+        pianoroll2descriptors(BOSKA_8),
+        pattlist2descriptors(BOSKA_9_PATTLIST),
+    ]
+    index = DescriptorIndex(patterns, descriptors=["lowDensity", "sync", "balance"])
+    assert len(index) == 3
+
+    distances, indices = index.query(patterns[1], k=10)
+    assert indices.shape == (1, 3)
+    assert indices[0, 0] == 1
+    assert distances[0, 0] == 0
+
+    filepath = tmp_path / "index.npz"
+    index.save(filepath)
+    loaded = DescriptorIndex.load(filepath)
+    assert loaded.descriptors == index.descriptors
+    for a, b in zip(loaded.query(patterns, k=2), index.query(patterns, k=2)):
+        assert np.array_equal(a, b)
+
+
+def test_invalid():
+    values = np.zeros((3, 22))
+    with pytest.raises(ValueError):
+        DescriptorIndex(values, method="balltree")
+    with pytest.raises(ValueError):
+        DescriptorIndex(values, descriptors=["sync"])
+    with pytest.raises(ValueError):
+        DescriptorIndex(values, weights={"notADescriptor": 1})
+    with pytest.raises(ValueError):
+        DescriptorIndex(values).query(np.zeros(3))
@@ -1,4 +1,9 @@
+import glob
+import subprocess
+import sys
+
 import numpy as np
+import pytest
 from .fixtures import (
     BOSKA_3,
     BOSKA_3_DESCRIPTORS,
@@ -14,9 +19,23 @@ from .fixtures import (
 )
 
 from rhythmtoolbox import (
+    DESCRIPTOR_DTYPE,
+    DESCRIPTOR_NAMES,
+    as_records,
+    descriptors2array,
+    get_beat_subdivisions,
+    imidifiles2descriptors,
     midifile2descriptors,
+    midifile2trackdescriptors,
+    midifiles2descriptors,
     pattlist2descriptors,
     pianoroll2descriptors,
+    pianoroll2timeline,
+    pianorolls2descriptors,
+    quantize_times,
+    read_onset_roll,
+    read_onset_rolls,
+    resample_pianoroll,
 )
 
 
@@ -188,3 +207,266 @@ def test_pattlist2descriptors():
     assert set(v) == set(BOSKA_9_DESCRIPTORS)
     for k in v:
         assert np.isclose(v[k], BOSKA_9_DESCRIPTORS[k])
+
+
+def test_pianorolls2descriptors():
+    rolls = np.stack([BOSKA_3, BOSKA_8, BOSKA_9, np.zeros_like(BOSKA_3)])
+
+    v = pianorolls2descriptors(rolls)
+    assert v.shape == (4, len(DESCRIPTOR_NAMES))
+    for row, expected in zip(
+        v, [BOSKA_3_DESCRIPTORS, BOSKA_8_DESCRIPTORS, BOSKA_9_DESCRIPTORS]
+    ):
+        for ix, name in enumerate(DESCRIPTOR_NAMES):
+            assert np.isclose(row[ix], expected[name])
+    assert np.isnan(v[3]).all()
+
+    # A list of rolls is stacked into a batch
+    assert np.array_equal(pianorolls2descriptors(list(rolls)), v, equal_nan=True)
+
+    for drums in [True, False]:
+        for roll in [np.concatenate([BOSKA_3, BOSKA_9]), BOSKA_8[:12]]:
+            v = pianorolls2descriptors(roll[None], drums=drums)[0]
+            expected = pianoroll2descriptors(roll, drums=drums)
+            for ix, name in enumerate(DESCRIPTOR_NAMES):
+                if expected[name] is None:
+                    assert np.isnan(v[ix])
+                else:
+                    assert np.isclose(v[ix], expected[name])
+
+
+def test_midifiles2descriptors():
+    filepaths = ["midi/boska/3.mid", "midi/missing.mid", "midi/two_bar/four_kicks.mid"]
+    expected = [BOSKA_3_DESCRIPTORS, FOUR_KICKS_DESCRIPTORS]
+
+    for workers in [1, 2]:
+        descriptors, errors = midifiles2descriptors(filepaths, workers=workers)
+        assert list(descriptors) == [filepaths[0], filepaths[2]]
+        for v, e in zip(descriptors.values(), expected):
+            for k in v:
+                assert np.isclose(v[k], e[k])
+        assert list(errors) == ["midi/missing.mid"]
+
+    results = list(
+        imidifiles2descriptors(
+            "midi/boska/*.mid", workers=2, chunksize=3, ordered=False
+        )
+    )
+    assert len(results) == 10
+    assert all(error is None for _, _, error in results)
+    assert {filepath for filepath, _, _ in results} == set(
+        glob.glob("midi/boska/*.mid")
+    )
+
+
+def test_quantize_times():
+    rng = np.random.default_rng(0)
+    grid = np.array([0, 0.25, 0.5, 0.5, 0.75, 1.25, 2])
+    times = np.concatenate([rng.uniform(-1, 3, 100), grid, [0.125, 0.375, 1.625]])
+
+    expected = [np.argmin(np.abs(t - grid)) for t in times]
+    assert np.array_equal(quantize_times(times, grid), expected)
+
+
+def test_get_beat_subdivisions():
+    beats = np.array([0, 0.5, 1, 1.5])
+    expected = np.arange(0, 2.125, 0.125)
+
+    subdivisions = get_beat_subdivisions(beats, 4)
+    assert np.array_equal(subdivisions, expected)
+    assert not subdivisions.flags.writeable
+    assert get_beat_subdivisions(beats.copy(), 4) is subdivisions
+
+    assert np.array_equal(get_beat_subdivisions([], 2), np.arange(0, 4.5, 0.5))
+
+
+def test_columnar_output():
+    rolls = np.stack([BOSKA_3, BOSKA_8, BOSKA_9, np.zeros_like(BOSKA_3)])
+    expected = pianorolls2descriptors(rolls)
+
+    out = np.zeros((6, len(DESCRIPTOR_NAMES)), np.float32)
+    result = pianorolls2descriptors(rolls, out=out[1:5], chunksize=3)
+    assert result.base is out
+    assert np.allclose(out[1:5], expected, equal_nan=True)
+    assert not out[[0, 5]].any()
+
+    result = pianorolls2descriptors(rolls, dtype=np.float32)
+    assert result.dtype == np.float32
+    assert np.allclose(result, expected, equal_nan=True)
+
+    dicts = [pianoroll2descriptors(roll) for roll in rolls]
+    assert np.allclose(descriptors2array(dicts), expected, equal_nan=True)
+    assert np.allclose(descriptors2array(dicts[0]), expected[0])
+
+    records = as_records(expected)
+    assert records.shape == (4,)
+    assert records.dtype == DESCRIPTOR_DTYPE
+    assert np.shares_memory(records, expected)
+    assert np.array_equal(
+        records["sync"], expected[:, DESCRIPTOR_NAMES.index("sync")], equal_nan=True
+    )
+
+    with pytest.raises(ValueError):
+        pianorolls2descriptors(rolls, out=out)
+
+
+def test_pianoroll2timeline():
+    roll = np.concatenate([BOSKA_3, BOSKA_8, BOSKA_9, BOSKA_3[:8]])
+
+    bars = pianoroll2timeline(roll)
+    assert bars.shape == (3, len(DESCRIPTOR_NAMES))
+    for values, bar in zip(bars, [BOSKA_3, BOSKA_8, BOSKA_9]):
+        assert np.allclose(values, descriptors2array(pianoroll2descriptors(bar)))
+
+    windows = pianoroll2timeline(roll, window=32, hop=4, descriptors=["sync", "noi"])
+    assert windows.shape == (7, 2)
+    for values, start in zip(windows, range(0, 28, 4)):
+        expected = pianoroll2descriptors(roll[start : start + 32])
+        assert np.allclose(values, [expected["sync"], expected["noi"]])
+
+    windows = pianoroll2timeline(roll, window=12, hop=12)
+    assert windows.shape == (4, len(DESCRIPTOR_NAMES))
+    expected = pianoroll2descriptors(roll[12:24])
+    assert np.allclose(windows[1], descriptors2array(expected), equal_nan=True)
+
+    assert pianoroll2timeline(roll, window=64).shape == (0, len(DESCRIPTOR_NAMES))
+
+    with pytest.raises(ValueError):
+        pianoroll2timeline(roll, hop=0)
+
+
+def test_resample_pianoroll():
+    # Onsets at 8 ticks per beat, at steps 0, 3 and 4 (both nearest to 2) and 13 (moved into the last step)
+    roll = np.zeros((14, 128), np.uint8)
+    roll[[0, 3, 4, 13], [36, 38, 38, 42]] = [50, 80, 100, 1]
+
+    resampled = resample_pianoroll(roll, 8, 4)
+    assert resampled.shape == (7, 128)
+    assert resampled.dtype == np.uint8
+    assert np.array_equal(np.nonzero(resampled), [[0, 2, 6], [36, 38, 42]])
+    assert resampled[2, 38] == 100
+
+    # Upsampling does not repeat onsets, and resampling back restores the roll
+    upsampled = resample_pianoroll(BOSKA_3.astype(bool), 4, 12)
+    assert upsampled.shape == (48, 128) and upsampled.dtype == bool
+    assert upsampled.sum() == (BOSKA_3 > 0).sum()
+    assert np.array_equal(resample_pianoroll(upsampled, 12, 4), BOSKA_3 > 0)
+
+    # Batches, and downsampling in place
+    rolls = np.stack([roll, roll[::-1]])
+    expected = [resample_pianoroll(r, 8, 4) for r in rolls]
+    resampled = resample_pianoroll(rolls, 8, 4, out=rolls[:, :7])
+    assert np.shares_memory(resampled, rolls)
+    assert np.array_equal(resampled, expected)
+
+    with pytest.raises(ValueError):
+        resample_pianoroll(roll, 8, 4, out=np.zeros((8, 128), np.uint8))
+
+    # Integer-valued float resolutions are accepted, others are invalid
+    assert np.array_equal(resample_pianoroll(roll, 8.0, 4), expected[0])
+    assert pianoroll2descriptors(roll, resolution=8.0) == pianoroll2descriptors(
+        roll, resolution=8
+    )
+    with pytest.raises(ValueError):
+        resample_pianoroll(roll, 7.5, 4)
+    with pytest.raises(ValueError):
+        pianoroll2descriptors(roll, resolution=0)
+
+
+def write_multitrack_midifile(filepath):
+    """Writes BOSKA_3 as a drum track with the kick and snare, a pitched track with pitch 64 and a drum track with the
+    hi-hats"""
+    import pretty_midi as pm
+
+    pmid = pm.PrettyMIDI(resolution=480, initial_tempo=120)
+    programs = [(0, True), (33, False), (0, True)]
+    pitch_sets = [{36, 38}, {64}, {42, 46}]
+    for (program, is_drum), pitches in zip(programs, pitch_sets):
+        instrument = pm.Instrument(program, is_drum=is_drum)
+        for step, notes in enumerate(BOSKA_3_PATTLIST * 2):
+            for pitch in notes:
+                if pitch in pitches:
+                    start = step * 0.125
+                    instrument.notes.append(pm.Note(100, pitch, start, start + 0.1))
+        pmid.instruments.append(instrument)
+    pmid.write(str(filepath))
+
+
+def test_read_onset_rolls(tmp_path):
+    filepath = tmp_path / "multitrack.mid"
+    write_multitrack_midifile(filepath)
+
+    for reader in ["pretty_midi", "smf"]:
+        tracks, drum_roll = read_onset_rolls(filepath, reader=reader)
+        assert [(program, is_drum) for program, is_drum, _ in tracks] == [
+            (0, True),
+            (33, False),
+            (0, True),
+        ]
+
+        # The first track is the roll of `read_onset_roll`, and all rolls are aligned
+        assert np.array_equal(tracks[0][2], read_onset_roll(filepath, reader=reader))
+        assert all(roll.shape == drum_roll.shape for _, _, roll in tracks)
+        assert np.array_equal(drum_roll, tracks[0][2] | tracks[2][2])
+
+        sparse_tracks, sparse_drum_roll = read_onset_rolls(
+            filepath, reader=reader, sparse=True
+        )
+        assert np.array_equal(sparse_drum_roll.to_pianoroll(), drum_roll)
+
+    names = ["noi", "sync"]
+    track_descriptors, drum_descriptors = midifile2trackdescriptors(
+        filepath, descriptors=names
+    )
+    assert drum_descriptors == pianoroll2descriptors(drum_roll, descriptors=names)
+    for (_, is_drum, descriptors), (_, _, roll) in zip(track_descriptors, tracks):
+        assert descriptors == pianoroll2descriptors(
+            roll, drums=is_drum, descriptors=names
+        )
+
+
+def test_read_onset_rolls_overlapping_drums(tmp_path):
+    import pretty_midi as pm
+
+    # Two drum tracks play the kick on the first step with different velocities, in both orders
+    for velocities in [(120, 30), (30, 120)]:
+        pmid = pm.PrettyMIDI(resolution=480, initial_tempo=120)
+        for velocity in velocities:
+            instrument = pm.Instrument(0, is_drum=True)
+            instrument.notes.append(pm.Note(velocity, 36, 0, 0.1))
+            instrument.notes.append(pm.Note(100, 38, 0.5, 0.6))
+            pmid.instruments.append(instrument)
+        filepath = tmp_path / "overlapping.mid"
+        pmid.write(str(filepath))
+
+        for reader in ["pretty_midi", "smf"]:
+            _, drum_roll = read_onset_rolls(filepath, reader=reader)
+            assert drum_roll[0, 36] == 120
+            assert drum_roll[4, 38] == 100
+
+            _, sparse_drum_roll = read_onset_rolls(filepath, reader=reader, sparse=True)
+            assert len(sparse_drum_roll.steps) == 2
+            assert np.array_equal(sparse_drum_roll.to_pianoroll(), drum_roll)
+
+
+def test_lazy_imports():
+    # Describing in-memory patterns does not import the MIDI and SciPy dependencies, which load on first use
+    code = """
+import sys
+import time
+start = time.perf_counter()
+import rhythmtoolbox
+rhythmtoolbox.pattlist2descriptors([[36], [], [38, 42], []] * 4)
+print(time.perf_counter() - start)
+print(sorted(m for m in ["pretty_midi", "mido", "scipy"] if m in sys.modules))
+rhythmtoolbox.read_onset_roll("midi/boska/3.mid")
+print("pretty_midi" in sys.modules)
+"""
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout.split()
+    assert output[1:] == ["[]", "True"]
+
+    # The import and the first call, which builds lookup tables, take a fraction of a second. The bound is loose so
+    # that slow machines pass, but catches eager imports or table builds that cost as much as the rest of the cold start
+    assert float(output[0]) < 1
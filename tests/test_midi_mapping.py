@@ -1,6 +1,29 @@
-from .fixtures import BOSKA_3, BOSKA_8, BOSKA_9
+import numpy as np
+import pytest
 
-from rhythmtoolbox.midi_mapping import event_to_3number, event_to_8number, get_band
+from .fixtures import BOSKA_3, BOSKA_3_PATTLIST, BOSKA_8, BOSKA_9
+
+from rhythmtoolbox import (
+    BitmaskPattern,
+    DescriptorCache,
+    DescriptorStream,
+    pattlist2descriptors,
+    pattlist_to_pianoroll,
+    pianoroll2descriptors,
+    register_mapping,
+)
+from rhythmtoolbox import midi_mapping
+from rhythmtoolbox.midi_mapping import (
+    GM_dict,
+    event_to_3number,
+    event_to_8number,
+    get_band,
+    get_band_matrix,
+    get_bands,
+    remap_roll,
+    roll_to_3number,
+    roll_to_8number,
+)
 
 
 def test_get_band():
@@ -27,3 +50,93 @@ def test_event_to_8number():
 def test_event_to_3number():
     assert event_to_3number([36, 38, 46]) == [1, 2, 3]
     assert event_to_3number([37, 38, 39, 42, 46]) == [2, 3]
+
+
+def test_roll_reductions():
+    rolls = np.stack([BOSKA_3, BOSKA_8, BOSKA_9]).astype(np.uint8) * 100
+    rolls[1, 0, 51] = 127
+    reductions = [roll_to_8number(rolls), roll_to_3number(rolls), remap_roll(rolls)]
+    assert [r.shape for r in reductions] == [(3, 16, 8), (3, 16, 3), (3, 16, 128)]
+    assert all(r.dtype == np.uint8 for r in reductions)
+
+    # Each step has the instruments of its event
+    for roll, r8, r3, simplified in zip(rolls, *reductions):
+        for step, r8_step, r3_step, simplified_step in zip(roll, r8, r3, simplified):
+            event = np.nonzero(step)[0].tolist()
+            assert [n + 1 for n in np.nonzero(r8_step)[0]] == [
+                n for n in event_to_8number(event) if n > 0
+            ]
+            assert [n + 1 for n in np.nonzero(r3_step)[0]] == [
+                n for n in event_to_3number(event) if n > 0
+            ]
+            assert np.nonzero(simplified_step)[0].tolist() == sorted(
+                {GM_dict[pitch][2] for pitch in event}
+            )
+
+    # Merged pitches keep the maximum velocity
+    assert roll_to_3number(rolls)[1, 0, 2] == 127
+
+    # Unknown pitches raise before any reduction, unless dropped or kept
+    rolls[2, 5, 100] = 1
+    with pytest.raises(ValueError):
+        roll_to_8number(rolls)
+    assert np.array_equal(roll_to_3number(rolls, unknown="drop"), reductions[1])
+    assert remap_roll(rolls, unknown="keep")[2, 5, 100] == 1
+    for reduce in [roll_to_8number, roll_to_3number]:
+        with pytest.raises(ValueError):
+            reduce(rolls, unknown="keep")
+    with pytest.raises(ValueError):
+        remap_roll(rolls, unknown="ignore")
+    with pytest.raises(ValueError):
+        remap_roll(rolls, column=3)
+
+
+def test_band_matrix():
+    matrix = get_band_matrix("gm")
+    assert matrix.shape == (128, 3)
+    assert not matrix.flags.writeable
+    assert np.nonzero(matrix[:, 0])[0].tolist() == [35, 36, 41, 45, 47, 64]
+
+    # Batches and rolls with fewer pitches
+    rolls = np.stack([BOSKA_3, BOSKA_8, BOSKA_9])
+    for roll, bands in zip(rolls, zip(*get_bands(rolls))):
+        for band, expected in zip(bands, get_bands(roll)):
+            assert np.array_equal(band, expected)
+    truncated = BOSKA_3.copy()
+    truncated[:, 40:] = 0
+    assert np.array_equal(get_band(BOSKA_3[:, :40], "low"), get_band(truncated, "low"))
+
+    with pytest.raises(ValueError):
+        get_band_matrix("notAMapping")
+
+
+def test_register_mapping(monkeypatch):
+    # The mappings registered by the test are removed when it ends
+    monkeypatch.setattr(midi_mapping, "_MAPPINGS", dict(midi_mapping._MAPPINGS))
+
+    # A kit that plays the instruments of BOSKA_3 on other pitches
+    register_mapping("test", low=[60, 63], mid=[61], hi=[62, 65])
+    kit = {36: 60, 64: 63, 38: 61, 42: 62, 46: 65}
+    pattlist = [[kit[pitch] for pitch in step] for step in BOSKA_3_PATTLIST]
+    expected = pattlist2descriptors(BOSKA_3_PATTLIST)
+
+    assert pattlist2descriptors(pattlist, mapping="test") == expected
+    roll = pattlist_to_pianoroll(pattlist)
+    assert pianoroll2descriptors(roll, mapping="test") == expected
+    assert BitmaskPattern.from_pattlist(pattlist, mapping="test").bars.tolist() == (
+        BitmaskPattern.from_pattlist(BOSKA_3_PATTLIST).bars.tolist()
+    )
+
+    stream = DescriptorStream(mapping="test")
+    for notes in pattlist:
+        stream.push(notes)
+    assert stream.descriptors() == pytest.approx(expected)
+
+    # Mappings are cached separately
+    cache = DescriptorCache()
+    assert pattlist2descriptors(pattlist, cache=cache, mapping="test") == expected
+    assert pattlist2descriptors(pattlist, cache=cache) != expected
+    assert cache.misses == 2
+
+    with pytest.raises(ValueError):
+        register_mapping("invalid", low=[128], mid=[], hi=[])
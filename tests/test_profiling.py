@@ -0,0 +1,58 @@
+import pytest
+
+from .fixtures import BOSKA_3_PATTLIST
+
+from rhythmtoolbox import midifile2descriptors, pattlist2descriptors, profiling
+
+
+@pytest.fixture(autouse=True)
+def clean_profiling():
+    profiling.reset()
+    yield
+    profiling.disable()
+    profiling.reset()
+
+
+def test_disabled():
+    assert not profiling.is_enabled()
+    pattlist2descriptors(BOSKA_3_PATTLIST)
+    assert profiling.get_stats() == {}
+
+
+def test_stages():
+    profiling.enable()
+    midifile2descriptors("midi/boska/3.mid", reader="smf")
+    midifile2descriptors("midi/boska/3.mid", reader="smf", descriptors=["sync"])
+    stats = profiling.get_stats()
+
+    assert stats["parse.smf"]["calls"] == 2
+    assert stats["subdivisions"]["calls"] == 2
+    assert stats["quantize"]["calls"] == 2
+    assert stats["bands"]["calls"] == 2
+    assert stats["descriptors.sync"]["calls"] == 2
+    assert stats["descriptors.polySync"]["calls"] == 1
+    assert all(s["seconds"] >= 0 for s in stats.values())
+
+    report = profiling.report()
+    assert report.splitlines()[0].split() == ["stage", "calls", "seconds", "us/call"]
+    assert len(report.splitlines()) == len(stats) + 1
+
+    profiling.disable()
+    pattlist2descriptors(BOSKA_3_PATTLIST)
+    assert profiling.get_stats() == stats
+
+
+def test_sink():
+    timings = []
+
+    def sink(stage, seconds):
+        timings.append(stage)
+
+    profiling.add_sink(sink)
+    profiling.enable()
+    pattlist2descriptors(BOSKA_3_PATTLIST, descriptors=["noi", "lowDensity"])
+    profiling.remove_sink(sink)
+
+    assert timings.count("descriptors.noi") == 1
+    assert timings.count("descriptors.lowDensity") == 1
+    assert sorted(set(timings)) == sorted(profiling.get_stats())
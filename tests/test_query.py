@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from .fixtures import BOSKA_3_PATTLIST, BOSKA_9_PATTLIST
+
+from rhythmtoolbox import BitmaskPattern, pattlist2descriptors
+from rhythmtoolbox.query import DescriptorTable
+from rhythmtoolbox.space import build_monophonic_space, build_polyphonic_space
+
+
+@pytest.fixture
+def space(tmp_path):
+    return build_polyphonic_space(
+        tmp_path / "poly.npy",
+        low=[0, 0x1111, 0x0101],
+        mid=np.arange(0, 2**16, 97),
+        hi=[0, 0x8888],
+        descriptors=["sync", "lowness", "polyEvenness"],
+    )
+
+
+def test_filter(space):
+    table = DescriptorTable.from_space(space, block_size=100)
+    ranges = {"sync": (4, 8), "lowness": (0.3, None)}
+
+    expected = np.nonzero(
+        (space["sync"] >= 4) & (space["sync"] <= 8) & (space["lowness"] >= 0.3)
+    )[0]
+    assert len(expected) > 0
+    assert np.array_equal(table.filter(ranges), expected)
+    assert np.array_equal(table.filter(ranges, limit=5), expected[:5])
+    assert len(table.filter({"sync": (100, None)})) == 0
+
+    # The patterns have the descriptors of the matching rows
+    for ix, pattlist in zip(expected[:5], table.to_pattlists(expected[:5])):
+        descriptors = pattlist2descriptors(pattlist, descriptors=["sync", "lowness"])
+        assert descriptors["sync"] == space[ix]["sync"]
+        assert descriptors["lowness"] == space[ix]["lowness"]
+
+    with pytest.raises(ValueError):
+        table.filter({"notADescriptor": (0, 1)})
+
+
+def test_nearest(space):
+    table = DescriptorTable.from_space(space, block_size=100)
+    target = {"polyEvenness": 5, "sync": 3}
+    ranges = {"lowness": (0.3, None)}
+    distances, indices = table.nearest(target, k=20, ranges=ranges, weights={"sync": 2})
+
+    expected = np.sqrt(
+        ((space["polyEvenness"] - 5) / np.nanstd(space["polyEvenness"])) ** 2
+        + ((space["sync"] - 3) * 2 / np.nanstd(space["sync"])) ** 2
+    )
+    expected[~(space["lowness"] >= 0.3)] = np.nan
+    order = np.argsort(np.nan_to_num(expected, nan=np.inf), kind="stable")[:20]
+
+    assert np.allclose(distances, expected[order])
+    assert np.array_equal(indices, order)
+
+
+def test_bitmasks_and_monophonic_space(tmp_path):
+    patterns = [
+        BitmaskPattern.from_pattlist(p) for p in [BOSKA_3_PATTLIST, BOSKA_9_PATTLIST]
+    ]
+    bars = np.stack([p.bars for p in patterns])
+    table = DescriptorTable.from_bitmasks(bars, noi=[p.noi for p in patterns])
+
+    expected = pattlist2descriptors(BOSKA_9_PATTLIST)
+    distances, indices = table.nearest(
+        {"noi": expected["noi"], "sync": expected["sync"]}, k=1
+    )
+    assert indices[0] == 1
+    assert distances[0] == 0
+    assert np.array_equal(table.to_bitmasks(indices), bars[[1]])
+
+    # Rows of the monophonic space are indexed by bitmask
+    table = DescriptorTable.from_space(build_monophonic_space(tmp_path / "mono.npy"))
+    masks = table.filter({"density": (4, 4), "evenness": (1, None)})
+    assert masks.tolist() == [0x1111, 0x2222, 0x4444, 0x8888]
+    with pytest.raises(ValueError):
+        table.to_bitmasks(masks)
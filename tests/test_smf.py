@@ -0,0 +1,59 @@
+import glob
+
+import numpy as np
+import pretty_midi as pm
+import pytest
+
+from rhythmtoolbox import (
+    get_onset_roll_from_pmid,
+    get_onset_roll_from_smf,
+    midifile2descriptors,
+    read_onset_roll,
+)
+from rhythmtoolbox.smf import read_smf
+
+MIDI_FILES = sorted(glob.glob("midi/**/*.mid", recursive=True))
+
+
+def test_read_smf():
+    for filepath in MIDI_FILES:
+        pmid = pm.PrettyMIDI(filepath)
+        smf = read_smf(filepath)
+
+        assert smf.resolution == pmid.resolution
+        assert len(smf.instruments) == len(pmid.instruments)
+        for instrument, pm_instrument in zip(smf.instruments, pmid.instruments):
+            assert instrument.program == pm_instrument.program
+            assert instrument.is_drum == pm_instrument.is_drum
+            notes = pm_instrument.notes
+            assert smf.tick_to_time(instrument.start_ticks).tolist() == [
+                n.start for n in notes
+            ]
+            assert instrument.pitches.tolist() == [n.pitch for n in notes]
+            assert instrument.velocities.tolist() == [n.velocity for n in notes]
+
+        assert smf.get_end_time() == pmid.get_end_time()
+        assert np.array_equal(smf.get_beats(), pmid.get_beats())
+
+
+def test_get_onset_roll_from_smf():
+    for filepath in MIDI_FILES:
+        onset_roll = get_onset_roll_from_smf(read_smf(filepath))
+        expected = get_onset_roll_from_pmid(pm.PrettyMIDI(filepath))
+        assert onset_roll.dtype == expected.dtype
+        assert np.array_equal(onset_roll, expected)
+
+        assert np.array_equal(read_onset_roll(filepath, reader="smf"), expected)
+
+    v = midifile2descriptors("midi/boska/3.mid", reader="smf")
+    assert v == midifile2descriptors("midi/boska/3.mid")
+
+    with pytest.raises(ValueError):
+        read_onset_roll("midi/boska/3.mid", reader="mido")
+
+
+def test_read_smf_invalid(tmp_path):
+    filepath = tmp_path / "invalid.mid"
+    filepath.write_bytes(b"RIFF0000")
+    with pytest.raises(ValueError):
+        read_smf(filepath)
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from rhythmtoolbox import pattlist2descriptors
+from rhythmtoolbox.descriptors import balance, evenness, syncopation16
+from rhythmtoolbox.space import (
+    POLYPHONIC_DESCRIPTORS,
+    build_monophonic_space,
+    build_polyphonic_space,
+    load_space,
+)
+from rhythmtoolbox.tables import unpack_patterns
+
+
+def test_monophonic_space(tmp_path):
+    space = build_monophonic_space(tmp_path / "mono.npy")
+    assert len(space) == 2**16
+    assert not space.flags.writeable
+
+    for mask in [0, 1, 0b1001001001001000, 12345, 2**16 - 1]:
+        pattern = unpack_patterns(mask).tolist()
+        row = space[mask]
+        assert row["mask"] == mask
+        assert row["density"] == sum(pattern)
+        assert row["sync"] == syncopation16(pattern)
+        assert np.isclose(row["evenness"], evenness(pattern))
+        assert np.isclose(row["balance"], balance(pattern))
+
+    assert np.array_equal(load_space(tmp_path / "mono.npy"), space)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_polyphonic_space(tmp_path, workers):
+    rng = np.random.default_rng(0)
+    low = 0b0001000100010001
+    mid = rng.integers(0, 2**16, 6)
+    hi = [0, 0b0101010101010101, 2**16 - 1]
+
+    space = build_polyphonic_space(
+        tmp_path / "poly.npy", low, mid, hi, chunksize=5, workers=workers
+    )
+    assert len(space) == 18
+    assert space.dtype.names == ("low", "mid", "hi", *POLYPHONIC_DESCRIPTORS)
+    assert np.all(space["low"] == low)
+    assert np.array_equal(space["mid"], np.repeat(mid, 3))
+    assert np.array_equal(space["hi"], np.tile(hi, 6))
+
+    for row in space:
+        pattlist = [
+            [
+                pitch
+                for band, pitch in [("low", 36), ("mid", 38), ("hi", 42)]
+                if row[band] >> step & 1
+            ]
+            for step in range(16)
+        ]
+        expected = pattlist2descriptors(pattlist, descriptors=POLYPHONIC_DESCRIPTORS)
+        for name in POLYPHONIC_DESCRIPTORS:
+            assert np.isclose(row[name], expected[name])
+
+
+def test_polyphonic_space_selection(tmp_path):
+    space = build_polyphonic_space(
+        tmp_path / "poly.npy", low=0, mid=0, hi=None, descriptors=["sync", "hiSync"]
+    )
+    assert len(space) == 2**16
+    assert space.dtype.names == ("low", "mid", "hi", "sync", "hiSync")
+
+    # Empty patterns are not defined
+    assert np.isnan(space[0]["sync"])
+    assert np.array_equal(space["sync"][1:], space["hiSync"][1:])
+
+    with pytest.raises(ValueError):
+        build_polyphonic_space(tmp_path / "invalid.npy", low=2**16)
+
+    # All combinations of all patterns of two bands must be requested explicitly, and three bands are too many rows
+    with pytest.raises(ValueError, match="allow_large"):
+        build_polyphonic_space(tmp_path / "invalid.npy", low=0)
+    with pytest.raises(ValueError):
+        build_polyphonic_space(tmp_path / "invalid.npy", allow_large=True)
+    assert not (tmp_path / "invalid.npy").exists()
@@ -0,0 +1,70 @@
+import numpy as np
+from .fixtures import (
+    BOSKA_3,
+    BOSKA_3_PATTLIST,
+    BOSKA_8,
+    BOSKA_9_PATTLIST,
+    assert_descriptors_equal,
+)
+
+from rhythmtoolbox import (
+    SparseRoll,
+    midifile2descriptors,
+    pattlist_to_pianoroll,
+    pianoroll2descriptors,
+    read_onset_roll,
+    resample_pianoroll,
+    sparseroll2descriptors,
+)
+from rhythmtoolbox.bitmask import rolls_to_bitmasks
+from rhythmtoolbox.descriptors import noi, step_density
+from rhythmtoolbox.midi_mapping import get_bands
+
+
+def test_sparse_roll():
+    roll = np.concatenate([BOSKA_3, BOSKA_8])
+    sparse = SparseRoll.from_pianoroll(roll)
+
+    assert len(sparse) == len(roll)
+    assert sparse.nbytes < roll.nbytes
+    assert np.array_equal(sparse.to_pianoroll(), roll)
+    assert sparse.noi() == noi(roll)
+    assert sparse.step_density() == step_density(roll)
+    for steps, pattern in zip(sparse.get_bands(), get_bands(roll)):
+        assert np.array_equal(steps, np.flatnonzero(pattern))
+    assert np.array_equal(sparse.to_bitmasks(), rolls_to_bitmasks(roll))
+
+    pattlist_roll = SparseRoll.from_pattlist(BOSKA_3_PATTLIST).to_pianoroll()
+    assert np.array_equal(pattlist_roll, pattlist_to_pianoroll(BOSKA_3_PATTLIST))
+
+
+def test_sparse_roll_resample():
+    roll = pattlist_to_pianoroll(BOSKA_9_PATTLIST)
+    sparse = SparseRoll.from_pianoroll(roll)
+
+    for from_resolution, to_resolution in [(4, 4), (8, 4), (3, 4), (4, 24), (24, 4)]:
+        expected = resample_pianoroll(roll, from_resolution, to_resolution)
+        resampled = sparse.resample(from_resolution, to_resolution).to_pianoroll()
+        assert np.array_equal(resampled, expected)
+
+
+def test_sparseroll2descriptors():
+    for pattlist in [BOSKA_3_PATTLIST, BOSKA_9_PATTLIST, BOSKA_9_PATTLIST[:12], []]:
+        roll = pattlist_to_pianoroll(pattlist)
+        sparse = SparseRoll.from_pattlist(pattlist)
+        for resolution in [4, 8]:
+            for drums in [True, False]:
+                assert_descriptors_equal(
+                    sparseroll2descriptors(sparse, resolution, drums=drums),
+                    pianoroll2descriptors(roll, resolution, drums=drums),
+                )
+
+    for reader in ["pretty_midi", "smf"]:
+        sparse = read_onset_roll("midi/boska/3.mid", reader=reader, sparse=True)
+        assert np.array_equal(
+            sparse.to_pianoroll(), read_onset_roll("midi/boska/3.mid")
+        )
+        assert_descriptors_equal(
+            midifile2descriptors("midi/boska/3.mid", reader=reader),
+            pianoroll2descriptors(read_onset_roll("midi/boska/3.mid")),
+        )
@@ -0,0 +1,60 @@
+import pytest
+from .fixtures import (
+    BOSKA_3_PATTLIST,
+    BOSKA_8_PATTLIST,
+    BOSKA_9_PATTLIST,
+    assert_descriptors_equal,
+)
+
+from rhythmtoolbox import DescriptorStream, pattlist2descriptors
+
+
+def test_descriptor_stream():
+    stream = DescriptorStream()
+    assert all(v is None for v in stream.descriptors().values())
+
+    for pattlist in [BOSKA_3_PATTLIST, BOSKA_8_PATTLIST, BOSKA_9_PATTLIST[:16]]:
+        for notes in pattlist:
+            stream.push(notes)
+        assert stream.position == 0
+        assert_descriptors_equal(stream.descriptors(), pattlist2descriptors(pattlist))
+
+    # Steps replace the step at the same metric position of the window
+    for notes in BOSKA_3_PATTLIST[:4]:
+        stream.push(notes)
+    window = BOSKA_3_PATTLIST[:4] + BOSKA_9_PATTLIST[4:16]
+    assert stream.position == 4
+    assert_descriptors_equal(stream.descriptors(), pattlist2descriptors(window))
+
+    for _ in range(16):
+        stream.push([])
+    assert all(v is None for v in stream.descriptors().values())
+
+
+def test_descriptor_stream_bars():
+    pattlist = BOSKA_3_PATTLIST + BOSKA_8_PATTLIST
+    for drums in [True, False]:
+        stream = DescriptorStream(n_bars=2, drums=drums)
+        for notes in BOSKA_9_PATTLIST + pattlist:
+            stream.push(notes)
+        assert_descriptors_equal(
+            stream.descriptors(), pattlist2descriptors(pattlist, drums=drums)
+        )
+
+    # Reads between bars and after many windows match the pattern of the window
+    stream = DescriptorStream(n_bars=3)
+    steps = (BOSKA_3_PATTLIST + BOSKA_8_PATTLIST + BOSKA_9_PATTLIST) * 5
+    steps = steps[: 48 * 4 + 40]
+    for notes in steps:
+        stream.push(notes)
+    assert stream.step % 48 == 40
+    assert stream.position == 8
+    window = steps[-40:] + steps[-48:-40]
+    assert_descriptors_equal(stream.descriptors(), pattlist2descriptors(window))
+
+    stream.reset()
+    assert stream.step == 0
+    assert all(v is None for v in stream.descriptors().values())
+
+    with pytest.raises(ValueError):
+        DescriptorStream(n_bars=0)
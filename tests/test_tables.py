@@ -0,0 +1,40 @@
+import numpy as np
+from .fixtures import PATT_1, PATT_2
+
+from rhythmtoolbox.descriptors import (
+    balance,
+    density,
+    evenness,
+    syncopation16,
+    syncopation16_awareness,
+    syness,
+)
+from rhythmtoolbox.tables import (
+    get_table,
+    lookup,
+    pack_patterns,
+    unpack_patterns,
+)
+
+
+def test_pack_patterns():
+    assert pack_patterns(PATT_1) == 0b0001001001001001
+    assert pack_patterns([PATT_1, PATT_2]).tolist() == [0x1249, 0x7579]
+    assert unpack_patterns(pack_patterns(PATT_2)).tolist() == PATT_2
+
+    masks = np.arange(2**16, dtype=np.uint16)
+    assert np.array_equal(pack_patterns(unpack_patterns(masks)), masks)
+
+
+def test_tables():
+    rng = np.random.default_rng(0)
+    masks = np.concatenate([[0, 2**16 - 1], rng.integers(0, 2**16, 2000)])
+    for mask, pattern in zip(masks, unpack_patterns(masks).tolist()):
+        assert lookup("density", mask) == density(pattern)
+        assert lookup("sync", mask) == syncopation16(pattern)
+        assert lookup("syness", mask) == syness(pattern)
+        assert lookup("syncAwareness", mask) == syncopation16_awareness(pattern)
+        assert np.isclose(lookup("balance", mask), balance(pattern))
+        assert np.isclose(lookup("evenness", mask), evenness(pattern))
+
+    assert not get_table("sync").flags.writeable